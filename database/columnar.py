@@ -0,0 +1,177 @@
+import os
+import json
+import mmap
+import struct
+from collections import Counter
+
+from database.connection import ROOT_DIR
+
+# =========================================================
+# Formato colunar opcional para a presença HR (attendance/)
+# =========================================================
+#
+# DATA_COLUMNAR=1 (.env): o arquivo base de attendance/{class}-{sy}.json
+# passa a ser gravado como "<arquivo>.cols" em vez do JSON indentado:
+#
+#   cabeçalho  "<4sIII": b"ATC1", tamanho do meta, nº alunos, nº datas
+#   meta       JSON compacto: {"students": [...], "dates": [...], "statuses": [...]}
+#   matriz     uint8 alunos × datas (uma linha contígua por aluno);
+#              0 = sem registro no dia, n = statuses[n - 1]
+#
+# O caminho lógico continua o mesmo (utils.storage decide o formato),
+# e a linha de um aluno é lida direto do mmap, sem decodificar o ano.
+# Conversão dos arquivos existentes: python -m database.columnar
+#
+# Documentos fora do formato (dia com outras chaves além de "students",
+# status que não é texto, mais de 255 status distintos) continuam JSON.
+
+ENABLED = os.environ.get("DATA_COLUMNAR", "0") == "1"
+
+COLUMNAR_ROOTS = ("attendance/",)
+
+MAGIC = b"ATC1"
+HEADER = struct.Struct("<4sIII")
+
+
+def columnar_path(path):
+    """Arquivo .cols do caminho lógico (None se o caminho não usa o formato)."""
+    rel = os.path.relpath(os.path.abspath(os.fspath(path)), ROOT_DIR)
+    rel = rel.replace(os.sep, "/")
+
+    for root in COLUMNAR_ROOTS:
+        if rel.startswith(root) and rel.endswith(".json"):
+            return f"{os.fspath(path)}.cols"
+
+    return None
+
+
+def encode(data):
+    """Documento de presença → bytes (None se não cabe no formato)."""
+    if not isinstance(data, dict) or not data:
+        return None
+
+    dates = list(data)
+    students = {}
+    statuses = {}
+    cells = []
+
+    for d, entry in enumerate(dates):
+        entry = data[entry]
+        if not isinstance(entry, dict) or set(entry) != {"students"}:
+            return None
+        day = entry["students"]
+        if not isinstance(day, dict):
+            return None
+
+        for sid, status in day.items():
+            if not isinstance(status, str):
+                return None
+            code = statuses.get(status)
+            if code is None:
+                if len(statuses) == 255:
+                    return None
+                code = statuses[status] = len(statuses) + 1
+            s = students.get(sid)
+            if s is None:
+                s = students[sid] = len(students)
+            cells.append((s, d, code))
+
+    n_dates = len(dates)
+    matrix = bytearray(len(students) * n_dates)
+    for s, d, code in cells:
+        matrix[s * n_dates + d] = code
+
+    meta = json.dumps(
+        {"students": list(students), "dates": dates, "statuses": list(statuses)},
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+    return HEADER.pack(MAGIC, len(meta), len(students), n_dates) + meta + bytes(matrix)
+
+
+class ColumnarFile:
+    """Leitura de um .cols via mmap (use com `with`)."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, meta_len, n_students, n_dates = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"not a columnar attendance file: {path}")
+
+        meta = json.loads(self._mm[HEADER.size:HEADER.size + meta_len].decode("utf-8"))
+        self.students = meta["students"]
+        self.dates = meta["dates"]
+        self.statuses = meta["statuses"]
+        self.index = {sid: i for i, sid in enumerate(self.students)}
+
+        self._n_dates = n_dates
+        self._matrix = HEADER.size + meta_len
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+
+    def row(self, sid) -> bytes:
+        """Códigos do aluno por data (b"" se o aluno não aparece)."""
+        i = self.index.get(sid)
+        if i is None:
+            return b""
+        start = self._matrix + i * self._n_dates
+        return self._mm[start:start + self._n_dates]
+
+    def student(self, sid) -> dict:
+        """data → status do aluno."""
+        return {
+            self.dates[d]: self.statuses[code - 1]
+            for d, code in enumerate(self.row(sid))
+            if code
+        }
+
+    def status_counts(self, sid) -> dict:
+        """status → nº de dias do aluno."""
+        counts = Counter(self.row(sid))
+        counts.pop(0, None)
+        return {self.statuses[code - 1]: n for code, n in counts.items()}
+
+    def to_dict(self) -> dict:
+        days = {date: {} for date in self.dates}
+        columns = list(days.values())
+
+        for sid in self.students:
+            for d, code in enumerate(self.row(sid)):
+                if code:
+                    columns[d][sid] = self.statuses[code - 1]
+
+        return {date: {"students": students} for date, students in days.items()}
+
+
+def read(path) -> dict:
+    with ColumnarFile(path) as f:
+        return f.to_dict()
+
+
+if __name__ == "__main__":
+    # regrava attendance/ no formato configurado (DATA_COLUMNAR)
+    from utils import storage
+
+    count = 0
+    for root in COLUMNAR_ROOTS:
+        for fname in sorted(storage.listdir(os.path.join(ROOT_DIR, root))):
+            if not fname.endswith(".json"):
+                continue
+            path = os.path.join(ROOT_DIR, root, fname)
+            data = storage.read_json(path)
+            if data:
+                storage.write_json(path, data)
+                count += 1
+                print("CONVERTED:", root + fname)
+
+    print(f"{count} documentos regravados ({'colunar' if ENABLED else 'json'})")
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import threading
+
+# =========================================================
+# SQLite (WAL) — backend opcional do utils.storage
+# =========================================================
+#
+# DATA_BACKEND (.env):
+#   "json"   (padrão) → arquivos .json como sempre
+#   "sqlite"          → os documentos de DOC_ROOTS ficam em DATA_SQLITE_PATH
+#
+# Cada "arquivo" continua sendo endereçado pelo mesmo caminho
+# (attendance/z-1-1組-2025.json, data/students.json ...): as rotas não
+# mudam, só utils.storage decide onde ler/gravar.
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKEND = os.environ.get("DATA_BACKEND", "json")
+if BACKEND not in ("json", "sqlite"):
+    BACKEND = "json"
+
+DB_PATH = os.environ.get("DATA_SQLITE_PATH") or os.path.join(ROOT_DIR, "data", "store.sqlite3")
+
+# caminhos (relativos à raiz do projeto) guardados no SQLite;
+# terminados em "/" = diretório inteiro
+DOC_ROOTS = (
+    "data/students.json",
+    "data/graduates.json",
+    "data/taigaku.json",
+    "data/tengaku.json",
+    "data/joseki.json",
+    "attendance/",
+    "attendance_sub/",
+    "data/exams/",
+    "reports/",
+    "evaluation/",
+    "data/hyoka/",
+)
+
+# DATA_DURABILITY (mesma variável do utils.storage) → PRAGMA synchronous
+SYNCHRONOUS = {
+    "fsync": "FULL",
+    "batch": "NORMAL",
+    "none": "OFF",
+}.get(os.environ.get("DATA_DURABILITY", "fsync"), "FULL")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path    TEXT PRIMARY KEY,
+    kind    TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS rows (
+    path  TEXT NOT NULL,
+    key   TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (path, key)
+);
+"""
+
+
+def doc_key(path):
+    """
+    Caminho do arquivo → chave do documento no SQLite
+    (None se o caminho não pertence a DOC_ROOTS).
+    """
+    rel = os.path.relpath(os.path.abspath(os.fspath(path)), ROOT_DIR)
+    rel = rel.replace(os.sep, "/")
+
+    for root in DOC_ROOTS:
+        if root.endswith("/"):
+            if rel.startswith(root) and rel.endswith(".json"):
+                return rel
+        elif rel == root:
+            return rel
+
+    return None
+
+
+def dir_key(directory):
+    """Diretório → prefixo das chaves (None se não for um diretório de DOC_ROOTS)."""
+    rel = os.path.relpath(os.path.abspath(os.fspath(directory)), ROOT_DIR)
+    rel = rel.replace(os.sep, "/").rstrip("/") + "/"
+    return rel if rel in DOC_ROOTS else None
+
+
+class _Connections(threading.local):
+    conn = None
+    pid = None
+
+
+_local = _Connections()
+
+
+def get_connection() -> sqlite3.Connection:
+    """Uma conexão por thread (e por processo: workers não herdam a do pai)."""
+    if _local.conn is None or _local.pid != os.getpid():
+        directory = os.path.dirname(DB_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(SCHEMA)
+
+        _local.conn = conn
+        _local.pid = os.getpid()
+
+    return _local.conn
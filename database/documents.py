@@ -0,0 +1,104 @@
+from database.connection import get_connection
+from database.formatter import flatten, unflatten, kind_of
+
+# =========================================================
+# Documentos JSON no SQLite (usado por utils.storage)
+# =========================================================
+#
+# write() compara as linhas novas com as gravadas e só faz
+# INSERT/UPDATE/DELETE das que mudaram: salvar uma nota ou um período
+# de presença custa uma linha, não o arquivo inteiro.
+
+
+def read(path):
+    conn = get_connection()
+    row = conn.execute("SELECT kind FROM documents WHERE path = ?", (path,)).fetchone()
+    if row is None:
+        return None
+
+    rows = conn.execute(
+        "SELECT key, value FROM rows WHERE path = ? ORDER BY rowid", (path,)
+    )
+    return unflatten(row[0], rows)
+
+
+def exists(path) -> bool:
+    conn = get_connection()
+    return conn.execute("SELECT 1 FROM documents WHERE path = ?", (path,)).fetchone() is not None
+
+
+def version(path):
+    """Contador de escritas do documento (None se não existir)."""
+    conn = get_connection()
+    row = conn.execute("SELECT version FROM documents WHERE path = ?", (path,)).fetchone()
+    return row[0] if row else None
+
+
+def list_names(prefix: str) -> list:
+    """Nomes dos documentos diretamente dentro de `prefix` (como os.listdir)."""
+    conn = get_connection()
+    names = []
+    for (path,) in conn.execute(
+        "SELECT path FROM documents WHERE substr(path, 1, ?) = ? ORDER BY path",
+        (len(prefix), prefix),
+    ):
+        name = path[len(prefix):]
+        if "/" not in name:
+            names.append(name)
+    return names
+
+
+def write(path, doc) -> int:
+    """Grava o documento; retorna quantas linhas mudaram."""
+    conn = get_connection()
+    kind = kind_of(doc)
+    new_rows = flatten(doc)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT kind FROM documents WHERE path = ?", (path,)).fetchone()
+
+        if row is not None and row[0] == kind:
+            old_rows = dict(conn.execute(
+                "SELECT key, value FROM rows WHERE path = ?", (path,)
+            ))
+        else:
+            conn.execute("DELETE FROM rows WHERE path = ?", (path,))
+            old_rows = {}
+
+        removed = [(path, key) for key in old_rows if key not in new_rows]
+        changed = [
+            (path, key, value)
+            for key, value in new_rows.items()
+            if old_rows.get(key) != value
+        ]
+
+        conn.executemany("DELETE FROM rows WHERE path = ? AND key = ?", removed)
+        conn.executemany(
+            "INSERT INTO rows (path, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (path, key) DO UPDATE SET value = excluded.value",
+            changed,
+        )
+        conn.execute(
+            "INSERT INTO documents (path, kind, version) VALUES (?, ?, 1) "
+            "ON CONFLICT (path) DO UPDATE SET kind = excluded.kind, version = version + 1",
+            (path, kind),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    return len(removed) + len(changed)
+
+
+def delete(path):
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM rows WHERE path = ?", (path,))
+        conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
@@ -0,0 +1,73 @@
+from utils import jsonio
+
+# =========================================================
+# Documento JSON ↔ linhas da tabela `rows`
+# =========================================================
+#
+# Um documento vira várias linhas para que uma alteração pequena
+# (uma nota, um período, uma tarefa, um aluno) grave só a linha dela:
+#
+#   dict → uma linha por chave; se o valor for um dict não vazio,
+#          uma linha por chave de segundo nível
+#          attendance:  ["2025-04-08", "students"] → {...}
+#          exams:       ["math1", "zenki_1"]      → {sid: nota}
+#   list → uma linha por elemento, chave = [posição]
+#          students.json: [12] → registro do aluno
+#   outro → uma linha só, chave = []
+#
+# A ordem das chaves é a ordem de inserção (rowid), como no dict do Python.
+
+
+def dumps(value) -> str:
+    return jsonio.dumps(value).decode("utf-8")
+
+
+def kind_of(doc) -> str:
+    if isinstance(doc, dict):
+        return "dict"
+    if isinstance(doc, list):
+        return "list"
+    return "value"
+
+
+def flatten(doc) -> dict:
+    """Documento → {chave da linha: valor serializado}, na ordem do documento."""
+    rows = {}
+
+    if isinstance(doc, dict):
+        for k, v in doc.items():
+            if isinstance(v, dict) and v:
+                for k2, v2 in v.items():
+                    rows[dumps([k, k2])] = dumps(v2)
+            else:
+                rows[dumps([k])] = dumps(v)
+
+    elif isinstance(doc, list):
+        for i, v in enumerate(doc):
+            rows[dumps([i])] = dumps(v)
+
+    else:
+        rows[dumps([])] = dumps(doc)
+
+    return rows
+
+
+def unflatten(kind: str, rows):
+    """Linhas (chave, valor) na ordem do rowid → documento."""
+    if kind == "dict":
+        doc = {}
+        for key, value in rows:
+            path = jsonio.loads(key)
+            if len(path) == 1:
+                doc[path[0]] = jsonio.loads(value)
+            else:
+                doc.setdefault(path[0], {})[path[1]] = jsonio.loads(value)
+        return doc
+
+    if kind == "list":
+        items = sorted((jsonio.loads(key)[0], value) for key, value in rows)
+        return [jsonio.loads(value) for _, value in items]
+
+    for _, value in rows:
+        return jsonio.loads(value)
+    return None
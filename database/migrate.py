@@ -0,0 +1,51 @@
+import os
+import json
+
+from database.connection import ROOT_DIR, DB_PATH, DOC_ROOTS
+from database import documents
+
+# =========================================================
+# Migração única: árvore JSON → SQLite
+# =========================================================
+#
+#   python -m database.migrate
+#
+# Lê todos os arquivos de DOC_ROOTS (data/students.json, attendance/...)
+# e grava no DATA_SQLITE_PATH. Os arquivos JSON não são apagados.
+# Rodar de novo é seguro: cada documento é regravado com o conteúdo
+# atual do arquivo. Depois, DATA_BACKEND=sqlite no .env.
+
+
+def json_files():
+    for root in DOC_ROOTS:
+        full = os.path.join(ROOT_DIR, root)
+
+        if not root.endswith("/"):
+            if os.path.isfile(full):
+                yield root
+            continue
+
+        if not os.path.isdir(full):
+            continue
+
+        for fname in sorted(os.listdir(full)):
+            if fname.endswith(".json") and os.path.isfile(os.path.join(full, fname)):
+                yield root + fname
+
+
+def migrate():
+    count = 0
+    for key in json_files():
+        with open(os.path.join(ROOT_DIR, key), "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        documents.write(key, data)
+        count += 1
+        print("MIGRATED:", key)
+
+    return count
+
+
+if __name__ == "__main__":
+    total = migrate()
+    print(f"{total} documentos gravados em {DB_PATH}")
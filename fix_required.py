@@ -1,6 +1,8 @@
 import json
 import os
 
+from utils.storage import write_json
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "data", "students.json")
 
@@ -22,8 +24,7 @@ for student in students:
                 print(f"Corrigido: {student['id']} -> {year_key} -> {subject_id}")
 
 if changed:
-    with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(students, f, ensure_ascii=False, indent=2)
+    write_json(DATA_PATH, students)
     print("students.json corrigido com sucesso.")
 else:
     print("Nenhuma correção necessária.")
@@ -33,13 +33,15 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-from utils.data_manager import load_json, save_json
+from utils.data import load_data, save_data, find_student, update_student_record
+from utils import storage
+from utils.jsonio import FastJSONResponse
 
 def load_students():
-    return load_json("students.json")
+    return load_data()
 
 def save_students(students):
-    save_json("students.json", students)
+    save_data(students)
 
 APP_SECRET = os.environ.get("APP_SECRET", "default_password")
 
@@ -81,7 +83,8 @@ from routers.attendance_sub_special import router as attendance_sub_special_rout
 from routers.hoshuu import router as hoshuu_router
 from routers.sairishuu import router as sairishuu_router
 from routers.server import router as server_router
-from routers.exams_export import router as exams_export_router 
+from routers.exams_export import router as exams_export_router
+from routers.exports import router as exports_router
 
 
 
@@ -90,9 +93,16 @@ from routers.exams_export import router as exams_export_router
 
 
 
+# -------------------------------
+# 複数ワーカー: uvicorn main:app --workers N
+# 書き込みは utils.storage のファイルロック（flock）で直列化され、
+# 各ワーカーのキャッシュは世代カウンタで再読込される。
+# レスポンスは utils.jsonio（orjson があれば orjson）でシリアライズ
+# -------------------------------
 app = FastAPI(
     title="Student Management API",
-    redirect_slashes=True
+    redirect_slashes=True,
+    default_response_class=FastJSONResponse
 )
 
 app.include_router(
@@ -216,9 +226,7 @@ async def upload_photo(student_id: str, file: UploadFile = File(...)):
     filename = f"{student_id}.jpg"
     filepath = os.path.join(PHOTOS_DIR, filename)
 
-    students = load_students()
-
-    student = next((s for s in students if s["id"] == student_id), None)
+    student = find_student(student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
@@ -231,8 +239,10 @@ async def upload_photo(student_id: str, file: UploadFile = File(...)):
     with open(filepath, "wb") as f:
         f.write(compressed_bytes)
 
-    student["photo"] = filename
-    save_students(students)
+    def apply(s):
+        s["photo"] = filename
+
+    update_student_record(student_id, apply)
 
     return {"filename": filename}
 
@@ -268,10 +278,36 @@ app.include_router(hoshuu_router, prefix="/api/hoshuu", tags=["hoshuu"],dependen
 app.include_router(sairishuu_router,prefix="/api/sairishuu",tags=["sairishuu"],dependencies=[Depends(verify_token)])
 app.include_router(server_router,prefix="/api")
 app.include_router(exams_export_router,prefix="/api",tags=["exams_export"],dependencies=[Depends(verify_token)])
+app.include_router(exports_router, prefix="/api/exports", tags=["Exports"], dependencies=[Depends(verify_token)])
+
+
+
 
 
 
+# -------------------------------
+# 書き込みの同期 (utils.storage)
+# ジャーナルを本体ファイルへ反映し、保留中の fsync を実行する
+# -------------------------------
+@app.post("/api/system/sync", dependencies=[Depends(verify_token)])
+def system_sync():
+    try:
+        storage.sync()
+    except storage.CompactionError as e:
+        raise HTTPException(
+            status_code=500,
+            detail={"status": "error", "failed": [str(p) for p, _ in e.failures]},
+        )
+    return {"status": "ok"}
+
 
+@app.on_event("shutdown")
+def flush_storage():
+    try:
+        storage.sync()
+    except storage.CompactionError:
+        # 失敗は logging に記録済み。.log は残り、次回の書き込み・起動時に反映される
+        pass
 
 
 @app.get("/api/system/status")
@@ -2,19 +2,15 @@
 
 from fastapi import APIRouter
 import os
-import json
 
 from utils.date import school_year
+from utils import storage
+from utils.data import repository
+from services import attendance_counters
+from utils.etag import conditional
 
 router = APIRouter()
 
-STUDENTS_FILE = "data/students.json"
-
-
-# carrega todos os alunos para saber status real (休学, 出席停止, etc)
-with open(STUDENTS_FILE, "r", encoding="utf-8") as f:
-    ALL_STUDENTS = {s["id"]: s for s in json.load(f)}
-
 
 def attendance_path(class_id: str, date: str) -> str:
     sy = school_year(date)
@@ -22,17 +18,20 @@ def attendance_path(class_id: str, date: str) -> str:
     return f"attendance/{class_id}-{sy}.json"
 
 
-@router.get("")
+def attendance_files(q: dict) -> list:
+    # arquivos lidos por GET "" (ETag)
+    return [attendance_path(f"{q['course']}-{q['grade']}-{q['class_name']}", q["date"])]
+
+
+@router.get("", dependencies=[conditional(paths_of=attendance_files)])
 def get_attendance(date: str, course: str, grade: str, class_name: str):
     class_id = f"{course}-{grade}-{class_name}"
     path = attendance_path(class_id, date)
 
-    if not os.path.exists(path):
+    data = storage.read_json(path)
+    if data is None:
         return {"classes": {}}
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
     return {
         "classes": {
             class_id: data.get(date, {})
@@ -53,47 +52,26 @@ def save_attendance(payload: dict):
     filtered_students = {}
 
     for sid, status in students.items():
-        student = ALL_STUDENTS.get(sid)
+        # status real pelo índice do StudentRepository: sempre atual
+        # (acompanha cada escrita de aluno), busca O(1) por ID
+        real_status = repository.status_of(sid)
 
-        if student:
-            real_status = student.get("status")
-
-            # IGNORA alunos suspensos ou 休学
-            if real_status in ["休学", "出席停止"]:
-                continue
+        # IGNORA alunos suspensos ou 休学
+        if real_status in ["休学", "出席停止"]:
+            continue
 
         filtered_students[sid] = status
 
     path = attendance_path(class_id, date)
 
     # Se todos os alunos ativos estão 未記録 → apagar o registro do dia
+    # (arquivo vazio é removido)
+    # (os contadores de estatística recebem o delta do dia)
     if all(status == "未記録" for status in filtered_students.values()):
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            if date in data:
-                del data[date]
-
-            if len(data) == 0:
-                os.remove(path)
-            else:
-                with open(path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-
+        attendance_counters.save_day(path, date, None)
         return {"status": "deleted"}
 
-    # carrega arquivo existente ou cria novo
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = {}
-
-    # salva apenas alunos ativos
-    data[date] = {"students": filtered_students}
-
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # salva apenas alunos ativos — só o dia alterado é gravado (modo journal)
+    attendance_counters.save_day(path, date, filtered_students)
 
     return {"status": "ok"}
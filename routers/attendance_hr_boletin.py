@@ -1,19 +1,8 @@
 from fastapi import APIRouter
-import os, json
-from datetime import datetime
 
-router = APIRouter()
+from services import attendance_counters
 
-ATTENDANCE_MAP = {
-    "出席": {"attendance": 1},
-    "欠席": {"absence": 1},
-    "遅刻": {"attendance": 1, "late": 1},
-    "早退": {"attendance": 1, "early": 1},
-    "忌引き": {"mourn": 1},
-    "出席停止": {"stopped": 1},
-    "公欠": {"justified": 1},
-    "遅刻と早退": {"attendance": 1, "late": 1, "early": 1}
-}
+router = APIRouter()
 
 def init_term():
     return {
@@ -29,11 +18,6 @@ def init_term():
         "attendance_rate": 0
     }
 
-def add_status(term, status):
-    if status in ATTENDANCE_MAP:
-        for k, v in ATTENDANCE_MAP[status].items():
-            term[k] += v
-
 def finalize_term(term):
     required = term["school_days"] - term["mourn"] - term["stopped"] - term["justified"]
     required = max(required, 0)
@@ -57,47 +41,31 @@ def get_hr_attendance(course: str, grade: str, class_name: str, sy: int):
     class_id = f"{course}-{grade}-{class_name}"
     path = f"attendance/{class_id}-{sy}.json"
 
-    if not os.path.exists(path):
+    # contadores materializados (services.attendance_counters): sem
+    # reprocessar os dias do ano a cada request
+    view = attendance_counters.get(path)
+    if view is None:
         return {"error": "attendance file not found"}
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    _, per_student = view.terms(
+        lambda ym: "zenki" if int(ym[5:7]) in [4,5,6,7,8,9] else "koki"
+    )
 
-    # preparar estrutura
     result = {}
 
-    # inicializar alunos
-    # (vamos descobrir os alunos lendo todos os IDs do arquivo)
-    all_student_ids = set()
-    for entry in data.values():
-        if "students" in entry:
-            all_student_ids.update(entry["students"].keys())
-
-    for sid in all_student_ids:
+    for sid, terms in per_student.items():
         result[sid] = {
             "zenki": init_term(),
             "koki": init_term(),
             "total": init_term()
         }
 
-    # processar cada dia
-    for date_str, entry in data.items():
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        month = dt.month
-
-        period = "zenki" if month in [4,5,6,7,8,9] else "koki"
-
-        for sid, status in entry.get("students", {}).items():
-            if sid not in result:
-                continue
-
-            # zenki/koki
-            result[sid][period]["school_days"] += 1
-            add_status(result[sid][period], status)
-
-            # total
-            result[sid]["total"]["school_days"] += 1
-            add_status(result[sid]["total"], status)
+        for period, counters in terms.items():
+            for k, v in counters.items():
+                # zenki/koki
+                result[sid][period][k] += v
+                # total
+                result[sid]["total"][k] += v
 
     # finalizar cálculos
     for sid in result:
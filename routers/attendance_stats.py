@@ -1,27 +1,14 @@
-import json
 from fastapi import APIRouter, HTTPException, Query
 from pathlib import Path
-from datetime import datetime
+
+from utils.storage import listdir as storage_listdir
+from services import attendance_counters
 
 router = APIRouter()
 
 BASE_DIR = Path(__file__).resolve().parent
 ATTENDANCE_DIR = BASE_DIR.parent / "attendance"
 
-# ---------------------------------------------------------
-# MAPA DE STATUS
-# ---------------------------------------------------------
-ATTENDANCE_MAP = {
-    "出席": {"attendance": 1},
-    "欠席": {"absence": 1},
-    "遅刻": {"attendance": 1, "late": 1},
-    "早退": {"attendance": 1, "early": 1},
-    "忌引き": {"mourn": 1},
-    "出席停止": {"stopped": 1},
-    "公欠": {"justified": 1},
-    "遅刻と早退": {"attendance": 1, "late": 1, "early": 1}
-}
-
 def empty_term():
     return {
         "school_days": 0,
@@ -35,48 +22,46 @@ def empty_term():
     }
 
 # ---------------------------------------------------------
-# FUNÇÃO PRINCIPAL — COMPLETA, FINAL
+# FUNÇÃO PRINCIPAL — a partir dos contadores materializados
+# (services.attendance_counters), sem reprocessar os dias
 # ---------------------------------------------------------
-def compute_attendance_stats(data: dict):
-    dates = sorted(data.keys())
-    if not dates:
+def compute_attendance_stats(view):
+    if view is None or not view.months:
         return {"class_stats": {}, "students": {}}
 
-    first_date = datetime.strptime(dates[0], "%Y-%m-%d")
-    school_year = first_date.year
-
-    start = datetime(school_year, 4, 1)
-    end = datetime(school_year + 1, 3, 31)
-
-    class_zenki = empty_term()
-    class_koki = empty_term()
+    school_year = int(min(view.months)[:4])
 
-    students = {}
+    def term_of_month(ym):
+        year, month = int(ym[:4]), int(ym[5:7])
 
-    for date_str, entry in data.items():
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        # fora do ano letivo (abril → março)
+        if not ((year == school_year and month >= 4) or (year == school_year + 1 and month <= 3)):
+            return None
 
-        if not (start <= dt <= end):
-            continue
+        return "zenki" if month <= 9 else "koki"
 
-        term_class = class_zenki if dt.month <= 9 else class_koki
-        term_class["school_days"] += 1
+    dates, per_student = view.terms(term_of_month)
 
-        for sid, status in entry.get("students", {}).items():
+    class_zenki = empty_term()
+    class_koki = empty_term()
+    class_zenki["school_days"] = dates.get("zenki", 0)
+    class_koki["school_days"] = dates.get("koki", 0)
 
-            if sid not in students:
-                students[sid] = {
-                    "zenki": empty_term(),
-                    "koki": empty_term()
-                }
+    students = {}
 
-            term_student = students[sid]["zenki"] if dt.month <= 9 else students[sid]["koki"]
-            term_student["school_days"] += 1
+    for sid, terms in per_student.items():
+        students[sid] = {
+            "zenki": terms.get("zenki") or empty_term(),
+            "koki": terms.get("koki") or empty_term()
+        }
 
-            if status in ATTENDANCE_MAP:
-                for k, v in ATTENDANCE_MAP[status].items():
-                    term_class[k] += v
-                    term_student[k] += v
+        for term_class, term_student in (
+            (class_zenki, students[sid]["zenki"]),
+            (class_koki, students[sid]["koki"]),
+        ):
+            for k in term_student:
+                if k != "school_days":
+                    term_class[k] += term_student[k]
 
     def finalize(term):
         required = term["school_days"] - term["mourn"] - term["stopped"] - term["justified"]
@@ -135,31 +120,14 @@ def get_attendance_stats(
 ):
     filename = build_filename(course, grade, class_name, school_year)
 
-    if not filename.exists():
+    view = attendance_counters.get(filename)
+    if view is None:
         raise HTTPException(status_code=404, detail="Attendance file not found")
 
-    with filename.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    stats = compute_attendance_stats(data)
+    stats = view.memo("stats", compute_attendance_stats)
 
     # ⭐ DAILY ATTENDANCE — FALTAVA ISSO ⭐
-    dailyAttendance = {}
-    for date, entry in data.items():
-        if "students" not in entry:
-            continue
-
-        dailyAttendance[date] = {}
-
-        for sid, status in entry["students"].items():
-
-            if status == "休学":
-                continue
-
-            if status not in dailyAttendance[date]:
-                dailyAttendance[date][status] = 0
-
-            dailyAttendance[date][status] += 1
+    dailyAttendance = view.daily(skip={"休学"})
 
     return {
         "course": course,
@@ -190,12 +158,22 @@ def get_attendance_stats_all():
 
     all_students = {}
 
-    for file in ATTENDANCE_DIR.glob("*.json"):
+    paths = [
+        ATTENDANCE_DIR / fname
+        for fname in storage_listdir(ATTENDANCE_DIR)
+        if fname.endswith(".json")
+    ]
+
+    # visões frias montadas em paralelo; stats guardadas por turma até
+    # o arquivo mudar — só as turmas alteradas são recalculadas
+    views = attendance_counters.get_many(paths)
 
-        with file.open("r", encoding="utf-8") as f:
-            data = json.load(f)
+    for path in paths:
+        view = views.get(path)
+        if view is None:
+            continue
 
-        stats = compute_attendance_stats(data)
+        stats = view.memo("stats", compute_attendance_stats)
 
         for sid, st in stats["students"].items():
 
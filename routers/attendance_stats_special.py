@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-import os, json
-from datetime import datetime
+import os
+
+from utils.storage import listdir as storage_listdir
+from services import attendance_counters
 
 router = APIRouter()
 
@@ -67,18 +69,36 @@ def attendance_file_path(course, grade, class_name, sy):
     return f"attendance/{class_id}-{sy}.json"
 
 # ---------------------------------------------------------
-# MAPA DE STATUS
+# CONTADORES MATERIALIZADOS → GRUPOS
 # ---------------------------------------------------------
-ATTENDANCE_MAP = {
-    "出席": {"attendance": 1},
-    "欠席": {"absence": 1},
-    "遅刻": {"attendance": 1, "late": 1},
-    "早退": {"attendance": 1, "early": 1},
-    "忌引き": {"mourn": 1},
-    "出席停止": {"stopped": 1},
-    "公欠": {"justified": 1},
-    "遅刻と早退": {"attendance": 1, "late": 1, "early": 1}
-}
+def add_group_stats(stats: dict, view, grade: str):
+    """Soma os contadores mensais da turma (services.attendance_counters) nos grupos."""
+    # soma por grupo guardada na visão até o arquivo mudar
+    students = view.memo(
+        ("special", grade),
+        lambda v: v.terms(lambda ym: map_month_to_group(grade, int(ym[5:7])))[1]
+    )
+
+    for sid, groups in students.items():
+        if sid not in stats:
+            stats[sid] = {
+                "senmon_zenki": init_group(),
+                "koukou_zenki": init_group(),
+                "senmon_koki": init_group(),
+                "koukou_koki": init_group()
+            }
+
+        for group, counters in groups.items():
+            for k, v in counters.items():
+                stats[sid][group][k] += v
+
+def finalize_groups(stats: dict):
+    for sid, groups in stats.items():
+        for g in groups.values():
+            required = g["school_days"] - g["mourn"] - g["stopped"] - g["justified"]
+            required = max(required, 0)
+            g["required_attendance_days"] = required
+            g["attendance_rate"] = round((g["attendance"] / required) * 100, 1) if required > 0 else 0
 
 # ---------------------------------------------------------
 # ENDPOINT
@@ -90,44 +110,13 @@ def get_special_attendance_stats(course: str, grade: str, class_name: str, sy: i
         return {"error": "Este sistema só se aplica a: sy=2025 (2,3), sy=2026 (2,3), sy=2027 (3)."}
 
     path = attendance_file_path(course, grade, class_name, sy)
-    if not os.path.exists(path):
+    view = attendance_counters.get(path)
+    if view is None:
         return {}
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
     stats = {}
-
-    for date_str, entry in data.items():
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        month = dt.month
-
-        group = map_month_to_group(grade, month)
-        if not group:
-            continue
-
-        for sid, status in entry.get("students", {}).items():
-
-            if sid not in stats:
-                stats[sid] = {
-                    "senmon_zenki": init_group(),
-                    "koukou_zenki": init_group(),
-                    "senmon_koki": init_group(),
-                    "koukou_koki": init_group()
-                }
-
-            stats[sid][group]["school_days"] += 1
-
-            if status in ATTENDANCE_MAP:
-                for k, v in ATTENDANCE_MAP[status].items():
-                    stats[sid][group][k] += v
-
-    for sid, groups in stats.items():
-        for g in groups.values():
-            required = g["school_days"] - g["mourn"] - g["stopped"] - g["justified"]
-            required = max(required, 0)
-            g["required_attendance_days"] = required
-            g["attendance_rate"] = round((g["attendance"] / required) * 100, 1) if required > 0 else 0
+    add_group_stats(stats, view, grade)
+    finalize_groups(stats)
 
     return stats
 
@@ -144,10 +133,10 @@ def get_special_attendance_stats_all():
 
     # percorre todos os arquivos em attendance/
     base_dir = "attendance"
-    if not os.path.exists(base_dir):
-        return {}
 
-    for filename in os.listdir(base_dir):
+    targets = []
+
+    for filename in storage_listdir(base_dir):
         if not filename.endswith(".json"):
             continue
 
@@ -168,45 +157,20 @@ def get_special_attendance_stats_all():
         if not is_special_target(sy, grade):
             continue
 
-        path = os.path.join(base_dir, filename)
-        if not os.path.exists(path):
-            continue
-
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        # --- mesmo processamento do /special ---
-        for date_str, entry in data.items():
-            dt = datetime.strptime(date_str, "%Y-%m-%d")
-            month = dt.month
-
-            group = map_month_to_group(grade, month)
-            if not group:
-                continue
-
-            for sid, status in entry.get("students", {}).items():
+        targets.append((os.path.join(base_dir, filename), grade))
 
-                if sid not in stats:
-                    stats[sid] = {
-                        "senmon_zenki": init_group(),
-                        "koukou_zenki": init_group(),
-                        "senmon_koki": init_group(),
-                        "koukou_koki": init_group()
-                    }
+    # visões frias montadas em paralelo (services.attendance_counters)
+    views = attendance_counters.get_many([path for path, _ in targets])
 
-                stats[sid][group]["school_days"] += 1
+    for path, grade in targets:
+        view = views.get(path)
+        if view is None:
+            continue
 
-                if status in ATTENDANCE_MAP:
-                    for k, v in ATTENDANCE_MAP[status].items():
-                        stats[sid][group][k] += v
+        # --- mesmo processamento do /special ---
+        add_group_stats(stats, view, grade)
 
     # pós-processamento (required_attendance_days + attendance_rate)
-    for sid, groups in stats.items():
-        for g in groups.values():
-            required = g["school_days"] - g["mourn"] - g["stopped"] - g["justified"]
-            required = max(required, 0)
-            g["required_attendance_days"] = required
-            g["attendance_rate"] = round((g["attendance"] / required) * 100, 1) if required > 0 else 0
+    finalize_groups(stats)
 
     return stats
-
@@ -1,8 +1,10 @@
 from fastapi import APIRouter
 import os
-import json
 
 from utils.date import school_year
+from utils import storage
+from utils.data import get_students, STUDENTS_FILE
+from utils.etag import conditional
 
 router = APIRouter()
 
@@ -16,7 +18,28 @@ def attendance_sub_path(class_id: str, date: str) -> str:
     os.makedirs("attendance_sub", exist_ok=True)
     return f"attendance_sub/{class_id}-{sy}.json"
 
-@router.get("")
+def grade_class_names(course, grade):
+    # todas as classes reais do 学年 (class_name=ALL)
+    return sorted({
+        s.get("class_name")
+        for s in get_students()
+        if s.get("course") == course and str(s.get("grade")) == str(grade)
+    })
+
+
+def attendance_sub_files(q: dict) -> list:
+    # arquivos lidos por GET "" (ETag); ALL também depende dos alunos
+    course, grade, date = q["course"], q["grade"], q["date"]
+    if q["class_name"] != "ALL":
+        return [attendance_sub_path(f"{course}-{grade}-{q['class_name']}", date)]
+
+    return [STUDENTS_FILE] + [
+        attendance_sub_path(f"{course}-{grade}-{cn}", date)
+        for cn in grade_class_names(course, grade)
+    ]
+
+
+@router.get("", dependencies=[conditional(paths_of=attendance_sub_files)])
 def get_attendance_sub(date: str, course: str, grade: str, class_name: str):
     """
     Suporta:
@@ -28,15 +51,8 @@ def get_attendance_sub(date: str, course: str, grade: str, class_name: str):
     # 学年集会: class_name=ALL
     # ==========================
     if class_name == "ALL":
-        from utils.data import load_data
-        all_students = load_data()
-
         # pegar todas as classes reais
-        class_names = sorted({
-            s.get("class_name")
-            for s in all_students
-            if s.get("course") == course and str(s.get("grade")) == str(grade)
-        })
+        class_names = grade_class_names(course, grade)
 
         result = {"classes": {}}
 
@@ -44,12 +60,8 @@ def get_attendance_sub(date: str, course: str, grade: str, class_name: str):
             class_id = f"{course}-{grade}-{cn}"
             path = attendance_sub_path(class_id, date)
 
-            if os.path.exists(path):
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                result["classes"][class_id] = {date: data.get(date, {})}
-            else:
-                result["classes"][class_id] = {date: {}}
+            data = storage.read_json(path, {})
+            result["classes"][class_id] = {date: data.get(date, {})}
 
         return result
 
@@ -59,12 +71,10 @@ def get_attendance_sub(date: str, course: str, grade: str, class_name: str):
     class_id = f"{course}-{grade}-{class_name}"
     path = attendance_sub_path(class_id, date)
 
-    if not os.path.exists(path):
+    data = storage.read_json(path)
+    if data is None:
         return {"classes": {}}
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
     return {
         "classes": {
             class_id: {
@@ -91,47 +101,16 @@ def save_attendance_sub(payload: dict):
         path = attendance_sub_path(class_id, date)
 
         # Se todos os alunos estão 未記録 → apagar o período
+        # (dia vazio é removido; arquivo vazio também)
         if all(status == "未記録" for status in students.values()):
-            if os.path.exists(path):
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-
-                # remove o período
-                if date in data and period in data[date]:
-                    del data[date][period]
-
-                # se o dia ficou vazio → remove o dia
-                if date in data and len(data[date]) == 0:
-                    del data[date]
-
-                # se o arquivo ficou vazio → remove o arquivo
-                if len(data) == 0:
-                    os.remove(path)
-                else:
-                    with open(path, "w", encoding="utf-8") as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-
+            storage.journal_delete(path, [date, period])
             continue  # passa para a próxima classe
 
-        # carrega arquivo existente ou cria novo
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        else:
-            data = {}
-
-        # garante que a data existe
-        if date not in data:
-            data[date] = {}
-
-        # salva o período
-        data[date][period] = {
+        # salva o período — só ele é gravado (modo journal)
+        storage.journal_set(path, [date, period], {
             "subject": subject,
             "subject_id": payload["subject_id"],
             "students": students
-        }
-
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        })
 
     return {"status": "ok"}
@@ -1,7 +1,7 @@
 from fastapi import APIRouter
-import os, json
 from datetime import datetime
 from routers.subjects import get_subjects
+from utils.storage import read_json
 
 router = APIRouter()
 
@@ -80,11 +80,7 @@ def get_special_subject_attendance(course: str, grade: str, class_name: str, sy:
     special = is_special_target(sy, grade, course)
 
     path = attendance_sub_file_path(course, grade, class_name, sy)
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = {}
+    data = read_json(path, {})
 
     subjects = get_subjects(course=course, grade=grade)
     subject_required_map = {s["id"]: s["required_attendance"] for s in subjects}
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from utils.data import load_data, save_data
+from utils.data import update_students, get_students
 
 router = APIRouter()
 
@@ -15,31 +15,32 @@ class RenumberRequest(BaseModel):
 
 @router.post("/renumber")
 def renumber_attendance_numbers(req: RenumberRequest):
-    data = load_data()
+    def apply(data):
+        target_students = [
+            s for s in data
+            if s.get("grade") == req.grade and s.get("class_name") == req.class_name
+        ]
 
-    target_students = [
-        s for s in data
-        if s.get("grade") == req.grade and s.get("class_name") == req.class_name
-    ]
+        if not target_students:
+            raise HTTPException(
+                status_code=404,
+                detail=f"{req.grade}年 {req.class_name} に該当する生徒がいません"
+            )
 
-    if not target_students:
-        raise HTTPException(
-            status_code=404,
-            detail=f"{req.grade}年 {req.class_name} に該当する生徒がいません"
-        )
+        target_students_sorted = sorted(target_students, key=lambda x: x.get("kana", ""))
 
-    target_students_sorted = sorted(target_students, key=lambda x: x.get("kana", ""))
+        for i, s in enumerate(target_students_sorted, start=1):
+            s["attend_no"] = i
 
-    for i, s in enumerate(target_students_sorted, start=1):
-        s["attend_no"] = i
+        id_to_student = {s["id"]: s for s in target_students_sorted}
+        for idx, s in enumerate(data):
+            sid = s.get("id")
+            if sid in id_to_student:
+                data[idx] = id_to_student[sid]
 
-    id_to_student = {s["id"]: s for s in target_students_sorted}
-    for idx, s in enumerate(data):
-        sid = s.get("id")
-        if sid in id_to_student:
-            data[idx] = id_to_student[sid]
+        return target_students_sorted
 
-    save_data(data)
+    target_students_sorted = update_students(apply)
 
     return {
         "status": "renumbered",
@@ -62,10 +63,10 @@ class PreviewRequest(BaseModel):
 
 @router.post("/preview")
 def preview_class_assignment(req: PreviewRequest):
-    data = load_data()
+    data = get_students()
 
-    # 対象生徒を抽出
-    selected = [s for s in data if s["id"] in req.student_ids]
+    # 対象生徒を抽出（cópias: a prévia não pode alterar o cache）
+    selected = [dict(s) for s in data if s["id"] in req.student_ids]
 
     if not selected:
         raise HTTPException(status_code=404, detail="選択された生徒が見つかりません")
@@ -102,19 +103,20 @@ class CommitRequest(BaseModel):
 
 @router.post("/commit")
 def commit_class(req: CommitRequest):
-    data = load_data()
+    def apply(data):
+        id_map = {s["id"]: s for s in data}
 
-    id_map = {s["id"]: s for s in data}
+        for entry in req.students:
+            sid = entry["id"]
+            if sid not in id_map:
+                raise HTTPException(status_code=404, detail=f"ID {sid} が存在しません")
 
-    for entry in req.students:
-        sid = entry["id"]
-        if sid not in id_map:
-            raise HTTPException(status_code=404, detail=f"ID {sid} が存在しません")
+            id_map[sid]["class_name"] = req.class_name
+            id_map[sid]["attend_no"] = entry["attend_no"]
 
-        id_map[sid]["class_name"] = req.class_name
-        id_map[sid]["attend_no"] = entry["attend_no"]
+        data[:] = id_map.values()
 
-    save_data(list(id_map.values()))
+    update_students(apply)
 
     return {
         "status": "saved",
@@ -134,25 +136,26 @@ class SingleClassRequest(BaseModel):
 
 @router.post("/single")
 def assign_single_class(req: SingleClassRequest):
-    data = load_data()
+    def apply(data):
+        targets = [
+            s for s in data
+            if s.get("grade") == req.grade and s.get("course") == req.course
+        ]
 
-    targets = [
-        s for s in data
-        if s.get("grade") == req.grade and s.get("course") == req.course
-    ]
+        if not targets:
+            raise HTTPException(status_code=404, detail="該当する生徒がいません")
 
-    if not targets:
-        raise HTTPException(status_code=404, detail="該当する生徒がいません")
+        # 読み仮名順
+        sorted_students = sorted(targets, key=lambda x: x.get("kana", ""))
 
-    # 読み仮名順
-    sorted_students = sorted(targets, key=lambda x: x.get("kana", ""))
+        # 出席番号付与
+        for i, s in enumerate(sorted_students, start=1):
+            s["class_name"] = "1組"
+            s["attend_no"] = i
 
-    # 出席番号付与
-    for i, s in enumerate(sorted_students, start=1):
-        s["class_name"] = "1組"
-        s["attend_no"] = i
+        return sorted_students
 
-    save_data(data)
+    sorted_students = update_students(apply)
 
     return {
         "status": "ok",
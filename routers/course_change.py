@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from utils.data import load_data, save_data
+from utils.data import get_students, find_student, update_student_record
 from utils.security import check_password
 
 
@@ -41,9 +41,9 @@ def change_course(req: CourseChangeRequest):
     if req.new_course not in ("z", "s", "w"):
         raise HTTPException(status_code=400, detail="Invalid course")
 
-    data = load_data()
+    data = get_students()
 
-    student = next((s for s in data if s.get("id") == req.student_id), None)
+    student = find_student(req.student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
@@ -55,28 +55,31 @@ def change_course(req: CourseChangeRequest):
             "attend_no": student.get("attend_no"),
         }
 
-    # -------------------------
-    # z → クラスなし（リセット）
-    # -------------------------
-    if req.new_course == "z":
-        student["course"] = COURSE_LABEL_MAP["z"]
-        student["class_name"] = ""
-        student["attend_no"] = ""
-
-    # -------------------------
-    # s / w → クラスあり（自動番号）
-    # -------------------------
-    else:
-        student["course"] = COURSE_LABEL_MAP[req.new_course]
-        student["class_name"] = "1組"
-        student["attend_no"] = get_next_attend_no(
-            data,
-            student.get("grade"),
-            req.new_course,
-            exclude_id=student["id"]
-        )
-
-    save_data(data)
+    def apply(student):
+        # -------------------------
+        # z → クラスなし（リセット）
+        # -------------------------
+        if req.new_course == "z":
+            student["course"] = COURSE_LABEL_MAP["z"]
+            student["class_name"] = ""
+            student["attend_no"] = ""
+
+        # -------------------------
+        # s / w → クラスあり（自動番号）
+        # -------------------------
+        else:
+            student["course"] = COURSE_LABEL_MAP[req.new_course]
+            student["class_name"] = "1組"
+            student["attend_no"] = get_next_attend_no(
+                data,
+                student.get("grade"),
+                req.new_course,
+                exclude_id=student["id"]
+            )
+
+        return student
+
+    student = update_student_record(student["id"], apply)
 
     return {
         "status": "ok",
@@ -4,6 +4,8 @@ import json
 import os
 from datetime import datetime
 
+from utils.storage import update_json
+
 router = APIRouter()
 
 
@@ -11,22 +13,6 @@ router = APIRouter()
 # Helpers
 # ============================================================
 
-def load_json(path: Path):
-    if not path.exists():
-        return {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return {}
-
-
-def save_json(path: Path, data):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-
 def get_school_year():
     """Retorna o ano escolar japonês (abril–março)."""
     today = datetime.now()
@@ -89,26 +75,23 @@ async def save_final_all(payload: dict):
     filename = f"{school_year}_{grade}_{class_name}.json"
     filepath = Path("data/hyoka") / filename
 
-    # Carregar arquivo existente
-    data = load_json(filepath)
-
     # Nome da matéria
     subject_name = get_subject_name(subject_id)
 
-    # Atualizar cada aluno
-    for student_id, ev in evaluations.items():
-        if student_id not in data:
-            data[student_id] = {}
+    # Carregar arquivo existente, atualizar cada aluno e salvar (sob o lock do arquivo)
+    def apply(data):
+        for student_id, ev in evaluations.items():
+            if student_id not in data:
+                data[student_id] = {}
 
-        data[student_id][subject_id] = {
-            "subject_name": subject_name,
-            "evaluation": ev.get("evaluation"),
-            "kanten": ev.get("kanten"),
-            "school_year": school_year  
-        }
+            data[student_id][subject_id] = {
+                "subject_name": subject_name,
+                "evaluation": ev.get("evaluation"),
+                "kanten": ev.get("kanten"),
+                "school_year": school_year  
+            }
 
-    # Salvar
-    save_json(filepath, data)
+    update_json(filepath, apply, default={})
 
     return {
         "status": "ok",
@@ -1,38 +1,24 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from openpyxl import load_workbook
+from io import BytesIO, StringIO
 from pathlib import Path
-import json
-import os
+import csv
+
+from utils.storage import read_json, update_json, journal_set, journal_delete, apply_records
 
 router = APIRouter()
 
 BASE_DIR = Path("data/exams")
 
 
-def load_exams_file(course, grade, class_, year):
+def exams_file_path(course, grade, class_, year):
     # NOVO FORMATO DE ARQUIVO
-    filename = f"{year}-{course}-{grade}-{class_}.json"
-    path = BASE_DIR / filename
-
-    if not path.exists():
-        return {}, path
-
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f), path
-
+    return BASE_DIR / f"{year}-{course}-{grade}-{class_}.json"
 
-def save_exams_file(path, data):
-    # garante que a pasta data/exams existe
-    path.parent.mkdir(parents=True, exist_ok=True)
-
-    tmp = path.with_suffix(".tmp")
-
-    # 1) escreve no arquivo temporário
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-    # 2) substitui o arquivo original de forma atômica
-    os.replace(tmp, path)
 
+def load_exams_file(course, grade, class_, year):
+    path = exams_file_path(course, grade, class_, year)
+    return read_json(path, {}), path
 
 
 @router.get("/class/{course}/{grade}/{class_}/{year}")
@@ -48,27 +34,155 @@ def save_exam_score(course: str, grade: int, class_: str, year: str,
 
     raw = payload.get("score")
 
-    data, path = load_exams_file(course, grade, class_, year)
+    path = exams_file_path(course, grade, class_, year)
+
+    # uma célula por request: só ela é gravada (modo journal, utils.storage)
 
     # 🔥 1) Se o professor apagou o campo → remover do JSON
     if raw in ("", None):
-        if subject_id in data and exam_key in data[subject_id]:
-            data[subject_id][exam_key].pop(student_id, None)
-        save_exams_file(path, data)
+        # só a nota sai: {subject: {exam_key: {}}} e o arquivo da turma ficam
+        # (a exportação e o GET contam com eles)
+        journal_delete(path, [subject_id, exam_key, student_id], prune=False)
         return {"status": "deleted"}
 
     # 🔥 2) Caso contrário → salvar normalmente
-    score = int(raw)
+    journal_set(path, [subject_id, exam_key, student_id], int(raw))
+
+    return {"status": "ok"}
 
-    if subject_id not in data:
-        data[subject_id] = {}
 
-    if exam_key not in data[subject_id]:
-        data[subject_id][exam_key] = {}
+def score_record(subject_id, exam_key, student_id, score):
+    # mesmos registros do journal_set / journal_delete da rota de uma célula:
+    # score None → remove só a nota do aluno (os níveis pais ficam)
+    keys = [subject_id, exam_key, student_id]
+    if score is None:
+        return ["k", keys]
+    return ["s", keys, score]
 
-    data[subject_id][exam_key][student_id] = score
 
-    save_exams_file(path, data)
+# =========================================================
+# Lançamento em lote (uma gravação por arquivo de turma)
+# =========================================================
 
-    return {"status": "ok"}
+BULK_FIELDS = ("subject_id", "exam_key", "student_id", "score")
 
+
+def parse_score_row(row):
+    """(subject_id, exam_key, student_id, score) validado; ValueError com o motivo."""
+    keys = []
+    for field in BULK_FIELDS[:3]:
+        value = row.get(field)
+        value = "" if value is None else str(value).strip()
+        if not value:
+            raise ValueError(f"{field} is required")
+        keys.append(value)
+
+    raw = row.get("score")
+    if isinstance(raw, str):
+        raw = raw.strip()
+
+    if raw in ("", None):
+        return (*keys, None)
+
+    # XLSX traz números como float: só aceita valores inteiros
+    if isinstance(raw, float) and not raw.is_integer():
+        raise ValueError(f"invalid score: {raw!r}")
+    try:
+        score = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid score: {raw!r}")
+
+    if not 0 <= score <= 100:
+        raise ValueError(f"score out of range (0-100): {score}")
+
+    return (*keys, score)
+
+
+def save_exam_scores(course, grade, class_, year, rows):
+    """
+    rows: [(nº da linha, {subject_id, exam_key, student_id, score})].
+    Valida todas, aplica as válidas num único update_json e devolve o
+    resultado por linha (ok / deleted / error).
+    """
+    results = []
+    valid = []
+
+    for row_no, row in rows:
+        try:
+            parsed = parse_score_row(row)
+        except ValueError as e:
+            results.append({"row": row_no, "status": "error", "detail": str(e)})
+            continue
+
+        valid.append(parsed)
+        results.append({
+            "row": row_no,
+            "status": "ok" if parsed[3] is not None else "deleted",
+            "subject_id": parsed[0],
+            "exam_key": parsed[1],
+            "student_id": parsed[2],
+        })
+
+    if valid:
+        records = [score_record(*parsed) for parsed in valid]
+        update_json(
+            exams_file_path(course, grade, class_, year),
+            lambda data: apply_records(data, records), default={},
+        )
+
+    return {
+        "saved": len(valid),
+        "errors": len(results) - len(valid),
+        "results": results,
+    }
+
+
+@router.post("/class/{course}/{grade}/{class_}/{year}/bulk")
+def save_exam_scores_bulk(course: str, grade: int, class_: str, year: str, payload: dict):
+    """payload: {"scores": [{"subject_id", "exam_key", "student_id", "score"}, ...]}"""
+    scores = payload.get("scores")
+    if not isinstance(scores, list):
+        raise HTTPException(status_code=400, detail="scores must be a list")
+
+    rows = [(i, row if isinstance(row, dict) else {}) for i, row in enumerate(scores)]
+    return save_exam_scores(course, grade, class_, year, rows)
+
+
+def read_upload_rows(filename, raw_bytes):
+    """Linhas de um CSV/XLSX com cabeçalho subject_id, exam_key, student_id, score."""
+    name = filename.lower()
+
+    if name.endswith(".csv"):
+        reader = csv.DictReader(StringIO(raw_bytes.decode("utf-8-sig")))
+        # linha 1 = cabeçalho
+        return [(i, row) for i, row in enumerate(reader, 2)]
+
+    if name.endswith(".xlsx"):
+        wb = load_workbook(BytesIO(raw_bytes), read_only=True, data_only=True)
+        try:
+            sheet = iter(wb.active.iter_rows(values_only=True))
+            header = [str(h).strip() if h is not None else "" for h in next(sheet, ())]
+            return [
+                (i, dict(zip(header, values)))
+                for i, values in enumerate(sheet, 2)
+                if any(v not in (None, "") for v in values)
+            ]
+        finally:
+            wb.close()
+
+    raise HTTPException(status_code=400, detail="CSVまたはXLSXファイルをアップロードしてください")
+
+
+@router.post("/class/{course}/{grade}/{class_}/{year}/bulk/upload")
+def upload_exam_scores(course: str, grade: int, class_: str, year: str,
+                       file: UploadFile = File(...)):
+    # def síncrono: o parse do XLSX e o lock do arquivo rodam no threadpool
+    raw_bytes = file.file.read()
+    rows = read_upload_rows(file.filename or "", raw_bytes)
+
+    if rows:
+        missing = [f for f in BULK_FIELDS if f not in rows[0][1]]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"missing columns: {', '.join(missing)}")
+
+    return save_exam_scores(course, grade, class_, year, rows)
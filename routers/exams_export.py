@@ -1,22 +1,34 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
-from openpyxl import load_workbook
 from io import BytesIO
 from pathlib import Path
 from urllib.parse import quote
-import json
 import re
 
 from routers.students import filter_students
+from utils.storage import read_json
+from services import xlsx_template
 
 router = APIRouter()
 
 BASE_DIR = Path("data/exams")
 SUBJECTS_PATH = Path("data/subjects.json")
 
+# LABEL JP → CHAVE INTERNA DO JSON
+EXAM_KEY_MAP = {
+    "前期中間": "zenki_chukan",
+    "前期期末": "zenki_kimatsu",
+    "後期中間": "koki_chukan",
+    "後期期末": "koki_kimatsu",
+    "単位認定考査": "single_exam"
+}
+
+SHEET_SCORES = "素点入力（テスト）"
+SHEET_PRINT = "印刷"
 
-@router.get("/exams/export")
-def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam_key: str):
+
+def render_exam_scores(course, grade, class_name, year, exam_key):
+    """(bytes do .xlsm, nome do arquivo) da turma no exame."""
 
     # 1. Seleciona template dinâmico por grade
     template_file = f"exam_template_{grade}.xlsm"
@@ -25,13 +37,15 @@ def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam
     if not TEMPLATE_PATH.exists():
         raise HTTPException(404, f"Template Excel para {grade}年 não encontrado.")
 
-    wb = load_workbook(TEMPLATE_PATH, keep_vba=True)
-    ws = wb["素点入力（テスト）"]
+    # template pré-processado (services.xlsx_template): só as células
+    # preenchidas abaixo são regravadas na cópia
+    template = xlsx_template.get(TEMPLATE_PATH)
+    ws = {}
 
     # ------------------------------------------------------------------
     # 1.1 ABA 印刷 → B1 DINÂMICO
     # ------------------------------------------------------------------
-    ws_print = wb["印刷"]
+    ws_print = {}
 
     EXAM_TITLE_MAP = {
         "前期中間": "前期中間考査",
@@ -54,12 +68,10 @@ def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam
     filename = f"{year}-{course}-{grade}-{class_name}.json"
     json_path = BASE_DIR / filename
 
-    if not json_path.exists():
+    exam_data = read_json(json_path)
+    if exam_data is None:
         raise HTTPException(404, "Arquivo de provas não encontrado.")
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        exam_data = json.load(f)
-
     # ------------------------------------------------------------------
     # 3. Carrega alunos
     # ------------------------------------------------------------------
@@ -88,9 +100,7 @@ def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam
     # 4. CABEÇALHO: GRADE E CLASS_NAME EM TODAS AS LINHAS (B e C)
     # ------------------------------------------------------------------
 
-    if ws.merged_cells:
-        for merged in list(ws.merged_cells):
-            ws.unmerge_cells(str(merged))
+    # as células mescladas da planilha são desfeitas no render (unmerge)
 
     grade_num = int(grade)
 
@@ -115,8 +125,7 @@ def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam
     # ------------------------------------------------------------------
     # 6. CARREGA SUBJECTS E MONTA LISTA DE MATÉRIAS
     # ------------------------------------------------------------------
-    with open(SUBJECTS_PATH, "r", encoding="utf-8") as f:
-        subjects_list = json.load(f)
+    subjects_list = read_json(SUBJECTS_PATH, [])
 
     valid_subjects = [
         s for s in subjects_list
@@ -138,13 +147,6 @@ def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam
     # ------------------------------------------------------------------
     # 7. MAPA DE EXAM_KEY (LABEL JP → CHAVE INTERNA DO JSON)
     # ------------------------------------------------------------------
-    EXAM_KEY_MAP = {
-        "前期中間": "zenki_chukan",
-        "前期期末": "zenki_kimatsu",
-        "後期中間": "koki_chukan",
-        "後期期末": "koki_kimatsu",
-        "単位認定考査": "single_exam"
-    }
     real_key = EXAM_KEY_MAP.get(exam_key, exam_key)
 
     # ------------------------------------------------------------------
@@ -156,7 +158,8 @@ def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam
         subject_id = subj["id"]
         subject_group = subj["subject_group"]
 
-        ws.cell(row=2, column=col).value = subject_group
+        col_letter = xlsx_template.column_letter(col)
+        ws[f"{col_letter}2"] = subject_group
 
         row = 3
         subject_exams = exam_data.get(subject_id, {})
@@ -164,7 +167,7 @@ def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam
         for st in students:
             sid = st["id"]
             score = subject_exams.get(real_key, {}).get(sid, "")
-            ws.cell(row=row, column=col).value = score
+            ws[f"{col_letter}{row}"] = score
             row += 1
 
         col += 1
@@ -172,15 +175,21 @@ def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam
     # ------------------------------------------------------------------
     # 9. Salva e retorna
     # ------------------------------------------------------------------
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    content = template.render(
+        {SHEET_SCORES: ws, SHEET_PRINT: ws_print},
+        unmerge=(SHEET_SCORES,),
+    )
+
+    return content, f"{course}-{grade}-{class_name}-{exam_key}.xlsm"
+
 
-    out_name = f"{course}-{grade}-{class_name}-{exam_key}.xlsm"
+@router.get("/exams/export")
+def export_exam_scores(course: str, grade: int, class_name: str, year: str, exam_key: str):
+    content, out_name = render_exam_scores(course, grade, class_name, year, exam_key)
     safe = quote(out_name)
 
     return StreamingResponse(
-        output,
+        BytesIO(content),
         media_type="application/vnd.ms-excel.sheet.macroEnabled.12",
         headers={"Content-Disposition": f"attachment; filename*=UTF-8''{safe}"}
     )
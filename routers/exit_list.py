@@ -1,7 +1,7 @@
 from fastapi import APIRouter
-import json
 import os
 from main import DATA_DIR
+from utils.storage import read_json
 
 router = APIRouter()
 
@@ -18,12 +18,10 @@ def exit_list():
     for event_type, filename in FILES.items():
         path = os.path.join(DATA_DIR, filename)
 
-        if not os.path.exists(path):
+        events = read_json(path)
+        if events is None:
             continue
 
-        with open(path, encoding="utf-8") as f:
-            events = json.load(f)
-
         for e in events:
             year = str(e["school_year"])
 
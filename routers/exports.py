@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from typing import List, Optional
+
+from services import export_jobs
+
+router = APIRouter()
+
+
+class ExportJobPayload(BaseModel):
+    year: str
+    exam_keys: Optional[List[str]] = None   # None → exames com nota em cada turma
+    classlists: bool = True
+
+
+# ---------------------------------------------------------
+# 一括エクスポート（全クラスの素点表 + 名簿）
+# ---------------------------------------------------------
+@router.post("/jobs")
+def create_export_job(payload: ExportJobPayload):
+    return export_jobs.start(payload.year, payload.exam_keys, payload.classlists)
+
+
+@router.get("/jobs/{job_id}")
+def get_export_job(job_id: str):
+    job = export_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    return job
+
+
+@router.get("/jobs/{job_id}/download")
+def download_export_job(job_id: str):
+    job = export_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"ジョブは未完了です ({job['status']})")
+
+    return FileResponse(
+        export_jobs.zip_path(job_id),
+        media_type="application/zip",
+        filename=f"export-{job['year']}-{job_id[:8]}.zip",
+    )
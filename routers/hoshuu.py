@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 import os, json
 
+from utils.storage import update_json
+
 router = APIRouter()
 
 
@@ -21,22 +23,16 @@ def save_hoshuu(payload: dict):
 
     path = hoshuu_file_path(course, grade, class_name, sy)
 
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    else:
-        data = {}
-
-    if student_id not in data:
-        data[student_id] = {}
+    def add_date(data):
+        if student_id not in data:
+            data[student_id] = {}
 
-    if subject_id not in data[student_id]:
-        data[student_id][subject_id] = []
+        if subject_id not in data[student_id]:
+            data[student_id][subject_id] = []
 
-    data[student_id][subject_id].append(date)
+        data[student_id][subject_id].append(date)
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    update_json(path, add_date, default={})
 
     return {"status": "ok"}
 
@@ -1,16 +1,16 @@
 from fastapi import APIRouter, HTTPException
-import json
 import os
 from utils.date import school_year, now_iso
-from main import load_students, save_students, DATA_DIR
+from main import DATA_DIR
+from utils.data import find_student, repository
+from utils.storage import write_json, update_json, exists
 
 router = APIRouter()
 
 JOSEKI_FILE = os.path.join(DATA_DIR, "joseki.json")
 
-if not os.path.exists(JOSEKI_FILE):
-    with open(JOSEKI_FILE, "w", encoding="utf-8") as f:
-        json.dump([], f)
+if not exists(JOSEKI_FILE):
+    write_json(JOSEKI_FILE, [])
 
 
 @router.post("/joseki")
@@ -21,8 +21,7 @@ def joseki_student(payload: dict):
     student_id = payload["student_id"]
     date = payload["date"]
 
-    students = load_students()
-    student = next((s for s in students if s["id"] == student_id), None)
+    student = find_student(student_id)
 
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
@@ -35,15 +34,8 @@ def joseki_student(payload: dict):
         "student": student
     }
 
-    with open(JOSEKI_FILE, encoding="utf-8") as f:
-        joseki = json.load(f)
+    update_json(JOSEKI_FILE, lambda events: events.append(event), default=[])
 
-    joseki.append(event)
-
-    with open(JOSEKI_FILE, "w", encoding="utf-8") as f:
-        json.dump(joseki, f, ensure_ascii=False, indent=2)
-
-    students = [s for s in students if s["id"] != student_id]
-    save_students(students)
+    repository.delete(student_id)
 
     return {"status": "ok"}
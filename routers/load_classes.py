@@ -1,31 +1,31 @@
 from fastapi import APIRouter 
-from utils.data import load_data 
+from utils.data import repository, STUDENTS_FILE
+from utils.etag import conditional
 
 router = APIRouter()
 
 
-@router.get("/classes")
+@router.get("/classes", dependencies=[conditional(STUDENTS_FILE)])
 def get_class_list(course: str | None = None, grade: str | None = None):
-    students = load_data()
-    classes = set()
+    classes = []
 
-    for s in students:
+    # uma entrada por chave do índice de turmas (não varre os alunos)
+    for (c, g, class_name), students in repository.class_groups().items():
         # se course foi enviado, filtra
-        if course is not None and s.get("course") != course:
+        if course is not None and c != course:
             continue
 
         # se grade foi enviado, filtra
-        if grade is not None and str(s.get("grade")) != str(grade):
+        if grade is not None and g != str(grade):
             continue
 
-        class_name = s.get("class_name")
         if not class_name:
             continue
 
-        key = (s.get("course"), s.get("grade"), class_name)
-        classes.add(key)
+        classes.append({
+            "course": c,
+            "grade": students[0].get("grade"),
+            "class_name": class_name
+        })
 
-    return [
-        {"course": c, "grade": g, "class_name": cn}
-        for (c, g, cn) in classes
-    ]
+    return classes
@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException
-from utils.data import load_data, save_data
+from utils.data import update_students
 import json, os
 from datetime import datetime
 
+from utils.storage import read_json, write_json
+from services import attendance_counters
+
 router = APIRouter()
 
 # -----------------------------
@@ -20,14 +23,10 @@ TEACHERS_FILE = os.path.abspath(
 # LOAD / SAVE HELPERS
 # -----------------------------
 def load_graduates():
-    if not os.path.exists(GRAD_FILE):
-        return []
-    with open(GRAD_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return read_json(GRAD_FILE, [])
 
 def save_graduates(data):
-    with open(GRAD_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json(GRAD_FILE, data)
 
 def load_teachers():
     if not os.path.exists(TEACHERS_FILE):
@@ -37,12 +36,10 @@ def load_teachers():
     
 def process_subject_attendance(class_id: str, nendo: int, student: dict):
     path = f"attendance_sub/{class_id}-{nendo}.json"
-    if not os.path.exists(path):
+    data = read_json(path)
+    if data is None:
         return
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
     stats = {}
 
     for date, periods in data.items():
@@ -108,17 +105,6 @@ def find_teachers(teachers, grade, class_name, course):
 # -----------------------------
 # ATTENDANCE HELPERS
 # -----------------------------
-ATTENDANCE_MAP = {
-    "出席": {"attendance": 1},
-    "欠席": {"absence": 1},
-    "遅刻": {"attendance": 1, "late": 1},
-    "早退": {"attendance": 1, "early": 1},
-    "忌引き": {"mourn": 1},
-    "出席停止": {"stopped": 1},
-    "公欠": {"justified": 1},
-    "遅刻と早退": {"attendance": 1, "late": 1, "early": 1}
-}
-
 def get_attempt_suffix(student, prefix):
     attempts = 0
     for key in student.keys():
@@ -126,42 +112,12 @@ def get_attempt_suffix(student, prefix):
             attempts += 1
     return "" if attempts == 0 else f"({attempts + 1})"
 
-def load_attendance_file(path):
-    if not os.path.exists(path):
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
 def calculate_attendance_for_year(student, prefix, course, grade, class_name, nendo):
     class_id = f"{course}-{grade}-{class_name}"
     attendance_file = f"attendance/{class_id}-{nendo}.json"
 
-    data = load_attendance_file(attendance_file)
-
-    school_days = 0
-    counters = {
-        "attendance": 0,
-        "absence": 0,
-        "late": 0,
-        "early": 0,
-        "mourn": 0,
-        "stopped": 0,
-        "justified": 0
-    }
-
-    for date, entry in data.items():
-        if "students" not in entry:
-            continue
-
-        school_days += 1
-
-        status = entry["students"].get(student["id"])
-        if not status:
-            continue
-
-        if status in ATTENDANCE_MAP:
-            for k, v in ATTENDANCE_MAP[status].items():
-                counters[k] += v
+    # contadores da turma (services.attendance_counters)
+    school_days, counters = attendance_counters.student_year(attendance_file, student["id"])
 
     required = school_days - counters["mourn"] - counters["stopped"] - counters["justified"]
     required = max(required, 0)
@@ -194,138 +150,143 @@ def promote_students(payload: dict):
     # normalize promote_ids
     promote_ids = [str(pid).strip() for pid in payload.get("promote_ids", [])]
 
-    students = load_data()
-    graduates = load_graduates()
-    teachers = load_teachers()
-
-    promoted = 0
-    stayed = 0
-    graduated = 0
-
-    new_students = []
-
-    prefix_map = {
-        "1": "1st_year",
-        "2": "2nd_year",
-        "3": "3rd_year"
-    }
-
-    for s in students:
-        s_grade = str(s["grade"])
-        sid = str(s["id"]).strip()
-
-        if s_grade != grade or s.get("course") != payload.get("course"):
-            new_students.append(s)
-            continue
-
-        prefix = prefix_map[grade]
-
-        teacher_names = find_teachers(
-            teachers,
-            s_grade,
-            s.get("class_name", ""),
-            s.get("course", "")
-        )
-
-        # -----------------------------
-        # STATUS DECIDES PROMOTION
-        # -----------------------------
-        student_status = s.get("status", "在籍")
-
-        if student_status in ["休学", "退学"]:
-            this_year = datetime.now().year
-            nendo_num = this_year - 1
+    def apply(students):
+        graduates = load_graduates()
+        teachers = load_teachers()
 
-            s[f"{prefix}_nendo"] = f"{nendo_num}年度"
-            s[f"{prefix}_{nendo_num}_status"] = student_status
+        promoted = 0
+        stayed = 0
+        graduated = 0
 
-            calculate_attendance_for_year(
-                s,
-                prefix,
-                s.get("course", ""),
-                s.get("grade", ""),
-                s.get("class_name", ""),
-                nendo_num
-            )
-
-            process_subject_attendance(
-                f"{s.get('course','')}-{s.get('grade','')}-{s.get('class_name','')}",
-                nendo_num,
-                s
-            )
+        new_students = []
 
-            stayed += 1
-            new_students.append(s)
-            continue
+        prefix_map = {
+            "1": "1st_year",
+            "2": "2nd_year",
+            "3": "3rd_year"
+        }
 
-        # -----------------------------
-        # PROMOTED OR GRADUATED
-        # -----------------------------
-        if sid in promote_ids:
+        for s in students:
+            s_grade = str(s["grade"])
+            sid = str(s["id"]).strip()
 
-            this_year = datetime.now().year
-            nendo = f"{this_year - 1}年度"
+            if s_grade != grade or s.get("course") != payload.get("course"):
+                new_students.append(s)
+                continue
 
-            s[f"{prefix}_class"] = s.get("class_name", "")
-            s[f"{prefix}_attendance_no"] = s.get("attend_no", "")
-            s[f"{prefix}_teachers"] = teacher_names or ""
-            s[f"{prefix}_nendo"] = nendo
+            prefix = prefix_map[grade]
 
-            calculate_attendance_for_year(
-                s,
-                prefix,
-                s.get("course", ""),
-                s.get("grade", ""),
+            teacher_names = find_teachers(
+                teachers,
+                s_grade,
                 s.get("class_name", ""),
-                this_year - 1
+                s.get("course", "")
             )
 
-            process_subject_attendance(
-                f"{s.get('course','')}-{s.get('grade','')}-{s.get('class_name','')}",
-                this_year - 1,
-                s
-            )
+            # -----------------------------
+            # STATUS DECIDES PROMOTION
+            # -----------------------------
+            student_status = s.get("status", "在籍")
+
+            if student_status in ["休学", "退学"]:
+                this_year = datetime.now().year
+                nendo_num = this_year - 1
+
+                s[f"{prefix}_nendo"] = f"{nendo_num}年度"
+                s[f"{prefix}_{nendo_num}_status"] = student_status
+
+                calculate_attendance_for_year(
+                    s,
+                    prefix,
+                    s.get("course", ""),
+                    s.get("grade", ""),
+                    s.get("class_name", ""),
+                    nendo_num
+                )
+
+                process_subject_attendance(
+                    f"{s.get('course','')}-{s.get('grade','')}-{s.get('class_name','')}",
+                    nendo_num,
+                    s
+                )
+
+                stayed += 1
+                new_students.append(s)
+                continue
 
-            if grade == "3":
-                s["graduated_year"] = f"{nendo}3月卒業"
-                s["class_name"] = ""
-                s["attend_no"] = ""
-                graduates.append(s)
-                graduated += 1
+            # -----------------------------
+            # PROMOTED OR GRADUATED
+            # -----------------------------
+            if sid in promote_ids:
+
+                this_year = datetime.now().year
+                nendo = f"{this_year - 1}年度"
+
+                s[f"{prefix}_class"] = s.get("class_name", "")
+                s[f"{prefix}_attendance_no"] = s.get("attend_no", "")
+                s[f"{prefix}_teachers"] = teacher_names or ""
+                s[f"{prefix}_nendo"] = nendo
+
+                calculate_attendance_for_year(
+                    s,
+                    prefix,
+                    s.get("course", ""),
+                    s.get("grade", ""),
+                    s.get("class_name", ""),
+                    this_year - 1
+                )
+
+                process_subject_attendance(
+                    f"{s.get('course','')}-{s.get('grade','')}-{s.get('class_name','')}",
+                    this_year - 1,
+                    s
+                )
+
+                if grade == "3":
+                    s["graduated_year"] = f"{nendo}3月卒業"
+                    s["class_name"] = ""
+                    s["attend_no"] = ""
+                    graduates.append(s)
+                    graduated += 1
+
+                else:
+                    s["grade"] = str(int(grade) + 1)
+                    s["class_name"] = ""
+                    s["attend_no"] = ""
+                    promoted += 1
+                    new_students.append(s)
 
             else:
-                s["grade"] = str(int(grade) + 1)
-                s["class_name"] = ""
-                s["attend_no"] = ""
-                promoted += 1
+                this_year = datetime.now().year
+                nendo = this_year - 1
+
+                s[f"{prefix}_{nendo}"] = "repeated"
+
+                calculate_attendance_for_year(
+                    s,
+                    prefix,
+                    s.get("course", ""),
+                    s.get("grade", ""),
+                    s.get("class_name", ""),
+                    nendo
+                )
+
+                process_subject_attendance(
+                    f"{s.get('course','')}-{s.get('grade','')}-{s.get('class_name','')}",
+                    nendo,
+                    s
+                )
+
+                stayed += 1
                 new_students.append(s)
 
-        else:
-            this_year = datetime.now().year
-            nendo = this_year - 1
-
-            s[f"{prefix}_{nendo}"] = "repeated"
+        # lista de antes do filtro (registros já alterados): base das estatísticas
+        processed = list(students)
+        students[:] = new_students
+        save_graduates(graduates)
+        return promoted, stayed, graduated, processed
 
-            calculate_attendance_for_year(
-                s,
-                prefix,
-                s.get("course", ""),
-                s.get("grade", ""),
-                s.get("class_name", ""),
-                nendo
-            )
-
-            process_subject_attendance(
-                f"{s.get('course','')}-{s.get('grade','')}-{s.get('class_name','')}",
-                nendo,
-                s
-            )
-
-            stayed += 1
-            new_students.append(s)
-
-    save_data(new_students)
-    save_graduates(graduates)
+    promoted, stayed, graduated, students = update_students(apply)
 
     # -----------------------------
     # STATS GENERATION (unchanged)
@@ -370,8 +331,7 @@ def promote_students(payload: dict):
             final_stats[class_id] = stats
 
         out_path = f"data/attendance_stats/{nendo}_total_attendance_{course}.json"
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(final_stats, f, ensure_ascii=False, indent=2)
+        write_json(out_path, final_stats)
 
         def init_term():
             return {
@@ -387,11 +347,6 @@ def promote_students(payload: dict):
                 "attendance_rate": 0
             }
 
-        def add_status(term, status):
-            if status in ATTENDANCE_MAP:
-                for k, v in ATTENDANCE_MAP[status].items():
-                    term[k] += v
-
         def finalize_term(term):
             required = term["school_days"] - term["mourn"] - term["stopped"] - term["justified"]
             required = max(required, 0)
@@ -409,12 +364,10 @@ def promote_students(payload: dict):
             c = info["class_name"]
 
             attendance_path = f"attendance/{course}-{g}-{c}-{nendo_num}.json"
-            if not os.path.exists(attendance_path):
+            view = attendance_counters.get(attendance_path)
+            if view is None:
                 continue
 
-            with open(attendance_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
             class_result = {}
 
             for s in students:
@@ -426,21 +379,19 @@ def promote_students(payload: dict):
                         "total": init_term()
                     }
 
-            for date_str, entry in data.items():
-                dt = datetime.strptime(date_str, "%Y-%m-%d")
-                month = dt.month
-
-                period = "first_term" if month in [4, 5, 6, 7, 8, 9] else "second_term"
-
-                for sid, status in entry.get("students", {}).items():
-                    if sid not in class_result:
-                        continue
+            # contadores materializados da turma (services.attendance_counters)
+            _, per_student = view.terms(
+                lambda ym: "first_term" if int(ym[5:7]) in [4, 5, 6, 7, 8, 9] else "second_term"
+            )
 
-                    class_result[sid][period]["school_days"] += 1
-                    add_status(class_result[sid][period], status)
+            for sid, terms in per_student.items():
+                if sid not in class_result:
+                    continue
 
-                    class_result[sid]["total"]["school_days"] += 1
-                    add_status(class_result[sid]["total"], status)
+                for period, counters in terms.items():
+                    for k, v in counters.items():
+                        class_result[sid][period][k] += v
+                        class_result[sid]["total"][k] += v
 
             for sid in class_result:
                 finalize_term(class_result[sid]["first_term"])
@@ -450,8 +401,7 @@ def promote_students(payload: dict):
             term_stats[class_id] = class_result
 
         out_path2 = f"data/attendance_stats/{nendo}_term_attendance_{course}.json"
-        with open(out_path2, "w", encoding="utf-8") as f:
-            json.dump(term_stats, f, ensure_ascii=False, indent=2)
+        write_json(out_path2, term_stats)
 
     return {
         "promoted": promoted,
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from schemas.student import ReportItem
-from utils.data import load_data, save_data
+from utils.data import find_student, update_student_record
 import uuid
 
 router = APIRouter()
@@ -11,9 +11,7 @@ router = APIRouter()
 # -----------------------------
 @router.get("/{student_id}")
 def get_reports(student_id: str):
-    data = load_data()
-
-    student = next((s for s in data if s["id"] == student_id), None)
+    student = find_student(student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
@@ -25,41 +23,36 @@ def get_reports(student_id: str):
 # -----------------------------
 @router.post("/{student_id}/{year}/{subject_id}")
 def add_report(student_id: str, year: str, subject_id: str, item: ReportItem):
-    data = load_data()
-
-    student = next((s for s in data if s["id"] == student_id), None)
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
-
-    # cria bloco reports se não existir
-    if "reports" not in student:
-        student["reports"] = {}
+    def apply(student):
+        # cria bloco reports se não existir
+        if "reports" not in student:
+            student["reports"] = {}
+
+        # cria bloco do ano se não existir
+        if year not in student["reports"]:
+            student["reports"][year] = {"subjects": {}}
+
+        # cria bloco da matéria se não existir
+        if subject_id not in student["reports"][year]["subjects"]:
+            student["reports"][year]["subjects"][subject_id] = {
+                "required": 0,
+                "submitted": 0,
+                "items": []
+            }
 
-    # cria bloco do ano se não existir
-    if year not in student["reports"]:
-        student["reports"][year] = {"subjects": {}}
-
-    # cria bloco da matéria se não existir
-    if subject_id not in student["reports"][year]["subjects"]:
-        student["reports"][year]["subjects"][subject_id] = {
-            "required": 0,
-            "submitted": 0,
-            "items": []
-        }
-
-    subject_block = student["reports"][year]["subjects"][subject_id]
+        subject_block = student["reports"][year]["subjects"][subject_id]
 
-    # cria ID se não vier
-    new_item = item.dict()
-    if not new_item.get("id"):
-        new_item["id"] = str(uuid.uuid4())
+        # cria ID se não vier
+        new_item = item.dict()
+        if not new_item.get("id"):
+            new_item["id"] = str(uuid.uuid4())
 
-    subject_block["items"].append(new_item)
-    subject_block["submitted"] = len(subject_block["items"])
+        subject_block["items"].append(new_item)
+        subject_block["submitted"] = len(subject_block["items"])
 
-    save_data(data)
+        return {"status": "ok", "item": new_item}
 
-    return {"status": "ok", "item": new_item}
+    return update_student_record(student_id, apply)
 
 
 # -----------------------------
@@ -67,26 +60,22 @@ def add_report(student_id: str, year: str, subject_id: str, item: ReportItem):
 # -----------------------------
 @router.put("/{student_id}/{year}/{subject_id}/{report_id}")
 def update_report(student_id: str, year: str, subject_id: str, report_id: str, item: ReportItem):
-    data = load_data()
-
-    student = next((s for s in data if s["id"] == student_id), None)
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
-
-    try:
-        subject_block = student["reports"][year]["subjects"][subject_id]
-    except KeyError:
-        raise HTTPException(status_code=404, detail="Report not found")
+    def apply(student):
+        try:
+            subject_block = student["reports"][year]["subjects"][subject_id]
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Report not found")
+
+        for i, rep in enumerate(subject_block["items"]):
+            if rep["id"] == report_id:
+                updated = item.dict()
+                updated["id"] = report_id
+                subject_block["items"][i] = updated
+                return {"status": "ok"}
 
-    for i, rep in enumerate(subject_block["items"]):
-        if rep["id"] == report_id:
-            updated = item.dict()
-            updated["id"] = report_id
-            subject_block["items"][i] = updated
-            save_data(data)
-            return {"status": "ok"}
+        raise HTTPException(status_code=404, detail="Report item not found")
 
-    raise HTTPException(status_code=404, detail="Report item not found")
+    return update_student_record(student_id, apply)
 
 
 # -----------------------------
@@ -94,26 +83,21 @@ def update_report(student_id: str, year: str, subject_id: str, report_id: str, i
 # -----------------------------
 @router.delete("/{student_id}/{year}/{subject_id}/{report_id}")
 def delete_report(student_id: str, year: str, subject_id: str, report_id: str):
-    data = load_data()
-
-    student = next((s for s in data if s["id"] == student_id), None)
-    if not student:
-        raise HTTPException(status_code=404, detail="Student not found")
+    def apply(student):
+        try:
+            subject_block = student["reports"][year]["subjects"][subject_id]
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Report not found")
 
-    try:
-        subject_block = student["reports"][year]["subjects"][subject_id]
-    except KeyError:
-        raise HTTPException(status_code=404, detail="Report not found")
+        before = len(subject_block["items"])
+        subject_block["items"] = [r for r in subject_block["items"] if r["id"] != report_id]
+        after = len(subject_block["items"])
 
-    before = len(subject_block["items"])
-    subject_block["items"] = [r for r in subject_block["items"] if r["id"] != report_id]
-    after = len(subject_block["items"])
-
-    if before == after:
-        raise HTTPException(status_code=404, detail="Report item not found")
+        if before == after:
+            raise HTTPException(status_code=404, detail="Report item not found")
 
-    subject_block["submitted"] = after
+        subject_block["submitted"] = after
 
-    save_data(data)
+        return {"status": "ok"}
 
-    return {"status": "ok"}
+    return update_student_record(student_id, apply)
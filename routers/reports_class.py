@@ -1,19 +1,12 @@
 from fastapi import APIRouter, HTTPException
-from utils.data import load_data
+from utils.data import repository
 
 router = APIRouter()
 
 @router.get("/class/{course}/{grade}/{class_name}/reports")
 def get_class_reports(course: str, grade: str, class_name: str, subject_id: str):
-    data = load_data()
-
-    # filtrar alunos da turma
-    students = [
-        s for s in data
-        if s.get("course") == course
-        and s.get("grade") == grade
-        and s.get("class_name") == class_name
-    ]
+    # alunos da turma (índice por course/grade/class_name)
+    students = repository.by_class(course, grade, class_name)
 
     result = []
 
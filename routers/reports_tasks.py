@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-import os, json
+import os
+
+from utils.storage import read_json, write_json, update_json, locked, journal_set
 
 router = APIRouter()
 
@@ -26,16 +28,7 @@ def build_path(course, grade, class_name, year_key):
 
 
 def load_json(path, default):
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return default
-
-
-def save_json(path, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    return read_json(path, default)
 
 
 # ---------------------------------------------------------
@@ -68,21 +61,21 @@ def create_task(course: str, grade: str, class_name: str,
     path = build_path(course, grade, class_name, year_key)
     print("CREATE TASK →", path)
 
-    report = load_json(path, {"subjects": {}})
+    def add_task(report):
+        subject = report["subjects"].setdefault(subject_id, {
+            "required": 0,
+            "tasks": []
+        })
 
-    subject = report["subjects"].setdefault(subject_id, {
-        "required": 0,
-        "tasks": []
-    })
+        subject["tasks"].append({
+            "date": payload.date,
+            "label": payload.label,
+            "submitted": []
+        })
 
-    subject["tasks"].append({
-        "date": payload.date,
-        "label": payload.label,
-        "submitted": []
-    })
+        return {"status": "ok"}
 
-    save_json(path, report)
-    return {"status": "ok"}
+    return update_json(path, add_task, default={"subjects": {}})
 
 
 # ---------------------------------------------------------
@@ -95,26 +88,28 @@ def toggle_task(course: str, grade: str, class_name: str,
     path = build_path(course, grade, class_name, year_key)
     print("TOGGLE TASK →", path)
 
-    report = load_json(path, {"subjects": {}})
+    # clique por célula: grava só a lista de tarefas da matéria (modo journal)
+    with locked(path):
+        report = load_json(path, {"subjects": {}})
+        subject = report["subjects"].get(subject_id, {
+            "required": 0,
+            "tasks": []
+        })
 
-    subject = report["subjects"].setdefault(subject_id, {
-        "required": 0,
-        "tasks": []
-    })
+        tasks = subject["tasks"]
 
-    tasks = subject["tasks"]
+        if task_index >= len(tasks):
+            return {"status": "error", "detail": "task_index inválido"}
 
-    if task_index >= len(tasks):
-        return {"status": "error", "detail": "task_index inválido"}
+        submitted = tasks[task_index].setdefault("submitted", [])
 
-    submitted = tasks[task_index].setdefault("submitted", [])
+        if student_id in submitted:
+            submitted.remove(student_id)
+        else:
+            submitted.append(student_id)
 
-    if student_id in submitted:
-        submitted.remove(student_id)
-    else:
-        submitted.append(student_id)
+        journal_set(path, ["subjects", subject_id], subject)
 
-    save_json(path, report)
     return {"status": "ok"}
 
 
@@ -128,21 +123,22 @@ def edit_task(course: str, grade: str, class_name: str,
     path = build_path(course, grade, class_name, year_key)
     print("EDIT TASK →", path)
 
-    report = load_json(path, {"subjects": {}})
-
-    subject = report["subjects"].setdefault(subject_id, {
-        "required": 0,
-        "tasks": []
-    })
+    # índice conferido antes de alterar: no erro nada é gravado
+    with locked(path):
+        report = load_json(path, {"subjects": {}})
+        subject = report["subjects"].get(subject_id, {
+            "required": 0,
+            "tasks": []
+        })
 
-    tasks = subject["tasks"]
+        tasks = subject["tasks"]
 
-    if task_index >= len(tasks):
-        return {"status": "error", "detail": "task_index inválido"}
+        if task_index >= len(tasks):
+            return {"status": "error", "detail": "task_index inválido"}
 
-    tasks[task_index]["label"] = payload.label
+        tasks[task_index]["label"] = payload.label
+        write_json(path, report)
 
-    save_json(path, report)
     return {"status": "ok"}
 
 
@@ -156,19 +152,20 @@ def delete_task(course: str, grade: str, class_name: str,
     path = build_path(course, grade, class_name, year_key)
     print("DELETE TASK →", path)
 
-    report = load_json(path, {"subjects": {}})
-
-    subject = report["subjects"].setdefault(subject_id, {
-        "required": 0,
-        "tasks": []
-    })
+    # índice conferido antes de alterar: no erro nada é gravado
+    with locked(path):
+        report = load_json(path, {"subjects": {}})
+        subject = report["subjects"].get(subject_id, {
+            "required": 0,
+            "tasks": []
+        })
 
-    tasks = subject["tasks"]
+        tasks = subject["tasks"]
 
-    if task_index < 0 or task_index >= len(tasks):
-        return {"status": "error", "detail": "task_index inválido"}
+        if task_index < 0 or task_index >= len(tasks):
+            return {"status": "error", "detail": "task_index inválido"}
 
-    tasks.pop(task_index)
+        tasks.pop(task_index)
+        write_json(path, report)
 
-    save_json(path, report)
     return {"status": "ok"}
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException
 import os
 import json
 
+from utils.storage import update_json
+
 router = APIRouter()
 
 SAIRISHUU_FILE = os.path.abspath(
@@ -17,9 +19,9 @@ def load_sairishuu():
     with open(SAIRISHUU_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def save_sairishuu(data):
-    with open(SAIRISHUU_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def update_sairishuu(fn):
+    # read-modify-write sob o lock do arquivo; HTTPException dentro de fn não grava nada
+    return update_json(SAIRISHUU_FILE, fn, default={})
 
 # -----------------------------
 # GET → retornar JSON completo
@@ -39,20 +41,19 @@ def add_sairishuu(payload: dict):
     if not student_id or not subject_id:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_sairishuu()
-
-    if student_id not in data:
-        data[student_id] = {}
+    def add(data):
+        if student_id not in data:
+            data[student_id] = {}
 
-    if subject_id not in data[student_id]:
-        data[student_id][subject_id] = {
-            "status": "pending",
-            "done_dates": [],
-            "evaluation": None,
-            "kanten": None
-        }
+        if subject_id not in data[student_id]:
+            data[student_id][subject_id] = {
+                "status": "pending",
+                "done_dates": [],
+                "evaluation": None,
+                "kanten": None
+            }
 
-    save_sairishuu(data)
+    update_sairishuu(add)
     return {"status": "added"}
 
 # -----------------------------
@@ -66,18 +67,18 @@ def remove_sairishuu(payload: dict):
     if not student_id or not subject_id:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_sairishuu()
+    def drop(data):
+        if student_id in data and subject_id in data[student_id]:
+            del data[student_id][subject_id]
 
-    if student_id in data and subject_id in data[student_id]:
-        del data[student_id][subject_id]
+            if len(data[student_id]) == 0:
+                del data[student_id]
 
-        if len(data[student_id]) == 0:
-            del data[student_id]
+            return {"status": "removed"}
 
-        save_sairishuu(data)
-        return {"status": "removed"}
+        return {"status": "not_found"}
 
-    return {"status": "not_found"}
+    return update_sairishuu(drop)
 
 # -----------------------------
 # ADD_DATE → registrar 1 回 de 再履修
@@ -91,24 +92,22 @@ def add_rishuu_date(payload: dict):
     if not student_id or not subject_id or not date:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_sairishuu()
-
-    if student_id not in data or subject_id not in data[student_id]:
-        raise HTTPException(status_code=404, detail="Record not found")
+    def add_date(data):
+        if student_id not in data or subject_id not in data[student_id]:
+            raise HTTPException(status_code=404, detail="Record not found")
 
-    entry = data[student_id][subject_id]
+        entry = data[student_id][subject_id]
 
-    if entry["status"] == "passed":
-        raise HTTPException(status_code=400, detail="Already completed")
+        if entry["status"] == "passed":
+            raise HTTPException(status_code=400, detail="Already completed")
 
-    # adicionar data
-    if "done_dates" not in entry:
-        entry["done_dates"] = []
+        # adicionar data
+        if "done_dates" not in entry:
+            entry["done_dates"] = []
 
-    entry["done_dates"].append(date)
+        entry["done_dates"].append(date)
 
-
-    save_sairishuu(data)
+    update_sairishuu(add_date)
     return {"status": "date_added"}
 
 # -----------------------------
@@ -123,17 +122,16 @@ def complete_sairishuu(payload: dict):
     if not student_id or not subject_id or not school_year:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_sairishuu()
-
-    if student_id not in data or subject_id not in data[student_id]:
-        raise HTTPException(status_code=404, detail="Record not found")
+    def complete(data):
+        if student_id not in data or subject_id not in data[student_id]:
+            raise HTTPException(status_code=404, detail="Record not found")
 
-    entry = data[student_id][subject_id]
+        entry = data[student_id][subject_id]
 
-    entry["status"] = "passed"
-    entry["school_year"] = school_year
-    entry["evaluation"] = 3
-    entry["kanten"] = "BBB"
+        entry["status"] = "passed"
+        entry["school_year"] = school_year
+        entry["evaluation"] = 3
+        entry["kanten"] = "BBB"
 
-    save_sairishuu(data)
+    update_sairishuu(complete)
     return {"status": "completed"}
@@ -1,13 +1,14 @@
 from fastapi import APIRouter
 from models.seating import SeatingPreference
-from utils.seating_data import load_seating_prefs, save_seating_prefs
+from utils.seating_data import load_seating_prefs, save_seating_prefs, PREF_FILE as PREFS_PATH
+from utils.etag import conditional
 
 router = APIRouter()
 
 PREF_FILE = "data/seating_preferences.json"
 
 
-@router.get("/preference") 
+@router.get("/preference", dependencies=[conditional(PREFS_PATH)])
 async def get_preference(course: str, grade: int, class_name: str): 
     prefs = load_seating_prefs() 
     key = f"{course}-{grade}-{class_name}" 
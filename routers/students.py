@@ -1,8 +1,16 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Response, Query
 from fastapi.responses import StreamingResponse
-from schemas.student import StudentCreate, StudentUpdate, StudentOut
-from utils.data import load_data, save_data
+from schemas.student import StudentCreate, StudentUpdate, StudentOut, StudentSummary, StudentPage
+from utils.data import (
+    get_students, find_student, update_students,
+    update_student_record, repository, StudentNotFound, STUDENTS_FILE,
+)
 from utils.id_generator import generate_student_id
+from utils.storage import read_json, write_json
+from utils.formatter import hira_to_kata
+from utils.etag import conditional
+from utils.jsonio import json_response
+from services import student_search
 from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
@@ -12,6 +20,8 @@ import json
 import csv
 import io
 import hashlib
+import threading
+import bisect
 import openpyxl
 from io import BytesIO
 
@@ -36,18 +46,78 @@ def normalize_course(course):
 
 # =========================================================
 
-def hira_to_kata(text: str) -> str:
-    if not text:
-        return ""
+def with_str_attend_no(s: dict) -> dict:
+    # cópia rasa: os registros do cache são compartilhados entre requests
+    if s.get("attend_no") is None:
+        return s
+    return {**s, "attend_no": str(s["attend_no"])}
+
+
+INACTIVE_STATUSES = ["卒業", "退学", "転出", "休学"]
+
+SUMMARY_FIELDS = tuple(StudentSummary.model_fields)
+
+
+# ---------------------------------------------------------
+# StudentOut validado uma vez por versão do registro
+# ---------------------------------------------------------
+# Os registros do StudentRepository não são alterados no lugar (uma
+# escrita troca o objeto), então o StudentOut já validado de cada
+# registro fica guardado pela identidade dele enquanto estiver no
+# snapshot. As rotas devolvem esses dicts com json_response(), sem o
+# response_model revalidar todos os alunos (e os reports) a cada request.
+_out_cache = {"records": None, "live": frozenset(), "out": {}}
+_out_lock = threading.Lock()
+
+
+def students_out(records) -> list:
+    """StudentOut (dict JSON) de cada registro — somente leitura."""
+    snapshot = repository.all()
+
+    with _out_lock:
+        if _out_cache["records"] is not snapshot:
+            live = frozenset(map(id, snapshot))
+            _out_cache["out"] = {k: v for k, v in _out_cache["out"].items() if k in live}
+            _out_cache["live"] = live
+            _out_cache["records"] = snapshot
+        live, cached = _out_cache["live"], _out_cache["out"]
+
     result = []
-    for ch in text:
-        code = ord(ch)
-        # Hiragana range
-        if 0x3041 <= code <= 0x3096:
-            result.append(chr(code + 0x60))  # shift to Katakana block
+    new = {}
+    for s in records:
+        hit = cached.get(id(s))
+        if hit is not None and hit[0] is s:
+            out = hit[1]
         else:
-            result.append(ch)
-    return "".join(result)
+            out = StudentOut.model_validate(with_str_attend_no(s)).model_dump(mode="json")
+            # só registros do snapshot atual (uma cópia solta não volta a ser pedida);
+            # o registro fica junto para o id() não ser reaproveitado por outro objeto
+            if id(s) in live:
+                new[id(s)] = (s, out)
+        result.append(out)
+
+    # o dict do cache só muda com o lock (a troca de snapshot itera sobre ele)
+    if new:
+        with _out_lock:
+            if _out_cache["out"] is cached:
+                cached.update(new)
+    return result
+
+
+def parse_fields(fields: str | None):
+    """"name,kana,grade" → ("id", "name", "kana", "grade") (None se não veio)."""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    return ("id", *(f for f in dict.fromkeys(names) if f != "id"))
+
+
+def project(s: dict, fields) -> dict:
+    # só os campos pedidos (attend_no como string, igual às outras listagens)
+    out = {f: s[f] for f in fields if f in s}
+    if out.get("attend_no") is not None:
+        out["attend_no"] = str(out["attend_no"])
+    return out
 
 
 router = APIRouter()
@@ -64,9 +134,9 @@ def find_photo(student_id: str):
 # ---------------------------------------------------------
 # コース別の名簿ダウンロード
 # ---------------------------------------------------------
-@router.get("/classlist/export")
-def download_all_classes(grade: str, course: str | None = None):
-    data = load_data()
+def render_classlist(grade: str, course: str | None = None):
+    """(bytes do .xlsx com uma aba por turma, nome do arquivo) do ano/curso."""
+    data = get_students()
 
     students = [
         s for s in data
@@ -109,7 +179,6 @@ def download_all_classes(grade: str, course: str | None = None):
 
     stream = BytesIO()
     wb.save(stream)
-    stream.seek(0)
 
     course_code_map = {
         "全": "z",
@@ -121,8 +190,15 @@ def download_all_classes(grade: str, course: str | None = None):
 
     filename = f"{grade}_{course_code}_classes.xlsx"
 
+    return stream.getvalue(), filename
+
+
+@router.get("/classlist/export")
+def download_all_classes(grade: str, course: str | None = None):
+    content, filename = render_classlist(grade, course)
+
     return Response(
-        content=stream.read(),
+        content=content,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -130,34 +206,32 @@ def download_all_classes(grade: str, course: str | None = None):
 # ---------------------------------------------------------
 # 在校生一覧
 # ---------------------------------------------------------
-@router.get("/", response_model=list[StudentOut])
-def list_students(grade: str | None = None):
-    data = load_data()
+@router.get("/", response_model=list[StudentOut], dependencies=[conditional(STUDENTS_FILE)])
+def list_students(response: Response, grade: str | None = None):
+    data = get_students()
 
-    for s in data:
-        if s.get("attend_no") is not None:
-            s["attend_no"] = str(s["attend_no"])
-
-    EXCLUDED = ["卒業", "退学", "転出", "休学"]
-
-    active = [s for s in data if s.get("status", "在籍") not in EXCLUDED]
+    active = [
+        s
+        for s in data
+        if s.get("status", "在籍") not in INACTIVE_STATUSES
+    ]
 
     if grade:
-        return [s for s in active if s["grade"] == grade]
+        active = [s for s in active if s["grade"] == grade]
 
-    return active
+    return json_response(students_out(active), response)
 
 # ---------------------------------------------------------
 # フィルター
 # ---------------------------------------------------------
-@router.get("/filter")
+@router.get("/filter", dependencies=[conditional(STUDENTS_FILE)])
 def filter_students(
     grade: str,
     course: str | None = None,
     gender: str | None = None,
     class_name: str | None = None
 ):
-    data = load_data()
+    data = get_students()
 
     course_map = {
         "full": "全",
@@ -202,15 +276,8 @@ def filter_students(
 # ---------------------------------------------------------
 @router.get("/search")
 def search_students(keyword: str):
-    data = load_data()
-    keyword = keyword.lower()
-
-    return [
-        s for s in data
-        if keyword in s["name"].lower()
-        or keyword in s["kana"].lower()
-        or keyword in s["id"].lower()
-    ]
+    # índice em memória (services.student_search): name / kana / id
+    return student_search.search_students(keyword, phones=False)
 
 # ---------------------------------------------------------
 # CSV テンプレート
@@ -237,39 +304,19 @@ def download_template_csv():
 # ---------------------------------------------------------
 @router.get("/graduates")
 def list_graduates(year: int | None = None):
-    path = "data/graduates.json"
-    if not os.path.exists(path):
-        return []
-
-    with open(path, "r", encoding="utf-8") as f:
-        grads = json.load(f)
+    grads = student_search.graduates()
 
     if year is not None:
         grads = [g for g in grads if g.get("graduated_year") == year]
 
-    grads.sort(key=lambda g: g.get("id", ""))
-    return grads
+    return sorted(grads, key=lambda g: g.get("id", ""))
 
 # ---------------------------------------------------------
 # 卒業生検索
 # ---------------------------------------------------------
 @router.get("/graduates/search")
 def search_graduates(keyword: str):
-    path = "data/graduates.json"
-    if not os.path.exists(path):
-        return []
-
-    with open(path, "r", encoding="utf-8") as f:
-        grads = json.load(f)
-
-    keyword = keyword.lower()
-
-    return [
-        g for g in grads
-        if keyword in g["name"].lower()
-        or keyword in g["kana"].lower()
-        or keyword in g["id"].lower()
-    ]
+    return student_search.search_graduates(keyword)
 
 # ---------------------------------------------------------
 # 卒業生個別
@@ -278,13 +325,10 @@ def search_graduates(keyword: str):
 def get_graduate(student_id: str):
     student_id = student_id.lower()
 
-    path = "data/graduates.json"
-    if not os.path.exists(path):
+    grads = read_json("data/graduates.json")
+    if grads is None:
         raise HTTPException(status_code=404, detail="No graduates data")
 
-    with open(path, "r", encoding="utf-8") as f:
-        grads = json.load(f)
-
     for s in grads:
         if s["id"].lower() == student_id:
             return s
@@ -333,115 +377,116 @@ async def import_students_csv(file: UploadFile = File(...)):
     stream = io.StringIO(text)
     reader = csv.DictReader(stream, delimiter=",", quotechar='"')
 
+    def apply(students):
+        original_count = len(students)
+
+        mapping = {
+            "ID（新入生なら空欄）": "id",
+            "学年（新入生なら空欄）":"grade",
+            "名前": "name",
+            "ふりがな": "kana",
+            "性別": "gender",
+            "生年月日(例：2007/01/10)": "birth_date",
+            "入学年月日(例：2026/04/01)": "admission_date",
+            "編入学": "transfer_advanced_date",
+            "転入学": "transfer_date",
+            "前在籍校": "previous_school",
+            "課程": "course_type",
+            "前在籍校住所": "previous_school_address",
+            "出身中学校": "junior_high",
+            "中学校の卒業年月日": "junior_high_grad_date",
+            "〒": "postal_code",
+            "住所１（番地まで）": "address1",
+            "住所２（アパート・マンション名など）": "address2",
+            "電話番号": "phone",
+            "電話ラベル（父、母、自宅）": "phone_label",
+            "父": "father",
+            "母": "mother",
+            "保護者名１": "guardian1",
+            "保護者名１ふりがな": "guardian1_kana",
+            "保護者住所": "guardian_address",
+            "家庭（緊急）連絡先①": "emergency1",
+            "ラベル①（例:父）": "emergency1label",
+            "家庭（緊急）連絡先②": "emergency2",
+            "ラベル②": "emergency2label",
+            "つながりやすい時間帯": "contact_time",
+            "備考①": "note1",
+            "備考②": "note2",
+            "通学方法": "commute",
+            "１年のクラス（新入生なら空欄）": "class_grade1", 
+            "1年の出席番号（新入生なら空欄）": "number_grade1",
+            "1年の担任（新入生なら空欄）": "teacher_grade1",
+            "2年のクラス（新入生・1年生なら空欄）": "class_grade2", 
+            "2年の出席番号（新入生・1年生なら空欄）": "number_grade2", 
+            "2年の担任（新入生・1年生なら空欄）": "teacher_grade2"
+        }
 
-    students = load_data()
-    original_count = len(students)
-
-    mapping = {
-        "ID（新入生なら空欄）": "id",
-        "学年（新入生なら空欄）":"grade",
-        "名前": "name",
-        "ふりがな": "kana",
-        "性別": "gender",
-        "生年月日(例：2007/01/10)": "birth_date",
-        "入学年月日(例：2026/04/01)": "admission_date",
-        "編入学": "transfer_advanced_date",
-        "転入学": "transfer_date",
-        "前在籍校": "previous_school",
-        "課程": "course_type",
-        "前在籍校住所": "previous_school_address",
-        "出身中学校": "junior_high",
-        "中学校の卒業年月日": "junior_high_grad_date",
-        "〒": "postal_code",
-        "住所１（番地まで）": "address1",
-        "住所２（アパート・マンション名など）": "address2",
-        "電話番号": "phone",
-        "電話ラベル（父、母、自宅）": "phone_label",
-        "父": "father",
-        "母": "mother",
-        "保護者名１": "guardian1",
-        "保護者名１ふりがな": "guardian1_kana",
-        "保護者住所": "guardian_address",
-        "家庭（緊急）連絡先①": "emergency1",
-        "ラベル①（例:父）": "emergency1label",
-        "家庭（緊急）連絡先②": "emergency2",
-        "ラベル②": "emergency2label",
-        "つながりやすい時間帯": "contact_time",
-        "備考①": "note1",
-        "備考②": "note2",
-        "通学方法": "commute",
-        "１年のクラス（新入生なら空欄）": "class_grade1", 
-        "1年の出席番号（新入生なら空欄）": "number_grade1",
-        "1年の担任（新入生なら空欄）": "teacher_grade1",
-        "2年のクラス（新入生・1年生なら空欄）": "class_grade2", 
-        "2年の出席番号（新入生・1年生なら空欄）": "number_grade2", 
-        "2年の担任（新入生・1年生なら空欄）": "teacher_grade2"
-    }
+        for row in reader:
+            converted = {}
 
-    for row in reader:
-        converted = {}
+            for k, v in row.items():
+                if "コース" in k:
+                    converted["course"] = v.strip()
+                    continue
+                if k in mapping:
+                    converted[mapping[k]] = v.strip()
 
-        for k, v in row.items():
-            if "コース" in k:
-                converted["course"] = v.strip()
-                continue
-            if k in mapping:
-                converted[mapping[k]] = v.strip()
+            raw_course = converted.get("course", "").strip()
 
-        raw_course = converted.get("course", "").strip()
+            if "全" in raw_course: 
+                course_code = "z" 
+                converted["course"] = "全" 
+            elif "水" in raw_course: 
+                course_code = "w" 
+                converted["course"] = "水" 
+            elif "集" in raw_course: 
+                course_code = "s" 
+                converted["course"] = "集" 
+            else: raise HTTPException(status_code=400, detail=f"コースが判別できません: {raw_course}")
 
-        if "全" in raw_course: 
-            course_code = "z" 
-            converted["course"] = "全" 
-        elif "水" in raw_course: 
-            course_code = "w" 
-            converted["course"] = "水" 
-        elif "集" in raw_course: 
-            course_code = "s" 
-            converted["course"] = "集" 
-        else: raise HTTPException(status_code=400, detail=f"コースが判別できません: {raw_course}")
+            year = extract_year(converted)
 
-        year = extract_year(converted)
+            # --- VERIFICAÇÃO DE DUPLICIDADE --- 
+            duplicate = False 
+            for s in students: 
+                if ( 
+                    s.get("name") == converted.get("name") and 
+                    s.get("birth_date") == converted.get("birth_date") and 
+                    s.get("guardian1") == converted.get("guardian1") and 
+                    s.get("address1") == converted.get("address1") 
+                ): 
+                    duplicate = True 
+                    break 
+            if duplicate: 
+                continue 
+            # ----------------------------------
 
-        # --- VERIFICAÇÃO DE DUPLICIDADE --- 
-        duplicate = False 
-        for s in students: 
-            if ( 
-                s.get("name") == converted.get("name") and 
-                s.get("birth_date") == converted.get("birth_date") and 
-                s.get("guardian1") == converted.get("guardian1") and 
-                s.get("address1") == converted.get("address1") 
-            ): 
-                duplicate = True 
-                break 
-        if duplicate: 
-            continue 
-        # ----------------------------------
+            raw_id = converted.get("id", "").strip().lower()
+            if raw_id:
+                converted["id"] = raw_id
+            else:
+                converted["id"] = generate_student_id(year, course_code, students)
 
-        raw_id = converted.get("id", "").strip().lower()
-        if raw_id:
-            converted["id"] = raw_id
-        else:
-            converted["id"] = generate_student_id(year, course_code, students)
+            if not converted.get("grade"):
+                converted["grade"] = "1"
 
-        if not converted.get("grade"):
-            converted["grade"] = "1"
+            converted["class_name"] = converted.get("class_name", "")
 
-        converted["class_name"] = converted.get("class_name", "")
+            # ----------------------------------
 
-        # ----------------------------------
+            if "status" not in converted or not converted["status"]:
+                converted["status"] = "在籍"
 
-        if "status" not in converted or not converted["status"]:
-            converted["status"] = "在籍"
+            students.append(converted)
 
-        students.append(converted)
-        
-    save_data(students)
+        return len(students) - original_count
+
+    added = update_students(apply)
 
     with open(hash_path, "w", encoding="utf-8") as f:
         f.write(csv_hash)
 
-    return {"added": len(students) - original_count}
+    return {"added": added}
 
 # ---------------------------------------------------------
 # 生徒登録（個別）
@@ -449,41 +494,41 @@ async def import_students_csv(file: UploadFile = File(...)):
 
 @router.post("/", response_model=StudentOut)
 def create_student(student: StudentCreate):
-    data = load_data()
-
     data_dict = student.dict()
 
-    # --- VERIFICAÇÃO DE DUPLICIDADE --- 
-    for s in data: 
-        if (
-            s.get("name") == data_dict.get("name") and 
-            s.get("birth_date") == data_dict.get("birth_date") and 
-            s.get("guardian1") == data_dict.get("guardian1") and 
-            s.get("address1") == data_dict.get("address1") 
-        ): 
-            raise HTTPException(status_code=400, detail="duplicate_student") 
-    # ----------------------------------
-    raw_course = data_dict.get("course", "").strip()
-
-    if "全" in raw_course:
-        course_code = "z"
-    elif "水" in raw_course:
-        course_code = "w"
-    elif "集" in raw_course:
-        course_code = "s"
-    else:
-        raise HTTPException(status_code=400, detail=f"コースが判別できません: {raw_course}")
-
-    year = extract_year(data_dict)
-
-    new_id = generate_student_id(year, course_code, data)
-    data_dict["id"] = new_id.lower()
-
-    data_dict["status"] = "在籍"
-
-    data.append(data_dict)
-    save_data(data)
-    
+    def apply(data):
+        # --- VERIFICAÇÃO DE DUPLICIDADE --- 
+        for s in data: 
+            if (
+                s.get("name") == data_dict.get("name") and 
+                s.get("birth_date") == data_dict.get("birth_date") and 
+                s.get("guardian1") == data_dict.get("guardian1") and 
+                s.get("address1") == data_dict.get("address1") 
+            ): 
+                raise HTTPException(status_code=400, detail="duplicate_student") 
+        # ----------------------------------
+        raw_course = data_dict.get("course", "").strip()
+
+        if "全" in raw_course:
+            course_code = "z"
+        elif "水" in raw_course:
+            course_code = "w"
+        elif "集" in raw_course:
+            course_code = "s"
+        else:
+            raise HTTPException(status_code=400, detail=f"コースが判別できません: {raw_course}")
+
+        year = extract_year(data_dict)
+
+        new_id = generate_student_id(year, course_code, data)
+        data_dict["id"] = new_id.lower()
+
+        data_dict["status"] = "在籍"
+
+        data.append(data_dict)
+
+    update_students(apply)
+
     return data_dict
 
 # ---------------------------------------------------------
@@ -491,61 +536,50 @@ def create_student(student: StudentCreate):
 # ---------------------------------------------------------
 @router.put("/{student_id}", response_model=StudentOut)
 def update_student(student_id: str, student: StudentUpdate):
-    student_id = student_id.lower()
-
-    data = load_data()
-    for s in data:
-        if s["id"].lower() == student_id:
-
-
-            # Impede alteração do ID 
-            update_data = student.dict() 
-            update_data.pop("id", None)
-
-            for k, v in update_data.items():
-                if v is not None:
-                    s[k] = v
+    def apply(s):
+        # Impede alteração do ID 
+        update_data = student.dict() 
+        update_data.pop("id", None)
 
-            photo = find_photo(s["id"])
-            s["photo"] = photo
+        for k, v in update_data.items():
+            if v is not None:
+                s[k] = v
 
-            save_data(data)
+        photo = find_photo(s["id"])
+        s["photo"] = photo
 
-            return s
+        return s
 
-    raise HTTPException(status_code=404, detail="Student not found")
+    # o registro gravado já entra validado no cache das leituras
+    return json_response(students_out([update_student_record(student_id, apply)])[0])
 
 # ---------------------------------------------------------
 # 生徒削除
 # ---------------------------------------------------------
 @router.delete("/{student_id}")
 def delete_student(student_id: str):
-    student_id = student_id.lower()
-
-    data = load_data()
-    new_data = [s for s in data if s["id"].lower() != student_id]
-
-    if len(new_data) == len(data):
+    try:
+        repository.delete(student_id)
+    except StudentNotFound:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    save_data(new_data)
     return {"status": "deleted"}
 
 # ---------------------------------------------------------
 # 学年一覧
 # ---------------------------------------------------------
-@router.get("/grades")
+@router.get("/grades", dependencies=[conditional(STUDENTS_FILE)])
 def get_grades():
-    data = load_data()
+    data = get_students()
     grades = sorted({s.get("grade") for s in data if s.get("grade")})
     return grades
 
 # ---------------------------------------------------------
 # クラス一覧
 # ---------------------------------------------------------
-@router.get("/classes/{grade}")
+@router.get("/classes/{grade}", dependencies=[conditional(STUDENTS_FILE)])
 def get_classes(grade: str):
-    data = load_data()
+    data = get_students()
     classes = sorted({
         s.get("class_name")
         for s in data
@@ -559,18 +593,11 @@ def get_classes(grade: str):
 # ------------------------------------休学生徒一覧---------------------
 @router.get("/suspended", response_model=list[StudentOut])
 def list_suspended_students():
-    data = load_data()
-
-    suspended = [s for s in data if s.get("status") == "休学"]
-
-    for s in suspended:
-        if s.get("attend_no") is not None:
-            s["attend_no"] = str(s["attend_no"])
-
-        photo = find_photo(s["id"])
-        s["photo"] = photo
-
-    return suspended
+    suspended = repository.by_status("休学")
+    return json_response([
+        {**out, "photo": find_photo(s["id"])}
+        for s, out in zip(suspended, students_out(suspended))
+    ])
 
 class Seat(BaseModel): 
     row: int
@@ -605,8 +632,7 @@ def load_seating():
 
 
 def save_seating_json(data):
-    with open(SEATING_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json(SEATING_FILE, data)
 
 
 def reset_seating_json():
@@ -672,8 +698,7 @@ def get_seating(
 
         layout = data[key]
 
-        from utils.data import load_data
-        valid_ids = {s.get("id") for s in load_data() if s.get("id")}
+        valid_ids = {s.get("id") for s in get_students() if s.get("id")}
         layout = sanitize_layout(layout, valid_ids)
 
         return layout
@@ -688,8 +713,7 @@ def get_seating(
     # class_name = ALL → retornar TODAS as turmas reais
     # ==========================
     if class_name == "ALL":
-        from utils.data import load_data
-        all_students = load_data()
+        all_students = get_students()
 
         # pegar todas as classes reais do course/grade
         class_names = sorted({
@@ -721,8 +745,7 @@ def get_seating(
 
     layout = data[key]
 
-    from utils.data import load_data
-    valid_ids = {s.get("id") for s in load_data() if s.get("id")}
+    valid_ids = {s.get("id") for s in get_students() if s.get("id")}
     layout = sanitize_layout(layout, valid_ids)
 
     return layout
@@ -806,54 +829,49 @@ def find_teacher(teachers, grade, class_name, course):
 
 @router.post("/{student_id}/suspend")
 def suspend_student(student_id: str, date: str = Query(...)):
-    student_id = student_id.lower()
-    data = load_data()
     teachers = load_teachers()  # necessário para achar o homeroom teacher
 
-    for s in data:
-        if s["id"].lower() == student_id:
+    def apply(s):
+        if s.get("status") == "休学":
+            return {"status": "already_suspended"}
 
-            if s.get("status") == "休学":
-                return {"status": "already_suspended"}
-
-            # ⭐ SALVAR HISTÓRICO DO ANO ANTES DE VIRAR 休学 ⭐
-            this_year = datetime.now().year
-            nendo = f"{this_year - 1}年度"
-
-            prefix_map = { "1": "1st_year", "2": "2nd_year", "3": "3rd_year" }
-            prefix = prefix_map[str(s["grade"])]
-
-            # homeroom teacher atual
-            teacher_name = find_teacher(
-                teachers,
-                s["grade"],
-                s.get("class_name", ""),
-                s.get("course", "")
-            )
-
-            # salvar classe, número, teacher e nendo
-            s[f"{prefix}_class"] = s.get("class_name", "")
-            s[f"{prefix}_attendance_no"] = s.get("attend_no", "")
-            s[f"{prefix}_teacher"] = teacher_name or ""
-            s[f"{prefix}_nendo"] = nendo
-            s[f"{prefix}_{this_year - 1}_status"] = "休学"
-
-            # ⭐ AGORA SIM, MUDA PARA 休学 ⭐
-            s["status"] = "休学"
-
-            # histórico administrativo
-            if "suspension_history" not in s:
-                s["suspension_history"] = []
-
-            s["suspension_history"].append({
-                "start": date,
-                "end": None
-            })
+        # ⭐ SALVAR HISTÓRICO DO ANO ANTES DE VIRAR 休学 ⭐
+        this_year = datetime.now().year
+        nendo = f"{this_year - 1}年度"
+
+        prefix_map = { "1": "1st_year", "2": "2nd_year", "3": "3rd_year" }
+        prefix = prefix_map[str(s["grade"])]
+
+        # homeroom teacher atual
+        teacher_name = find_teacher(
+            teachers,
+            s["grade"],
+            s.get("class_name", ""),
+            s.get("course", "")
+        )
+
+        # salvar classe, número, teacher e nendo
+        s[f"{prefix}_class"] = s.get("class_name", "")
+        s[f"{prefix}_attendance_no"] = s.get("attend_no", "")
+        s[f"{prefix}_teacher"] = teacher_name or ""
+        s[f"{prefix}_nendo"] = nendo
+        s[f"{prefix}_{this_year - 1}_status"] = "休学"
 
-            save_data(data)
-            return {"status": "休学に変更しました"}
+        # ⭐ AGORA SIM, MUDA PARA 休学 ⭐
+        s["status"] = "休学"
 
-    raise HTTPException(status_code=404, detail="Student not found")
+        # histórico administrativo
+        if "suspension_history" not in s:
+            s["suspension_history"] = []
+
+        s["suspension_history"].append({
+            "start": date,
+            "end": None
+        })
+
+        return {"status": "休学に変更しました"}
+
+    return update_student_record(student_id, apply)
 
 @router.get("/server_time") 
 def server_time(): 
@@ -865,40 +883,34 @@ def server_time():
 
 @router.post("/{student_id}/return")
 def return_from_suspension(student_id: str, date: str = Query(...)):
-    student_id = student_id.lower()
-    data = load_data()
+    def apply(s):
+        if s.get("status") != "休学":
+            return {"status": "not_suspended"}
 
-    for s in data:
-        if s["id"].lower() == student_id:
-
-            if s.get("status") != "休学":
-                return {"status": "not_suspended"}
-
-            # fechar período de suspensão
-            if "suspension_history" in s and s["suspension_history"]:
-                last = s["suspension_history"][-1]
-                if last.get("end") is None:
-                    last["end"] = date
+        # fechar período de suspensão
+        if "suspension_history" in s and s["suspension_history"]:
+            last = s["suspension_history"][-1]
+            if last.get("end") is None:
+                last["end"] = date
 
-            # restaurar dados salvos no suspend
-            prefix_map = { "1": "1st_year", "2": "2nd_year", "3": "3rd_year" }
-            prefix = prefix_map[str(s["grade"])]
+        # restaurar dados salvos no suspend
+        prefix_map = { "1": "1st_year", "2": "2nd_year", "3": "3rd_year" }
+        prefix = prefix_map[str(s["grade"])]
 
-            restored_class = s.get(f"{prefix}_class", "")
-            restored_no = s.get(f"{prefix}_attendance_no", "")
-            restored_teacher = s.get(f"{prefix}_teacher", "")
+        restored_class = s.get(f"{prefix}_class", "")
+        restored_no = s.get(f"{prefix}_attendance_no", "")
+        restored_teacher = s.get(f"{prefix}_teacher", "")
 
-            s["class_name"] = restored_class
-            s["attend_no"] = restored_no
-            s["teacher"] = restored_teacher
+        s["class_name"] = restored_class
+        s["attend_no"] = restored_no
+        s["teacher"] = restored_teacher
 
-            # mudar status
-            s["status"] = "在籍"
+        # mudar status
+        s["status"] = "在籍"
 
-            save_data(data)
-            return {"status": "復学しました"}
+        return {"status": "復学しました"}
 
-    raise HTTPException(status_code=404, detail="Student not found")
+    return update_student_record(student_id, apply)
 
 
 # ---------------------------------------------------------
@@ -912,27 +924,21 @@ def add_shidou(payload: dict):
     if not student_id or not text:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_data()
-
-    # procurar aluno
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-
-            entry = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "teacher": payload.get("teacher", "不明"),
-                "text": text
-            }
+    def apply(s):
+        entry = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "teacher": payload.get("teacher", "不明"),
+            "text": text
+        }
 
-            if "shidou_history" not in s:
-                s["shidou_history"] = []
+        if "shidou_history" not in s:
+            s["shidou_history"] = []
 
-            s["shidou_history"].append(entry)
+        s["shidou_history"].append(entry)
 
-            save_data(data)
-            return {"status": "ok"}
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Student not found")
+    return update_student_record(student_id, apply)
 
 
 @router.post("/add_moushiokuri")
@@ -944,29 +950,24 @@ def add_moushiokuri(payload: dict):
     if not student_id or not text:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-
-            entry = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "teacher": teacher,
-                "text": text
-            }
+    def apply(s):
+        entry = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "teacher": teacher,
+            "text": text
+        }
 
-            if "moushiokuri_history" not in s:
-                s["moushiokuri_history"] = []
+        if "moushiokuri_history" not in s:
+            s["moushiokuri_history"] = []
 
-            s["moushiokuri_history"].append(entry)
+        s["moushiokuri_history"].append(entry)
 
-            save_data(data)
-            return {"status": "ok"}
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Student not found")
+    return update_student_record(student_id, apply)
 
-@router.get("/all")
-def list_all_students():
+@router.get("/all", dependencies=[conditional(STUDENTS_FILE)])
+def list_all_students(fields: str | None = None):
     """
     Retorna TODOS os alunos:
     - 在籍
@@ -976,15 +977,73 @@ def list_all_students():
     - 卒業
     - 退学
     - 復学
+    fields=name,kana,... → só esses campos (mais o id) de cada aluno.
     """
-    data = load_data()
+    data = get_students()
+
+    selected = parse_fields(fields)
+    if selected is not None:
+        return [project(s, selected) for s in data]
 
     # garantir que attend_no seja string quando existir
-    for s in data:
-        if s.get("attend_no") is not None:
-            s["attend_no"] = str(s["attend_no"])
+    return [with_str_attend_no(s) for s in data]
+
+
+# ---------------------------------------------------------
+# 名簿（ページング + fields=）
+# ---------------------------------------------------------
+@router.get("/list", response_model=StudentPage, dependencies=[conditional(STUDENTS_FILE)])
+def list_students_page(
+    grade: str | None = None,
+    course: str | None = None,
+    class_name: str | None = None,
+    status: str | None = None,
+    include_inactive: bool = False,
+    fields: str | None = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+):
+    """
+    Página de alunos na ordem do students.json. Sem fields= vêm os campos
+    de StudentSummary. cursor = next_cursor da página anterior (tem
+    prioridade sobre offset e não "pula" alunos quando a lista muda).
+    """
+    selected = parse_fields(fields) or SUMMARY_FIELDS
+    course_code = normalize_course(course) if course else None
+    records, pos = repository.positions()
+
+    # posições (no students.json) dos alunos que passam pelos filtros
+    matched = [
+        i for i, s in enumerate(records)
+        if (grade is None or s.get("grade") == grade)
+        and (course_code is None or normalize_course(s.get("course")) == course_code)
+        and (class_name is None or s.get("class_name") == class_name)
+        and (status is None or s.get("status") == status)
+        and (include_inactive or status is not None
+             or s.get("status", "在籍") not in INACTIVE_STATUSES)
+    ]
 
-    return data
+    if cursor is not None:
+        # cursor "{id}:{posição}": continua depois do aluno do cursor, mesmo
+        # que ele não passe mais pelo filtro; se foi apagado, da posição dele
+        sid, _, at = cursor.rpartition(":")
+        if not sid or not at.isdigit():
+            raise HTTPException(status_code=400, detail="cursor inválido")
+        current = pos.get(sid.lower())
+        start = current + 1 if current is not None else int(at)
+        offset = bisect.bisect_left(matched, start)
+
+    page = matched[offset:offset + limit]
+    more = offset + limit < len(matched)
+
+    return {
+        "items": [project(records[i], selected) for i in page],
+        "total": len(matched),
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": f"{records[page[-1]].get('id')}:{page[-1]}" if page and more else None,
+    }
 
 
 # ---------------------------------------------------------
@@ -999,27 +1058,22 @@ def add_zemi(payload: dict):
     if not student_id or not text:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-
-            entry = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "grade": payload.get("grade"),  
-                "teacher": teacher,
-                "text": text
-            }
+    def apply(s):
+        entry = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "grade": payload.get("grade"),  
+            "teacher": teacher,
+            "text": text
+        }
 
-            if "zemi_history" not in s:
-                s["zemi_history"] = []
+        if "zemi_history" not in s:
+            s["zemi_history"] = []
 
-            s["zemi_history"].append(entry)
+        s["zemi_history"].append(entry)
 
-            save_data(data)
-            return {"status": "ok"}
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Student not found")
+    return update_student_record(student_id, apply)
 
 
 
@@ -1035,27 +1089,22 @@ def add_bukatsu(payload: dict):
     if not student_id or not text:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-
-            entry = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "grade": payload.get("grade"),  
-                "teacher": teacher,
-                "text": text
-            }
+    def apply(s):
+        entry = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "grade": payload.get("grade"),  
+            "teacher": teacher,
+            "text": text
+        }
 
-            if "bukatsu_history" not in s:
-                s["bukatsu_history"] = []
+        if "bukatsu_history" not in s:
+            s["bukatsu_history"] = []
 
-            s["bukatsu_history"].append(entry)
+        s["bukatsu_history"].append(entry)
 
-            save_data(data)
-            return {"status": "ok"}
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Student not found")
+    return update_student_record(student_id, apply)
 
 
 # ---------------------------------------------------------
@@ -1070,27 +1119,22 @@ def add_yakuin(payload: dict):
     if not student_id or not text:
         raise HTTPException(status_code=400, detail="Missing fields")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-
-            entry = {
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "grade": payload.get("grade"),   
-                "teacher": teacher,
-                "text": text
-            }
+    def apply(s):
+        entry = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "grade": payload.get("grade"),   
+            "teacher": teacher,
+            "text": text
+        }
 
-            if "yakuin_history" not in s:
-                s["yakuin_history"] = []
+        if "yakuin_history" not in s:
+            s["yakuin_history"] = []
 
-            s["yakuin_history"].append(entry)
+        s["yakuin_history"].append(entry)
 
-            save_data(data)
-            return {"status": "ok"}
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Student not found")
+    return update_student_record(student_id, apply)
 
 # ---------------------------------------------------------
 # 申し送り 編集
@@ -1100,18 +1144,16 @@ def edit_moushiokuri(payload: dict):
     student_id = payload.get("student_id")
     original_date = payload.get("original_date")
 
-    data = load_data()
+    def apply(s):
+        for entry in s.get("moushiokuri_history", []):
+            if entry["date"] == original_date:
+                entry["teacher"] = payload.get("teacher", entry["teacher"])
+                entry["text"] = payload.get("text", entry["text"])
+                return {"status": "ok"}
 
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            for entry in s.get("moushiokuri_history", []):
-                if entry["date"] == original_date:
-                    entry["teacher"] = payload.get("teacher", entry["teacher"])
-                    entry["text"] = payload.get("text", entry["text"])
-                    save_data(data)
-                    return {"status": "ok"}
+        raise HTTPException(status_code=404, detail="Record not found")
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1122,18 +1164,14 @@ def delete_moushiokuri(payload: dict):
     student_id = payload.get("student_id")
     date = payload.get("date")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            s["moushiokuri_history"] = [
-                e for e in s.get("moushiokuri_history", [])
-                if e["date"] != date
-            ]
-            save_data(data)
-            return {"status": "ok"}
+    def apply(s):
+        s["moushiokuri_history"] = [
+            e for e in s.get("moushiokuri_history", [])
+            if e["date"] != date
+        ]
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1146,18 +1184,16 @@ def edit_shidou(payload: dict):
     new_text = payload.get("text")
     new_teacher = payload.get("teacher")
 
-    data = load_data()
+    def apply(s):
+        for entry in s.get("shidou_history", []):
+            if entry["date"] == original_date:
+                entry["text"] = new_text
+                entry["teacher"] = new_teacher
+                return {"status": "ok"}
 
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            for entry in s.get("shidou_history", []):
-                if entry["date"] == original_date:
-                    entry["text"] = new_text
-                    entry["teacher"] = new_teacher
-                    save_data(data)
-                    return {"status": "ok"}
+        raise HTTPException(status_code=404, detail="Record not found")
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1168,18 +1204,14 @@ def delete_shidou(payload: dict):
     student_id = payload.get("student_id")
     date = payload.get("date")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            s["shidou_history"] = [
-                e for e in s.get("shidou_history", [])
-                if e["date"] != date
-            ]
-            save_data(data)
-            return {"status": "ok"}
+    def apply(s):
+        s["shidou_history"] = [
+            e for e in s.get("shidou_history", [])
+            if e["date"] != date
+        ]
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1190,19 +1222,17 @@ def edit_zemi(payload: dict):
     student_id = payload.get("student_id")
     original_date = payload.get("original_date")
 
-    data = load_data()
+    def apply(s):
+        for entry in s.get("zemi_history", []):
+            if entry.get("date") == original_date:
+                entry["grade"] = payload.get("grade", entry["grade"])
+                entry["teacher"] = payload.get("teacher", entry["teacher"])
+                entry["text"] = payload.get("text", entry["text"])
+                return {"status": "ok"}
 
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            for entry in s.get("zemi_history", []):
-                if entry.get("date") == original_date:
-                    entry["grade"] = payload.get("grade", entry["grade"])
-                    entry["teacher"] = payload.get("teacher", entry["teacher"])
-                    entry["text"] = payload.get("text", entry["text"])
-                    save_data(data)
-                    return {"status": "ok"}
+        raise HTTPException(status_code=404, detail="Record not found")
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1213,18 +1243,14 @@ def delete_zemi(payload: dict):
     student_id = payload.get("student_id")
     date = payload.get("date")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            s["zemi_history"] = [
-                e for e in s.get("zemi_history", [])
-                if e["date"] != date
-            ]
-            save_data(data)
-            return {"status": "ok"}
+    def apply(s):
+        s["zemi_history"] = [
+            e for e in s.get("zemi_history", [])
+            if e["date"] != date
+        ]
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1235,19 +1261,17 @@ def edit_bukatsu(payload: dict):
     student_id = payload.get("student_id")
     original_date = payload.get("original_date")
 
-    data = load_data()
+    def apply(s):
+        for entry in s.get("bukatsu_history", []):
+            if entry["date"] == original_date:
+                entry["grade"] = payload.get("grade", entry["grade"])
+                entry["teacher"] = payload.get("teacher", entry["teacher"])
+                entry["text"] = payload.get("text", entry["text"])
+                return {"status": "ok"}
 
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            for entry in s.get("bukatsu_history", []):
-                if entry["date"] == original_date:
-                    entry["grade"] = payload.get("grade", entry["grade"])
-                    entry["teacher"] = payload.get("teacher", entry["teacher"])
-                    entry["text"] = payload.get("text", entry["text"])
-                    save_data(data)
-                    return {"status": "ok"}
+        raise HTTPException(status_code=404, detail="Record not found")
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1258,18 +1282,14 @@ def delete_bukatsu(payload: dict):
     student_id = payload.get("student_id")
     date = payload.get("date")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            s["bukatsu_history"] = [
-                e for e in s.get("bukatsu_history", [])
-                if e["date"] != date
-            ]
-            save_data(data)
-            return {"status": "ok"}
+    def apply(s):
+        s["bukatsu_history"] = [
+            e for e in s.get("bukatsu_history", [])
+            if e["date"] != date
+        ]
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1280,19 +1300,17 @@ def edit_yakuin(payload: dict):
     student_id = payload.get("student_id")
     original_date = payload.get("original_date")
 
-    data = load_data()
+    def apply(s):
+        for entry in s.get("yakuin_history", []):
+            if entry["date"] == original_date:
+                entry["grade"] = payload.get("grade", entry["grade"])
+                entry["teacher"] = payload.get("teacher", entry["teacher"])
+                entry["text"] = payload.get("text", entry["text"])
+                return {"status": "ok"}
 
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            for entry in s.get("yakuin_history", []):
-                if entry["date"] == original_date:
-                    entry["grade"] = payload.get("grade", entry["grade"])
-                    entry["teacher"] = payload.get("teacher", entry["teacher"])
-                    entry["text"] = payload.get("text", entry["text"])
-                    save_data(data)
-                    return {"status": "ok"}
+        raise HTTPException(status_code=404, detail="Record not found")
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 # ---------------------------------------------------------
@@ -1300,7 +1318,7 @@ def edit_yakuin(payload: dict):
 # ---------------------------------------------------------
 @router.get("/no_photo")
 def list_students_without_photo():
-    data = load_data()
+    data = get_students()
 
     result = {}
 
@@ -1340,18 +1358,14 @@ def delete_yakuin(payload: dict):
     student_id = payload.get("student_id")
     date = payload.get("date")
 
-    data = load_data()
-
-    for s in data:
-        if s["id"].lower() == student_id.lower():
-            s["yakuin_history"] = [
-                e for e in s.get("yakuin_history", [])
-                if e["date"] != date
-            ]
-            save_data(data)
-            return {"status": "ok"}
+    def apply(s):
+        s["yakuin_history"] = [
+            e for e in s.get("yakuin_history", [])
+            if e["date"] != date
+        ]
+        return {"status": "ok"}
 
-    raise HTTPException(status_code=404, detail="Record not found")
+    return update_student_record(student_id, apply, not_found="Record not found")
 
 
 
@@ -1360,19 +1374,9 @@ def delete_yakuin(payload: dict):
 # ---------------------------------------------------------
 @router.get("/{student_id}", response_model=StudentOut)
 def get_student(student_id: str):
-    student_id = student_id.lower()
-
-    data = load_data()
-    for s in data:
-        if s["id"].lower() == student_id:
-
-            if s.get("attend_no") is not None:
-                s["attend_no"] = str(s["attend_no"])
-
-            photo = find_photo(s["id"])
-            s["photo"] = photo
-
-            return s
+    s = find_student(student_id)
+    if not s:
+        raise HTTPException(status_code=404, detail="Student not found")
 
-    raise HTTPException(status_code=404, detail="Student not found")
+    return json_response({**students_out([s])[0], "photo": find_photo(s["id"])})
 
@@ -1,18 +1,11 @@
 from fastapi import APIRouter
-from utils.data import load_data
+from utils.data import repository, STUDENTS_FILE
+from utils.etag import conditional
 
 
 router = APIRouter()
 
-@router.get("/students/by_class")
+@router.get("/students/by_class", dependencies=[conditional(STUDENTS_FILE)])
 def get_students_by_class(course: str, grade: str, class_name: str):
-    students = load_data()
-
-    result = [
-        s for s in students
-        if s.get("course") == course
-        and str(s.get("grade")) == str(grade)
-        and s.get("class_name") == class_name
-    ]
-
-    return result
+    # índice (course, grade, class_name) → alunos
+    return list(repository.by_class(course, grade, class_name))
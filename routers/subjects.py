@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException
-from utils.data_manager import load_json, save_json
+from utils.data_manager import load_json, save_json, DATA_DIR
+from utils.etag import conditional
 from schemas.subject import SubjectCreate, SubjectOut, SubjectBase
 import uuid
 
 router = APIRouter()
 
+SUBJECTS_FILE = DATA_DIR / "subjects.json"
+
 
 @router.post("/", response_model=SubjectOut)
 def create_subject(subject: SubjectCreate):
@@ -29,18 +32,18 @@ def create_subject(subject: SubjectCreate):
     return new_subject
 
 
-@router.get("/required", response_model=list[SubjectOut])
+@router.get("/required", response_model=list[SubjectOut], dependencies=[conditional(SUBJECTS_FILE)])
 def get_required_subjects():
     subjects = load_json("subjects.json")
     return [s for s in subjects if s.get("type") == "required"]
 
 
-@router.get("/optional", response_model=list[SubjectOut])
+@router.get("/optional", response_model=list[SubjectOut], dependencies=[conditional(SUBJECTS_FILE)])
 def get_optional_subjects():
     subjects = load_json("subjects.json")
     return [s for s in subjects if s.get("type") == "optional"]
 
-@router.get("/{subject_id}", response_model=SubjectOut)
+@router.get("/{subject_id}", response_model=SubjectOut, dependencies=[conditional(SUBJECTS_FILE)])
 def get_subject_by_id(subject_id: str):
     subjects = load_json("subjects.json")
 
@@ -90,7 +93,7 @@ def delete_subject(subject_id: str):
 
     raise HTTPException(status_code=404, detail="Matéria não encontrada.")
 
-@router.get("/")
+@router.get("/", dependencies=[conditional(SUBJECTS_FILE)])
 def get_subjects(course: str, grade: str):
     subjects = load_json("subjects.json")
     return [
@@ -1,16 +1,16 @@
 from fastapi import APIRouter, HTTPException
-import json
 import os
 from utils.date import school_year, now_iso
-from main import load_students, save_students, DATA_DIR
+from main import DATA_DIR
+from utils.data import find_student, repository
+from utils.storage import write_json, update_json, exists
 
 router = APIRouter()
 
 TAIGAKU_FILE = os.path.join(DATA_DIR, "taigaku.json")
 
-if not os.path.exists(TAIGAKU_FILE):
-    with open(TAIGAKU_FILE, "w", encoding="utf-8") as f:
-        json.dump([], f)
+if not exists(TAIGAKU_FILE):
+    write_json(TAIGAKU_FILE, [])
 
 
 @router.post("/taigaku")
@@ -21,8 +21,7 @@ def taigaku_student(payload: dict):
     student_id = payload["student_id"]
     date = payload["date"]
 
-    students = load_students()
-    student = next((s for s in students if s["id"] == student_id), None)
+    student = find_student(student_id)
 
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
@@ -35,15 +34,8 @@ def taigaku_student(payload: dict):
         "student": student
     }
 
-    with open(TAIGAKU_FILE, encoding="utf-8") as f:
-        taigaku = json.load(f)
+    update_json(TAIGAKU_FILE, lambda events: events.append(event), default=[])
 
-    taigaku.append(event)
-
-    with open(TAIGAKU_FILE, "w", encoding="utf-8") as f:
-        json.dump(taigaku, f, ensure_ascii=False, indent=2)
-
-    students = [s for s in students if s["id"] != student_id]
-    save_students(students)
+    repository.delete(student_id)
 
     return {"status": "ok"}
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException
 import json
 from pathlib import Path
 from schemas.teacher import TeacherCreate, TeacherUpdate, TeacherOut
+from utils.storage import write_json
+from utils.etag import conditional
 
 router = APIRouter()
 
@@ -14,16 +16,15 @@ def load_teachers():
 
 
 def save_teachers(data):
-    with DATA_PATH.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json(DATA_PATH, data)
 
 
-@router.get("/", response_model=list[TeacherOut])
+@router.get("/", response_model=list[TeacherOut], dependencies=[conditional(DATA_PATH)])
 def get_all_teachers():
     return load_teachers()
 
 
-@router.get("/{teacher_id}", response_model=TeacherOut)
+@router.get("/{teacher_id}", response_model=TeacherOut, dependencies=[conditional(DATA_PATH)])
 def get_teacher(teacher_id: int):
     teachers = load_teachers()
     teacher = next((t for t in teachers if t["id"] == teacher_id), None)
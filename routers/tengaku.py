@@ -1,16 +1,16 @@
 from fastapi import APIRouter, HTTPException
-import json
 import os
 from utils.date import school_year, now_iso
-from main import load_students, save_students, DATA_DIR
+from main import DATA_DIR
+from utils.data import find_student, repository
+from utils.storage import write_json, update_json, exists
 
 router = APIRouter()
 
 TENGAKU_FILE = os.path.join(DATA_DIR, "tengaku.json")
 
-if not os.path.exists(TENGAKU_FILE):
-    with open(TENGAKU_FILE, "w", encoding="utf-8") as f:
-        json.dump([], f)
+if not exists(TENGAKU_FILE):
+    write_json(TENGAKU_FILE, [])
 
 
 @router.post("/tengaku")
@@ -22,8 +22,7 @@ def tengaku_student(payload: dict):
     date = payload["date"]
     destination_school = payload["destination_school"]
 
-    students = load_students()
-    student = next((s for s in students if s["id"] == student_id), None)
+    student = find_student(student_id)
 
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
@@ -37,15 +36,8 @@ def tengaku_student(payload: dict):
         "student": student
     }
 
-    with open(TENGAKU_FILE, encoding="utf-8") as f:
-        tengaku = json.load(f)
+    update_json(TENGAKU_FILE, lambda events: events.append(event), default=[])
 
-    tengaku.append(event)
-
-    with open(TENGAKU_FILE, "w", encoding="utf-8") as f:
-        json.dump(tengaku, f, ensure_ascii=False, indent=2)
-
-    students = [s for s in students if s["id"] != student_id]
-    save_students(students)
+    repository.delete(student_id)
 
     return {"status": "ok"}
@@ -2,7 +2,7 @@ from pydantic import BaseModel
 from typing import Optional, Literal
 
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Any
 
 # -----------------------------
 # 1) Item individual de report
@@ -211,3 +211,26 @@ class StudentOut(StudentBase):
     yakuin_history: list[dict] | None = None
 
 
+# ---------------------------------------
+# Listagem leve (paginação / fields=)
+# ---------------------------------------
+class StudentSummary(BaseModel):
+    # campos padrão de GET /api/students/list (sem históricos nem reports)
+    id: str
+    name: Optional[str] = None
+    kana: Optional[str] = None
+    gender: Optional[str] = None
+    course: Optional[str] = None
+    grade: Optional[str] = None
+    class_name: Optional[str] = None
+    attend_no: Optional[str] = None
+    status: Optional[str] = None
+
+
+class StudentPage(BaseModel):
+    # items: StudentSummary ou só os campos pedidos em fields=
+    items: List[Dict[str, Any]]
+    total: int
+    offset: int
+    limit: int
+    next_cursor: Optional[str] = None
@@ -0,0 +1,315 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.storage import read_json, read_columns, signature, locked, journal_set, journal_delete, on_compact
+from services.attendance_engine import COUNTER_KEYS, empty_counters, add_status, aggregate, counters_of
+
+# =========================================================
+# Contadores de presença HR materializados (por turma/ano)
+# =========================================================
+#
+# Para cada arquivo attendance/{class}-{sy}.json mantemos em memória:
+#   days:   data → {sid: status}           (para calcular o delta)
+#   months: "YYYY-MM" → {"dates": n, "students": {sid: contadores}}
+#
+# save_attendance grava o dia por save_day(): os contadores do dia
+# antigo são subtraídos e os do novo somados — O(alunos do dia).
+# Os endpoints de estatística só somam meses (O(alunos × meses)), sem
+# reprocessar os dias. Se outro processo gravar o arquivo (assinatura
+# diferente), a visão é remontada a partir do arquivo na próxima leitura.
+# A montagem inicial agrega o ano inteiro de uma vez pelo motor
+# (services.attendance_engine), com o mês como termo.
+#
+# get_many() (dashboards /stats/all, /special/all): as visões frias são
+# montadas em paralelo num pool de processos (ATTENDANCE_STATS_WORKERS),
+# e cada visão guarda em memo() os resultados já calculados — só as
+# turmas que mudaram são recalculadas.
+
+STATS_WORKERS = int(os.environ.get("ATTENDANCE_STATS_WORKERS", "0")) or (os.cpu_count() or 1)
+
+
+def _day_students(entry):
+    students = (entry or {}).get("students", {}) if isinstance(entry, dict) else {}
+    return students if isinstance(students, dict) else {}
+
+
+class ClassAttendance:
+    __slots__ = ("signature", "days", "months", "lock", "_memo")
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.days = {}
+        self.months = {}
+        self.lock = threading.Lock()
+        self._memo = {}
+
+    @classmethod
+    def build(cls, data: dict, sig):
+        view = cls(sig)
+        view.days = {date_str: dict(_day_students(entry)) for date_str, entry in data.items()}
+
+        dates, per_student = aggregate(view.days, lambda date_str: date_str[:7])
+
+        for ym, n in dates.items():
+            view.months[ym] = {"dates": n, "students": {}}
+        for sid, months in per_student.items():
+            for ym, counters in months.items():
+                view.months[ym]["students"][sid] = counters
+
+        return view
+
+    def _add(self, date_str, students, sign):
+        month = self.months.setdefault(date_str[:7], {"dates": 0, "students": {}})
+        month["dates"] += sign
+
+        per_student = month["students"]
+        for sid, status in students.items():
+            c = per_student.get(sid)
+            if c is None:
+                c = per_student[sid] = empty_counters()
+            add_status(c, status, sign)
+
+            if c["school_days"] == 0:
+                del per_student[sid]
+
+        if month["dates"] == 0:
+            del self.months[date_str[:7]]
+
+        if sign > 0:
+            self.days[date_str] = dict(students)
+        else:
+            self.days.pop(date_str, None)
+
+    def apply_day(self, date_str, students):
+        """Troca o dia `date_str` (students=None → dia apagado)."""
+        with self.lock:
+            old = self.days.get(date_str)
+            if old is not None:
+                self._add(date_str, old, -1)
+            if students is not None:
+                self._add(date_str, students, +1)
+            self._memo = {}
+
+    def memo(self, name, fn):
+        """Resultado de fn(self) guardado até a próxima alteração da visão."""
+        memo = self._memo
+        if name not in memo:
+            memo[name] = fn(self)
+        return memo[name]
+
+    # -----------------------------
+    # agregação
+    # -----------------------------
+    def terms(self, term_of_month):
+        """
+        Soma os meses por termo.
+        term_of_month("YYYY-MM") → nome do termo (ou None = ignorar).
+        Retorna (dias por termo, {sid: {termo: contadores}}).
+        """
+        dates = {}
+        students = {}
+
+        with self.lock:
+            return self._terms(term_of_month, dates, students)
+
+    def _terms(self, term_of_month, dates, students):
+        for ym, month in self.months.items():
+            term = term_of_month(ym)
+            if term is None:
+                continue
+
+            dates[term] = dates.get(term, 0) + month["dates"]
+
+            for sid, c in month["students"].items():
+                acc = students.setdefault(sid, {}).setdefault(term, empty_counters())
+                for k in COUNTER_KEYS:
+                    acc[k] += c[k]
+
+        return dates, students
+
+    def daily(self, skip=()):
+        """data → {status: quantidade} (status em `skip` não contam)."""
+        result = {}
+        with self.lock:
+            for date_str, students in self.days.items():
+                counts = result[date_str] = {}
+                for status in students.values():
+                    if status in skip:
+                        continue
+                    counts[status] = counts.get(status, 0) + 1
+        return result
+
+
+def year_totals(view):
+    """(dias letivos, {sid: contadores}) do arquivo inteiro, guardado na visão."""
+    def build(v):
+        dates, per_student = v.terms(lambda ym: "year")
+        return dates.get("year", 0), {sid: t["year"] for sid, t in per_student.items()}
+
+    return view.memo("year", build)
+
+
+_views = {}
+_views_lock = threading.Lock()
+
+
+def _key(path):
+    return os.path.abspath(os.fspath(path))
+
+
+def _cached(key, sig):
+    with _views_lock:
+        view = _views.get(key)
+    if view is not None and view.signature == sig:
+        return view
+    return None
+
+
+def _install(key, view):
+    with _views_lock:
+        _views[key] = view
+    return view
+
+
+def get(path):
+    """Visão materializada do arquivo (None se o arquivo não existir)."""
+    key = _key(path)
+    sig = signature(path)
+    if sig is None:
+        with _views_lock:
+            _views.pop(key, None)
+        return None
+
+    view = _cached(key, sig)
+    if view is not None:
+        return view
+
+    data = read_json(path)
+    if data is None:
+        return None
+
+    return _install(key, ClassAttendance.build(data, sig))
+
+
+def student_year(path, sid):
+    """
+    (dias letivos, contadores do aluno) no arquivo inteiro. No formato
+    colunar (DATA_COLUMNAR) lê só a linha do aluno, sem montar a visão.
+    """
+    view = _cached(_key(path), signature(path))
+    if view is None:
+        cols = read_columns(path)
+        if cols is not None:
+            with cols:
+                return len(cols.dates), counters_of(cols.status_counts(sid))
+        view = get(path)
+
+    if view is None:
+        return 0, empty_counters()
+
+    school_days, per_student = year_totals(view)
+    return school_days, per_student.get(sid) or empty_counters()
+
+
+# -----------------------------
+# várias turmas de uma vez
+# -----------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: o worker não herda locks/threads do servidor
+            _pool = ProcessPoolExecutor(
+                max_workers=STATS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _load_state(path):
+    # roda no worker: lê e agrega o arquivo; o processo principal só monta a visão
+    data = read_json(path)
+    if data is None:
+        return None
+    view = ClassAttendance.build(data, None)
+    return view.days, view.months
+
+
+def get_many(paths) -> dict:
+    """
+    {path: visão} para vários arquivos (sem os que não existem).
+    As visões desatualizadas são montadas em paralelo quando há mais de uma.
+    """
+    result = {}
+    cold = []
+
+    for path in paths:
+        sig = signature(path)
+        if sig is None:
+            continue
+        view = _cached(_key(path), sig)
+        if view is not None:
+            result[path] = view
+        else:
+            cold.append((path, sig))
+
+    if len(cold) > 1 and STATS_WORKERS > 1:
+        states = _get_pool().map(_load_state, [p for p, _ in cold])
+    else:
+        states = (_load_state(p) for p, _ in cold)
+
+    for (path, sig), state in zip(cold, states):
+        if state is None:
+            continue
+        view = ClassAttendance(sig)
+        view.days, view.months = state
+        result[path] = _install(_key(path), view)
+
+    return result
+
+
+def save_day(path, date_str, students):
+    """
+    Grava o dia no arquivo de presença (students=None → apaga o dia) e
+    aplica o delta na visão carregada, tudo sob o lock do arquivo.
+    """
+    key = _key(path)
+    with locked(path):
+        before = signature(path)
+
+        if students is None:
+            journal_delete(path, [date_str])
+        else:
+            journal_set(path, [date_str], {"students": students})
+
+        after = signature(path)
+
+        with _views_lock:
+            view = _views.get(key)
+            # visão desatualizada (outro processo gravou antes) ou arquivo
+            # removido: descarta, será remontada na próxima leitura
+            if view is None or view.signature != before or after is None:
+                _views.pop(key, None)
+                return
+
+        view.apply_day(date_str, students)
+        view.signature = after
+
+
+@on_compact
+def _resign(path, before, after):
+    # compactação não muda o conteúdo: a visão continua válida
+    with _views_lock:
+        view = _views.get(_key(path))
+        if view is None:
+            return
+        if after is None or view.signature != before:
+            _views.pop(_key(path), None)
+        else:
+            view.signature = after
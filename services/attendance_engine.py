@@ -0,0 +1,149 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # sem numpy: mesmo resultado, agregação em Python puro
+    np = None
+
+# =========================================================
+# Motor único de agregação de presença
+# =========================================================
+#
+# Cada status vira um código pequeno (0 = vazio/desconhecido: só conta
+# o dia letivo) e cada código tem uma linha de pesos em WEIGHTS. A
+# agregação codifica os dias em três vetores (aluno, termo, código),
+# conta as combinações com bincount e multiplica pela tabela de pesos —
+# sem dicionário de incremento por status/chave dentro do laço.
+#
+# O "termo" é dado por uma função plugável date_str → nome (ou None =
+# ignorar o dia): mês, zenki/koki, grupos senmon/koukou, ano inteiro...
+
+STATUS_COUNTS = {
+    "出席": {"attendance": 1},
+    "欠席": {"absence": 1},
+    "遅刻": {"attendance": 1, "late": 1},
+    "早退": {"attendance": 1, "early": 1},
+    "忌引き": {"mourn": 1},
+    "出席停止": {"stopped": 1},
+    "公欠": {"justified": 1},
+    "遅刻と早退": {"attendance": 1, "late": 1, "early": 1}
+}
+
+COUNTER_KEYS = (
+    "school_days", "attendance", "absence", "late",
+    "early", "mourn", "stopped", "justified",
+)
+
+STATUS_CODES = {status: code for code, status in enumerate(STATUS_COUNTS, 1)}
+
+WEIGHTS = [
+    [1 if k == "school_days" else STATUS_COUNTS.get(status, {}).get(k, 0) for k in COUNTER_KEYS]
+    for status in (None, *STATUS_COUNTS)
+]
+
+N_CODES = len(WEIGHTS)
+
+
+def empty_counters():
+    return dict.fromkeys(COUNTER_KEYS, 0)
+
+
+def status_code(status):
+    code = STATUS_CODES.get(status)
+    if code is None:
+        code = STATUS_CODES.get(str(status or "").strip(), 0)
+    return code
+
+
+class _Index(dict):
+    # valor → posição sequencial; lookup em C no caminho comum
+    def __missing__(self, key):
+        self[key] = value = len(self)
+        return value
+
+
+class _Codes(dict):
+    def __missing__(self, status):
+        self[status] = code = status_code(status)
+        return code
+
+
+def add_status(counters, status, sign=1):
+    """Soma (ou subtrai, sign=-1) um status nos contadores."""
+    for k, w in zip(COUNTER_KEYS, WEIGHTS[status_code(status)]):
+        if w:
+            counters[k] += sign * w
+
+
+def counters_of(status_counts: dict):
+    """{status: nº de dias} → contadores."""
+    counters = empty_counters()
+    for status, n in status_counts.items():
+        add_status(counters, status, n)
+    return counters
+
+
+def aggregate(days, term_of):
+    """
+    days: data → {sid: status}; term_of(date_str) → termo (None = ignorar).
+    Retorna (dias por termo, {sid: {termo: contadores}}); um aluno só
+    aparece nos termos em que tem algum registro.
+    """
+    dates = {}
+    term_index = _Index()
+    sid_index = _Index()
+    code_of = _Codes(STATUS_CODES)
+
+    sids = array("q")
+    terms = array("q")
+    codes = array("q")
+
+    for date_str, students in days.items():
+        term = term_of(date_str)
+        if term is None:
+            continue
+
+        dates[term] = dates.get(term, 0) + 1
+        t = term_index[term]
+
+        sids.extend(map(sid_index.__getitem__, students))
+        terms.extend([t] * len(students))
+        codes.extend(map(code_of.__getitem__, students.values()))
+
+    n_terms = len(term_index)
+    per_student = {}
+
+    if not sid_index:
+        return dates, per_student
+
+    if np is not None:
+        bins = (
+            (np.frombuffer(sids, dtype=np.int64) * n_terms + np.frombuffer(terms, dtype=np.int64))
+            * N_CODES
+            + np.frombuffer(codes, dtype=np.int64)
+        )
+        counts = np.bincount(bins, minlength=len(sid_index) * n_terms * N_CODES)
+        totals = (
+            counts.reshape(len(sid_index), n_terms, N_CODES) @ np.asarray(WEIGHTS, dtype=np.int64)
+        ).tolist()
+    else:
+        totals = [[[0] * len(COUNTER_KEYS) for _ in range(n_terms)] for _ in sid_index]
+        pairs = {}
+        for key in zip(sids, terms, codes):
+            pairs[key] = pairs.get(key, 0) + 1
+        for (s, t, c), n in pairs.items():
+            acc = totals[s][t]
+            for i, w in enumerate(WEIGHTS[c]):
+                acc[i] += n * w
+
+    term_names = list(term_index)
+
+    for sid, s in sid_index.items():
+        row = totals[s]
+        per_student[sid] = {
+            term_names[t]: dict(zip(COUNTER_KEYS, values))
+            for t, values in enumerate(row)
+            if values[0]  # school_days: teve registro no termo
+        }
+
+    return dates, per_student
@@ -1,5 +1,7 @@
 from datetime import datetime
 
+from services.attendance_engine import aggregate
+
 def empty_counts():
     return {
         "attendance": 0,
@@ -14,37 +16,6 @@ def empty_counts():
         "attendance_rate": None,
     }
 
-def accumulate(counts, status):
-    s = str(status or "").strip()
-
-    if s == "出席":
-        counts["attendance"] += 1
-
-    elif s == "欠席":
-        counts["absence"] += 1
-
-    elif s == "遅刻":
-        counts["late"] += 1
-        counts["attendance"] += 1
-
-    elif s == "早退":
-        counts["early"] += 1
-        counts["attendance"] += 1
-
-    elif s == "遅刻と早退":
-        counts["late"] += 1
-        counts["early"] += 1
-        counts["attendance"] += 1
-
-    elif s == "出席停止":
-        counts["stopped"] += 1
-
-    elif s == "忌引き":
-        counts["mourn"] += 1
-
-    elif s == "公欠":
-        counts["justified"] += 1
-
 def term_of(date_obj):
     m = date_obj.month
     if 4 <= m <= 9:
@@ -53,7 +24,34 @@ def term_of(date_obj):
         return "second_term"
     return None
 
+def _term_of_date(date_str):
+    try:
+        d = datetime.strptime(date_str, "%Y-%m-%d")
+    except:
+        return None
+    return term_of(d)
+
 def compute_attendance_stats(attendance_json):
+    # Dias válidos (students precisa ser dict)
+    days = {}
+    for date_str, day_data in attendance_json.items():
+        students = (day_data or {}).get("students", {})
+        if isinstance(students, dict):
+            days[date_str] = students
+
+    # Agregação pelo motor único (services.attendance_engine)
+    dates, per_student = aggregate(days, _term_of_date)
+
+    def counts_of(counters):
+        counts = empty_counts()
+        for k in ("attendance", "absence", "late", "early", "stopped", "mourn", "justified"):
+            counts[k] = counters.get(k, 0)
+        return counts
+
+    def add(total, counts):
+        for k in ("attendance", "absence", "late", "early", "stopped", "mourn", "justified"):
+            total[k] += counts[k]
+
     # Estatística da turma
     class_stats = {
         "first_term": empty_counts(),
@@ -64,48 +62,20 @@ def compute_attendance_stats(attendance_json):
     # Estatística por aluno
     student_stats = {}
 
-    # Dias letivos por termo
-    term_days = {
-        "first_term": set(),
-        "second_term": set(),
-    }
-
-    for date_str, day_data in attendance_json.items():
-        try:
-            d = datetime.strptime(date_str, "%Y-%m-%d")
-        except:
-            continue
-
-        term = term_of(d)
-        if term is None:
-            continue
-
-        students = (day_data or {}).get("students", {})
-        if not isinstance(students, dict):
-            continue
-
-        term_days[term].add(date_str)
-
-        for sid, status in students.items():
-            # Inicializa stats por aluno se não existir
-            if sid not in student_stats:
-                student_stats[sid] = {
-                    "first_term": empty_counts(),
-                    "second_term": empty_counts(),
-                    "total": empty_counts(),
-                }
-
-            # Acumula na turma
-            accumulate(class_stats[term], status)
-            accumulate(class_stats["total"], status)
-
-            # Acumula no aluno
-            accumulate(student_stats[sid][term], status)
-            accumulate(student_stats[sid]["total"], status)
+    for sid, terms in per_student.items():
+        stats = student_stats[sid] = {
+            "first_term": counts_of(terms.get("first_term", {})),
+            "second_term": counts_of(terms.get("second_term", {})),
+            "total": empty_counts(),
+        }
+        for term in ("first_term", "second_term"):
+            add(stats["total"], stats[term])
+            add(class_stats[term], stats[term])
+            add(class_stats["total"], stats[term])
 
     # Finaliza turma
     def finalize(counts, days):
-        counts["school_days"] = len(days)
+        counts["school_days"] = days
         counts["required_attendance_days"] = (
             counts["school_days"]
             - counts["mourn"]
@@ -117,15 +87,18 @@ def compute_attendance_stats(attendance_json):
                 counts["attendance"] / counts["required_attendance_days"] * 100, 1
             )
 
-    finalize(class_stats["first_term"], term_days["first_term"])
-    finalize(class_stats["second_term"], term_days["second_term"])
-    finalize(class_stats["total"], term_days["first_term"] | term_days["second_term"])
+    first_days = dates.get("first_term", 0)
+    second_days = dates.get("second_term", 0)
+
+    finalize(class_stats["first_term"], first_days)
+    finalize(class_stats["second_term"], second_days)
+    finalize(class_stats["total"], first_days + second_days)
 
     # Finaliza cada aluno
     for sid, stats in student_stats.items():
-        finalize(stats["first_term"], term_days["first_term"])
-        finalize(stats["second_term"], term_days["second_term"])
-        finalize(stats["total"], term_days["first_term"] | term_days["second_term"])
+        finalize(stats["first_term"], first_days)
+        finalize(stats["second_term"], second_days)
+        finalize(stats["total"], first_days + second_days)
 
     return {
         "class_stats": class_stats,
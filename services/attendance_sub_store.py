@@ -0,0 +1,313 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # sem numpy: mesmas contagens em Python puro
+    np = None
+
+from utils.storage import read_json, signature
+from utils.attendance_reader import PRESENT_STATUSES, NEGATIVE_STATUSES
+
+# =========================================================
+# Presença por aula (attendance_sub/) em cubo memory-mapped
+# =========================================================
+#
+# Para cada attendance_sub/{class}-{sy}.json é montado um arquivo em
+# DATA_CACHE_DIR (padrão data/.cache/attendance_sub):
+#
+#   cabeçalho  "<4sIIIII": b"SUB1", tamanho do meta, datas, períodos,
+#              alunos, subject_ids
+#   meta       JSON: {"dates", "periods", "students", "subjects", "statuses"}
+#   subjects   uint16 datas × períodos (0 = sem aula, n = subjects[n - 1])
+#   cubo       uint8 datas × períodos × alunos (0 = sem registro,
+#              n = statuses[n - 1])
+#
+# O nome do arquivo inclui a assinatura do JSON (utils.storage.signature):
+# outros workers reaproveitam o mesmo cubo, e qualquer escrita gera um
+# cubo novo. As contagens por matéria/aluno (evaluation) saem de uma
+# redução vetorizada sobre o cubo, para todos os alunos de uma vez.
+#
+# Cada cubo aberto segura um mmap (e um fd): ficam em memória só os
+# SUB_STORE_MAX usados mais recentemente (LRU).
+
+CACHE_DIR = os.environ.get("DATA_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ".cache"
+)
+SUB_CACHE_DIR = os.path.join(CACHE_DIR, "attendance_sub")
+SUB_STORE_MAX = int(os.environ.get("SUB_STORE_MAX", "64"))
+
+MAGIC = b"SUB1"
+HEADER = struct.Struct("<4sIIIII")
+
+# os status que a avaliação conta sempre têm código próprio; além de
+# 254 status distintos, o resto cai em OTHER (não conta nada)
+SEED_STATUSES = sorted(PRESENT_STATUSES | NEGATIVE_STATUSES | {"欠席", "未記録"})
+OTHER = 255
+
+
+def _encode(data: dict) -> bytes:
+    dates = sorted(d for d, periods in data.items() if isinstance(periods, dict))
+
+    periods = {}
+    students = {}
+    subjects = {}
+    statuses = {s: i for i, s in enumerate(SEED_STATUSES, 1)}
+    cells = []
+
+    for d, date_str in enumerate(dates):
+        for period, info in data[date_str].items():
+            if not isinstance(info, dict):
+                continue
+            p = periods.setdefault(period, len(periods))
+
+            subject_id = info.get("subject_id")
+            if subject_id is not None:
+                subject = subjects.setdefault(subject_id, len(subjects) + 1)
+            else:
+                subject = 0
+
+            day = info.get("students")
+            day = day if isinstance(day, dict) else {}
+            cells.append((d, p, subject, [
+                (students.setdefault(sid, len(students)), status)
+                for sid, status in day.items()
+            ]))
+
+    n_d, n_p, n_s = len(dates), len(periods), len(students)
+    table = [0] * (n_d * n_p)
+    cube = bytearray(n_d * n_p * n_s)
+
+    for d, p, subject, day in cells:
+        table[d * n_p + p] = subject
+        base = (d * n_p + p) * n_s
+        for s, status in day:
+            if not status or not isinstance(status, str):
+                continue
+            code = statuses.get(status)
+            if code is None:
+                code = statuses[status] = len(statuses) + 1 if len(statuses) < OTHER - 1 else OTHER
+            cube[base + s] = code
+
+    meta = json.dumps({
+        "dates": dates,
+        "periods": list(periods),
+        "students": list(students),
+        "subjects": list(subjects),
+        "statuses": [s for s, code in statuses.items() if code != OTHER],
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return (
+        HEADER.pack(MAGIC, len(meta), n_d, n_p, n_s, len(subjects))
+        + meta
+        + struct.pack(f"<{len(table)}H", *table)
+        + bytes(cube)
+    )
+
+
+class SubjectNumbers:
+    """Contagens de uma matéria: aulas no período e presença por aluno."""
+
+    __slots__ = ("total", "present", "negative")
+
+    def __init__(self, total=0, present=None, negative=None):
+        self.total = total
+        self.present = present or {}
+        self.negative = negative or {}
+
+    def __add__(self, other):
+        def merge(a, b):
+            merged = dict(a)
+            for sid, n in b.items():
+                merged[sid] = merged.get(sid, 0) + n
+            return merged
+
+        return SubjectNumbers(
+            self.total + other.total,
+            merge(self.present, other.present),
+            merge(self.negative, other.negative),
+        )
+
+    def of(self, sid) -> dict:
+        # mesmo formato de utils.attendance_reader.extract_attendance_numbers
+        return {
+            "total": self.total,
+            "present": self.present.get(sid, 0),
+            "negative": self.negative.get(sid, 0),
+        }
+
+
+class PeriodStore:
+    __slots__ = ("signature", "dates", "periods", "students", "subjects",
+                 "statuses", "_mm", "_table", "_cube", "_n")
+
+    def __init__(self, cube_path, sig):
+        with open(cube_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, meta_len, n_d, n_p, n_s, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"not an attendance_sub cube: {cube_path}")
+
+        meta = json.loads(self._mm[HEADER.size:HEADER.size + meta_len].decode("utf-8"))
+        self.signature = sig
+        self.dates = meta["dates"]
+        self.periods = meta["periods"]
+        self.students = meta["students"]
+        self.subjects = {subject: i for i, subject in enumerate(meta["subjects"], 1)}
+        self.statuses = meta["statuses"]
+
+        self._n = (n_d, n_p, n_s)
+        table_at = HEADER.size + meta_len
+        cube_at = table_at + 2 * n_d * n_p
+
+        if np is not None:
+            self._table = np.frombuffer(self._mm, dtype="<u2", count=n_d * n_p, offset=table_at).reshape(n_d, n_p)
+            self._cube = np.frombuffer(self._mm, dtype=np.uint8, count=n_d * n_p * n_s, offset=cube_at).reshape(n_d, n_p, n_s)
+        else:
+            self._table = struct.unpack_from(f"<{n_d * n_p}H", self._mm, table_at)
+            self._cube = cube_at
+
+    def _codes(self, statuses):
+        return [code for code, status in enumerate(self.statuses, 1) if status in statuses]
+
+    def numbers(self, subject_id, keep=None) -> SubjectNumbers:
+        """
+        Contagens da matéria para todos os alunos. keep(date_str) → bool
+        restringe as datas (semestre, data de corte).
+        """
+        subject = self.subjects.get(subject_id)
+        if subject is None:
+            return SubjectNumbers()
+
+        n_d, n_p, n_s = self._n
+        days = [keep is None or keep(d) for d in self.dates]
+        present_codes = self._codes(PRESENT_STATUSES)
+        negative_codes = self._codes(NEGATIVE_STATUSES)
+
+        if np is not None:
+            selected = (self._table == subject) & np.asarray(days, dtype=bool)[:, None]
+            cells = self._cube[selected]  # aulas × alunos
+            present = np.isin(cells, present_codes).sum(axis=0).tolist()
+            negative = np.isin(cells, negative_codes).sum(axis=0).tolist()
+            total = int(selected.sum())
+        else:
+            present = [0] * n_s
+            negative = [0] * n_s
+            total = 0
+            present_codes, negative_codes = set(present_codes), set(negative_codes)
+            for d in range(n_d):
+                if not days[d]:
+                    continue
+                for p in range(n_p):
+                    if self._table[d * n_p + p] != subject:
+                        continue
+                    total += 1
+                    start = self._cube + (d * n_p + p) * n_s
+                    for s, code in enumerate(self._mm[start:start + n_s]):
+                        if code in present_codes:
+                            present[s] += 1
+                        if code in negative_codes:
+                            negative[s] += 1
+
+        return SubjectNumbers(
+            total,
+            {sid: n for sid, n in zip(self.students, present) if n},
+            {sid: n for sid, n in zip(self.students, negative) if n},
+        )
+
+
+_stores = OrderedDict()  # caminho → PeriodStore, do menos para o mais usado
+_stores_lock = threading.Lock()
+_missing = set()  # caminhos sem arquivo de origem cujos cubos já foram apagados
+
+
+def _remember(key, store):
+    # chamar com _stores_lock. O cubo que sai do LRU não é fechado aqui:
+    # um request pode estar no meio de numbers() com ele; o mmap (e o fd)
+    # é liberado quando a última referência ao PeriodStore acaba.
+    _stores[key] = store
+    _stores.move_to_end(key)
+    while len(_stores) > SUB_STORE_MAX:
+        _stores.popitem(last=False)
+
+
+def _cube_path(path, sig):
+    prefix = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:20]
+    version = hashlib.sha1(repr(sig).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(SUB_CACHE_DIR, f"{prefix}-{version}.cube"), prefix
+
+
+def _build(path, sig):
+    cube_path, prefix = _cube_path(path, sig)
+
+    if not os.path.exists(cube_path):
+        data = read_json(path, {})
+        os.makedirs(SUB_CACHE_DIR, exist_ok=True)
+
+        tmp = f"{cube_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_encode(data))
+        os.replace(tmp, cube_path)
+
+        # cubos de versões anteriores do mesmo arquivo
+        _remove_cubes(prefix, keep=os.path.basename(cube_path))
+
+    return PeriodStore(cube_path, sig)
+
+
+def _remove_cubes(prefix, keep=None):
+    # cubos do arquivo de origem (prefixo = hash do caminho), menos `keep`;
+    # um mmap já aberto por outro worker continua válido depois do remove
+    try:
+        names = os.listdir(SUB_CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for fname in names:
+        if fname.startswith(prefix + "-") and fname.endswith(".cube") and fname != keep:
+            try:
+                os.remove(os.path.join(SUB_CACHE_DIR, fname))
+            except OSError:
+                pass
+
+
+def get(path):
+    """Cubo do arquivo de presença por aula (None se o arquivo não existir)."""
+    path = os.fspath(path)
+    key = os.path.abspath(path)
+
+    sig = signature(path)
+    if sig is None:
+        with _stores_lock:
+            _stores.pop(key, None)
+            first = key not in _missing
+            _missing.add(key)
+        # arquivo de origem apagado: os cubos dele também saem do disco
+        # (uma vez por caminho e processo, não a cada busca)
+        if first:
+            _remove_cubes(_cube_path(path, None)[1])
+        return None
+
+    with _stores_lock:
+        _missing.discard(key)
+        store = _stores.get(key)
+        if store is not None and store.signature == sig:
+            _stores.move_to_end(key)
+            return store
+
+    try:
+        store = _build(path, sig)
+    except FileNotFoundError:
+        # outro worker trocou o cubo entre o exists() e o open(): remonta
+        os.makedirs(SUB_CACHE_DIR, exist_ok=True)
+        store = _build(path, sig)
+
+    with _stores_lock:
+        _remember(key, store)
+    return store
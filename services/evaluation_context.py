@@ -0,0 +1,264 @@
+import os
+import threading
+from datetime import date
+
+from utils.evaluation import compute_autonomy, evaluate_student
+from utils.date import school_year
+from utils.data import repository
+from utils.storage import read_json, signature
+from services import attendance_sub_store, evaluation_snapshots
+
+# =========================================================
+# Contexto de avaliação da turma (todas as matérias)
+# =========================================================
+#
+# Um ClassEvaluationContext carrega uma vez cada fonte da turma no ano
+# letivo: subjects.json, alunos (StudentRepository), cubo do
+# attendance_sub, as duas listas de tarefas e o arquivo de provas; os
+# snapshots de evaluation/ vêm do índice services.evaluation_snapshots.
+# As avaliações por matéria/mode são guardadas no contexto.
+#
+# O contexto fica em cache enquanto nenhuma entrada mudar (assinaturas
+# de utils.storage, mesmo snapshot de alunos e mesmo cubo): /class/all
+# e as telas de uma matéria reaproveitam o mesmo cálculo.
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SUBJECTS_FILE = "data/subjects.json"
+REPORTS_DIR = os.path.join(ROOT_DIR, "reports")
+EXAMS_DIR = os.path.join(ROOT_DIR, "data", "exams")
+
+# mode:
+#   "continuous" → autonomia do ano inteiro (GET /class, /class/all)
+#   "zenki"      → confirmação do 前期: dados até {sy}-09-30, autonomia do 1º semestre
+#   "koki"       → autonomia do 2º semestre
+EVALUATION_MODES = ("continuous", "zenki", "koki")
+
+EXAM_KEYS = {
+    1: ["single_exam"],
+    4: ["zenki_chukan", "zenki_kimatsu", "koki_chukan", "koki_kimatsu"],
+}
+
+
+def semester_filter(sem, cutoff_date=None):
+    """date_str → bool: semestre ("1", "2" ou "full") até a data de corte."""
+    def keep(date_str):
+        if cutoff_date is not None and date_str > cutoff_date:
+            return False
+        if sem == "full":
+            return True
+
+        month = int(date_str.split("-")[1])
+
+        if sem == "1":
+            return 4 <= month <= 9
+        return month >= 10 or month <= 3
+
+    return keep
+
+
+def _paths(course, grade, class_name, sy):
+    class_id = f"{course}-{grade}-{class_name}"
+    return {
+        "attendance": f"attendance_sub/{class_id}-{sy}.json",
+        "tasks_1st": os.path.join(REPORTS_DIR, f"{sy}-{course}-{grade}-{class_name}-1st.json"),
+        "tasks_2nd": os.path.join(REPORTS_DIR, f"{sy}-{course}-{grade}-{class_name}-2nd.json"),
+        "exams": os.path.join(EXAMS_DIR, f"{sy}-{course}-{grade}-{class_name}.json"),
+    }
+
+
+class ClassEvaluationContext:
+
+    def __init__(self, course, grade, class_name, sy, inputs):
+        self.course = course
+        self.grade = grade
+        self.class_name = class_name
+        self.class_id = f"{course}-{grade}-{class_name}"
+        self.sy = sy
+        self.inputs = inputs
+
+        paths = _paths(course, grade, class_name, sy)
+
+        self.subjects = read_json(SUBJECTS_FILE, {})
+        self.students = repository.by_class(course, grade, class_name)
+        self.store = attendance_sub_store.get(paths["attendance"])
+        self.tasks = [read_json(paths["tasks_1st"], {}), read_json(paths["tasks_2nd"], {})]
+        self.exams = read_json(paths["exams"], {})
+
+        self._results = {}
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # fontes por matéria
+    # -----------------------------
+    def _attendance(self, subject, mode):
+        cutoff_date = f"{self.sy}-09-30" if mode == "zenki" else None
+
+        if self.store is not None:
+            numbers1 = self.store.numbers(subject, semester_filter("1", cutoff_date))
+            numbers2 = self.store.numbers(subject, semester_filter("2", cutoff_date))
+        else:
+            numbers1 = numbers2 = attendance_sub_store.SubjectNumbers()
+
+        # ano inteiro = 1º + 2º semestre
+        return numbers1, numbers2, numbers1 + numbers2
+
+    def _tasks(self, subject):
+        total_tasks = 0
+        submitted = {}
+
+        for block in self.tasks:
+            tasks = block.get("subjects", {}).get(subject, {}).get("tasks", [])
+            total_tasks += len(tasks)
+
+            for t in tasks:
+                for sid in set(t.get("submitted", [])):
+                    submitted[sid] = submitted.get(sid, 0) + 1
+
+        return total_tasks, submitted
+
+    def _snapshots(self, subject, subj):
+        # ZENKI SOMENTE (índice: services.evaluation_snapshots)
+        return evaluation_snapshots.load(subject, self.class_id, subj["subject_group"], self.sy)
+
+    # -----------------------------
+    # avaliação
+    # -----------------------------
+    def evaluate(self, subject, mode="continuous"):
+        """Avaliação de todos os alunos numa matéria (guardada no contexto)."""
+        if mode not in EVALUATION_MODES:
+            raise ValueError(f"invalid evaluation mode: {mode}")
+
+        key = (subject, mode)
+        with self._lock:
+            if key not in self._results:
+                self._results[key] = self._evaluate(subject, mode)
+            return self._results[key]
+
+    def evaluate_all(self, mode="continuous"):
+        """{subject_id: avaliação} para as matérias do curso/ano da turma."""
+        return {
+            s["id"]: self.evaluate(s["id"], mode)
+            for s in self.subjects
+            if s.get("course") == self.course and str(s.get("grade")) == str(self.grade)
+        }
+
+    def _evaluate(self, subject, mode):
+        subj = next((s for s in self.subjects if s["id"] == subject), None)
+
+        if not subj:
+            return {"error": "subject not found"}
+
+        numbers1, numbers2, numbers_full = self._attendance(subject, mode)
+        total_tasks, submitted = self._tasks(subject)
+
+        subject_exams = self.exams.get(subject, {})
+        exam_scores = [
+            subject_exams.get(key, {})
+            for key in EXAM_KEYS.get(int(subj.get("exam_frequency", 1)), [])
+        ]
+
+        snapshots = self._snapshots(subject, subj)
+
+        result = {}
+
+        for st in self.students:
+            sid = st["id"]
+
+            # AUTONOMIA
+            nums1 = numbers1.of(sid)
+            auto1 = compute_autonomy(nums1["present"], nums1["total"], nums1["negative"])
+
+            nums2 = numbers2.of(sid)
+            auto2 = compute_autonomy(nums2["present"], nums2["total"], nums2["negative"])
+
+            if mode == "zenki":
+                autonomy_total = auto1          # ZENKI
+            elif mode == "koki":
+                autonomy_total = auto2          # KOKI
+            else:
+                # continuous = ano inteiro
+                nums_full = numbers_full.of(sid)
+                autonomy_total = compute_autonomy(
+                    nums_full["present"],
+                    nums_full["total"],
+                    nums_full["negative"]
+                )
+
+            # TASKS
+            task_percent = (submitted.get(sid, 0) / total_tasks) * 20 if total_tasks > 0 else 0
+
+            # PROVAS
+            exam_total = 0
+            exam_count = 0
+
+            for scores in exam_scores:
+                if sid in scores:
+                    exam_total += scores[sid]
+                    exam_count += 1
+
+            exam_percent = (exam_total / (exam_count * 100)) * 40 if exam_count > 0 else 0
+
+            # CONTÍNUA
+            auto_grade = evaluate_student(
+                exam_percent=exam_percent,
+                task_percent=task_percent,
+                autonomy_percent=autonomy_total
+            )
+
+            # SNAPSHOTS
+            zenki_snapshot = snapshots.get(sid, {}).get("zenki_snapshot")
+            manual_final = snapshots.get(sid, {}).get("manual_final_grade")
+
+            result[sid] = {
+                "continuous": auto_grade,
+                "zenki_snapshot": zenki_snapshot,
+                "final_snapshot": None,
+                "final_grade": manual_final,
+                "auto1": auto1,
+                "auto2": auto2
+            }
+
+        return result
+
+
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+
+def _inputs(course, grade, class_name, sy):
+    paths = _paths(course, grade, class_name, sy)
+    return {
+        "subjects": signature(SUBJECTS_FILE),
+        "attendance": signature(paths["attendance"]),
+        "tasks_1st": signature(paths["tasks_1st"]),
+        "tasks_2nd": signature(paths["tasks_2nd"]),
+        "exams": signature(paths["exams"]),
+        "snapshots": evaluation_snapshots.class_files(f"{course}-{grade}-{class_name}"),
+    }
+
+
+def class_context(course, grade, class_name) -> ClassEvaluationContext:
+    """Contexto da turma no ano letivo atual (recarregado se alguma entrada mudou)."""
+    sy = school_year(date.today().isoformat())
+    key = (course, str(grade), class_name, sy)
+    inputs = _inputs(course, grade, class_name, sy)
+
+    with _contexts_lock:
+        ctx = _contexts.get(key)
+
+    if (
+        ctx is not None
+        and ctx.inputs == inputs
+        and ctx.students is repository.by_class(course, grade, class_name)
+    ):
+        return ctx
+
+    ctx = ClassEvaluationContext(course, grade, class_name, sy, inputs)
+    with _contexts_lock:
+        _contexts[key] = ctx
+    return ctx
+
+
+def evaluate_class(course, grade, class_name, subject, mode="continuous"):
+    return class_context(course, grade, class_name).evaluate(subject, mode)
@@ -0,0 +1,155 @@
+import os
+import threading
+
+from utils.storage import read_json, write_json, signature, generation, touch, listdir as storage_listdir
+
+# =========================================================
+# Índice dos snapshots de avaliação (evaluation/)
+# =========================================================
+#
+# Cada arquivo evaluation/{class_id}-{subject_group}-{sy}.json guarda
+# "_subject_id" e os snapshots por aluno. Em vez de abrir todos os
+# arquivos a cada busca, o índice guarda nome → (assinatura, _subject_id)
+# e subject_id → nomes (na ordem do diretório).
+#
+# O índice é montado na primeira busca do worker e atualizado por
+# save(). A versão do diretório é a geração de EVAL_DIR
+# (utils.storage, compartilhada entre workers), que save() incrementa,
+# mais o mtime do diretório (arquivos copiados à mão). Quando ela muda,
+# a listagem é conferida, mas só os arquivos com assinatura diferente
+# são relidos; sem mudança, a busca não toca em nenhum arquivo (nem no
+# modo SQLite).
+
+EVAL_DIR = "evaluation"
+
+
+def snapshot_name(class_id, subject_group, sy) -> str:
+    return f"{class_id}-{subject_group}-{sy}.json"
+
+
+class _SnapshotIndex:
+
+    def __init__(self):
+        self.entries = {}       # nome → (assinatura, subject_id)
+        self.by_subject = {}    # subject_id → {nome: None}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def _dir_version(self):
+        try:
+            mtime = os.stat(EVAL_DIR).st_mtime_ns
+        except FileNotFoundError:
+            mtime = 0
+        return generation(EVAL_DIR), mtime
+
+    def refresh(self):
+        # versão lida antes da listagem: um save() no meio gera outra versão
+        version = self._dir_version()
+        if version == self.version:
+            return
+
+        entries = {}
+        for fname in storage_listdir(EVAL_DIR):
+            if not fname.endswith(".json"):
+                continue
+
+            sig = signature(os.path.join(EVAL_DIR, fname))
+            old = self.entries.get(fname)
+            if old is not None and old[0] == sig:
+                entries[fname] = old
+                continue
+
+            data = read_json(os.path.join(EVAL_DIR, fname), {})
+            subject_id = data.get("_subject_id") if isinstance(data, dict) else None
+            entries[fname] = (sig, subject_id)
+
+        self._install(entries)
+        self.version = version
+
+    def _install(self, entries):
+        by_subject = {}
+        for fname, (_, subject_id) in entries.items():
+            by_subject.setdefault(subject_id, {})[fname] = None
+        self.entries = entries
+        self.by_subject = by_subject
+
+    def record(self, fname, subject_id):
+        entries = dict(self.entries)
+        entries.pop(fname, None)
+        entries[fname] = (signature(os.path.join(EVAL_DIR, fname)), subject_id)
+        self._install(entries)
+        # a versão do diretório não é adotada aqui: o próximo refresh ainda
+        # confere se outro worker gravou junto (sem reler este arquivo)
+
+    def find(self, subject_id, prefix):
+        names = self.by_subject.get(subject_id, {})
+
+        # nome gravado por save(): busca direta
+        if prefix + ".json" in names:
+            return prefix + ".json"
+
+        for fname in names:
+            if fname.startswith(prefix):
+                return fname
+        return None
+
+
+_index = _SnapshotIndex()
+
+
+def find(subject_id, class_id, subject_group, sy):
+    """Nome do arquivo de snapshot da matéria na turma/ano (None se não há)."""
+    with _index.lock:
+        _index.refresh()
+        return _index.find(subject_id, f"{class_id}-{subject_group}-{sy}")
+
+
+def class_files(class_id) -> tuple:
+    """(nome, assinatura) dos snapshots da turma — para chaves de cache."""
+    with _index.lock:
+        _index.refresh()
+        return tuple(
+            (fname, sig)
+            for fname, (sig, _) in _index.entries.items()
+            if fname.startswith(f"{class_id}-")
+        )
+
+
+def load(subject_id, class_id, subject_group, sy) -> dict:
+    """{sid: {"zenki_snapshot", "manual_final_grade"}} do snapshot ({} se não há)."""
+    fname = find(subject_id, class_id, subject_group, sy)
+    if fname is None:
+        return {}
+
+    data = read_json(os.path.join(EVAL_DIR, fname), {})
+
+    # trocado por outro worker depois do refresh: relê o índice
+    if not isinstance(data, dict) or data.get("_subject_id") != subject_id:
+        with _index.lock:
+            _index.version = None
+        fname = find(subject_id, class_id, subject_group, sy)
+        if fname is None:
+            return {}
+        data = read_json(os.path.join(EVAL_DIR, fname), {})
+        if not isinstance(data, dict):
+            return {}
+
+    return {
+        sid: {
+            "zenki_snapshot": snap.get("zenki_snapshot"),
+            "manual_final_grade": snap.get("manual_final_grade")
+        }
+        for sid, snap in data.items()
+        if isinstance(snap, dict)
+    }
+
+
+def save(class_id, subject_group, sy, snapshots: dict):
+    """Grava o snapshot (com "_subject_id") e atualiza o índice."""
+    fname = snapshot_name(class_id, subject_group, sy)
+    write_json(os.path.join(EVAL_DIR, fname), snapshots)
+    # avisa os outros workers (a mesma geração vale no modo SQLite)
+    touch(EVAL_DIR)
+
+    with _index.lock:
+        _index.record(fname, snapshots.get("_subject_id"))
@@ -0,0 +1,209 @@
+import os
+import re
+import time
+import uuid
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+
+from routers.exams_export import BASE_DIR as EXAMS_DIR, EXAM_KEY_MAP, render_exam_scores
+from routers.students import render_classlist
+from utils.data import repository
+from utils.storage import read_json, write_json, listdir, remove
+
+# =========================================================
+# Exportação em lote (provas de todas as turmas + 名簿)
+# =========================================================
+#
+# Um job gera, para um ano letivo, o .xlsm de prova de cada turma (um
+# por exame) e o 名簿 de cada 学年, num pool de processos (spawn,
+# EXPORT_WORKERS), e junta tudo num único ZIP.
+#
+# O estado do job fica em EXPORT_DIR/{job_id}.json e o ZIP em
+# EXPORT_DIR/{job_id}.zip: qualquer worker do uvicorn responde o status
+# e o download, não só o que recebeu o POST. O job roda numa thread do
+# processo que o criou. Jobs terminados há mais de EXPORT_TTL segundos
+# (ou que nunca terminaram, contando da criação) são apagados quando um
+# novo job começa.
+
+EXPORT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "exports"
+)
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", "0")) or (os.cpu_count() or 1)
+EXPORT_TTL = float(os.environ.get("EXPORT_TTL", str(24 * 3600)))
+
+JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: o worker não herda locks/threads do servidor
+            _pool = ProcessPoolExecutor(
+                max_workers=EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _job_path(job_id):
+    return os.path.join(EXPORT_DIR, f"{job_id}.json")
+
+
+def zip_path(job_id):
+    return os.path.join(EXPORT_DIR, f"{job_id}.zip")
+
+
+# -----------------------------
+# tarefas
+# -----------------------------
+def _exam_files(year):
+    # data/exams/{year}-{course}-{grade}-{class}.json → (course, grade, class)
+    prefix = f"{year}-"
+    for fname in sorted(listdir(EXAMS_DIR)):
+        if not fname.startswith(prefix) or not fname.endswith(".json"):
+            continue
+        parts = fname[len(prefix):-len(".json")].split("-", 2)
+        if len(parts) == 3 and parts[1].isdigit():
+            yield parts[0], int(parts[1]), parts[2], fname
+
+
+def _exams_with_scores(fname):
+    # exames (label JP) com alguma nota no arquivo da turma
+    data = read_json(EXAMS_DIR / fname, {})
+    used = {key for subject in data.values() if isinstance(subject, dict) for key in subject}
+    return [label for label, key in EXAM_KEY_MAP.items() if key in used]
+
+
+def build_tasks(year, exam_keys=None, classlists=True) -> list:
+    """
+    [("exam", (course, grade, class, year, exam_key)) | ("classlist", (grade,))].
+    Sem exam_keys: os exames que têm nota no arquivo de cada turma.
+    """
+    tasks = []
+
+    for course, grade, class_name, fname in _exam_files(year):
+        for exam_key in (exam_keys or _exams_with_scores(fname)):
+            tasks.append(("exam", (course, grade, class_name, year, exam_key)))
+
+    if classlists:
+        grades = sorted({grade for _, grade, _ in repository.class_groups() if grade.isdigit()})
+        tasks.extend(("classlist", (grade,)) for grade in grades)
+
+    return tasks
+
+
+def _render(task):
+    # roda no worker: (nome no ZIP, bytes, erro)
+    kind, args = task
+    try:
+        if kind == "exam":
+            content, name = render_exam_scores(*args)
+            return f"exams/{args[4]}/{name}", content, None
+        content, name = render_classlist(*args)
+        return f"classlists/{name}", content, None
+    except HTTPException as e:
+        return None, None, f"{kind} {'-'.join(map(str, args))}: {e.detail}"
+    except Exception as e:
+        # um arquivo quebrado de uma turma não derruba o job inteiro
+        return None, None, f"{kind} {'-'.join(map(str, args))}: {type(e).__name__}: {e}"
+
+
+# -----------------------------
+# job
+# -----------------------------
+def _save(job):
+    write_json(_job_path(job["id"]), job)
+
+
+def _run(job, tasks):
+    job["status"] = "running"
+    _save(job)
+
+    tmp = f"{zip_path(job['id'])}.{os.getpid()}.tmp"
+    try:
+        if len(tasks) > 1 and EXPORT_WORKERS > 1:
+            results = _get_pool().map(_render, tasks)
+        else:
+            results = map(_render, tasks)
+
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as z:
+            for arcname, content, error in results:
+                if error is None:
+                    z.writestr(arcname, content)
+                else:
+                    job["errors"].append(error)
+                job["done"] += 1
+                _save(job)
+
+        os.replace(tmp, zip_path(job["id"]))
+        job["status"] = "done"
+    except Exception as e:
+        print("EXPORT JOB ERROR:", job["id"], e)
+        job["status"] = "error"
+        job["errors"].append(str(e))
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+    job["finished_at"] = time.time()
+    _save(job)
+
+
+def _cleanup():
+    now = time.time()
+    for fname in listdir(EXPORT_DIR):
+        if not fname.endswith(".json"):
+            continue
+        job = read_json(os.path.join(EXPORT_DIR, fname), {})
+        if "id" not in job:
+            continue
+        # job sem finished_at há mais de EXPORT_TTL: o processo dele morreu
+        since = job.get("finished_at") or job.get("created_at") or 0
+        if now - since < EXPORT_TTL:
+            continue
+        remove(_job_path(job["id"]))
+        try:
+            os.remove(zip_path(job["id"]))
+        except OSError:
+            pass
+
+
+def start(year, exam_keys=None, classlists=True) -> dict:
+    """Cria o job e começa a gerar em segundo plano; devolve o status inicial."""
+    _cleanup()
+
+    tasks = build_tasks(year, exam_keys, classlists)
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "year": year,
+        "exam_keys": exam_keys,
+        "total": len(tasks),
+        "done": 0,
+        "errors": [],
+        "created_at": time.time(),
+        "finished_at": None,
+    }
+    _save(job)
+    initial = dict(job, errors=[])
+
+    threading.Thread(
+        target=_run, args=(job, tasks), name=f"export-{job['id']}", daemon=True
+    ).start()
+    return initial
+
+
+def status(job_id):
+    """Status do job (None se não existe)."""
+    if not JOB_ID_RE.fullmatch(job_id):
+        return None
+    return read_json(_job_path(job_id))
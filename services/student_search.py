@@ -0,0 +1,156 @@
+import os
+import threading
+
+from utils.data import repository, DATA_DIR
+from utils.formatter import fold, norm_phone
+from utils.storage import read_json, signature
+
+# =========================================================
+# Índice de busca de alunos e formados (n-gramas)
+# =========================================================
+#
+# Cada registro é indexado pelos caracteres e pares de caracteres de
+# name / kana / id (minúsculas, hiragana → katakana) e dos telefones
+# normalizados (meia largura, sem "-" e espaços). A busca intersecta as
+# listas dos n-gramas da palavra e só confere "substring" nos candidatos,
+# na ordem do arquivo — mesmo resultado da varredura, sem percorrer tudo.
+#
+# Alunos: o índice acompanha o snapshot do StudentRepository; numa
+# escrita só as posições com registro novo (copy-on-write) são
+# reindexadas. Formados: graduates.json fica em cache pela assinatura.
+
+TEXT_FIELDS = ("name", "kana", "id")
+PHONE_FIELDS = ("phone", "emergency1", "emergency2")
+
+GRADUATES_FILE = os.path.join(DATA_DIR, "graduates.json")
+
+
+def _ngrams(values):
+    grams = set()
+    for v in values:
+        grams.update(v)
+        grams.update(v[i:i + 2] for i in range(len(v) - 1))
+    return grams
+
+
+def _query_grams(q):
+    if len(q) == 1:
+        return {q}
+    return {q[i:i + 2] for i in range(len(q) - 1)}
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self.records = ()
+        self.texts = []         # posição → textos normalizados
+        self.phones = []        # posição → telefones normalizados
+        self.text_grams = {}    # n-grama → {posições}
+        self.phone_grams = {}
+        self.lock = threading.Lock()
+
+    # -----------------------------
+    # manutenção
+    # -----------------------------
+    def _add(self, i, record):
+        texts = tuple(fold(record.get(f)) for f in TEXT_FIELDS)
+        phones = tuple(norm_phone(str(record.get(f) or "")) for f in PHONE_FIELDS)
+        self.texts[i] = texts
+        self.phones[i] = phones
+        for g in _ngrams(texts):
+            self.text_grams.setdefault(g, set()).add(i)
+        for g in _ngrams(phones):
+            self.phone_grams.setdefault(g, set()).add(i)
+
+    def _remove(self, i):
+        for grams, values in ((self.text_grams, self.texts[i]), (self.phone_grams, self.phones[i])):
+            for g in _ngrams(values):
+                positions = grams.get(g)
+                if positions is not None:
+                    positions.discard(i)
+                    if not positions:
+                        del grams[g]
+
+    def sync(self, records):
+        """Acompanha a lista de registros (chamar com o lock)."""
+        if records is self.records:
+            return
+
+        if len(records) != len(self.records):
+            self.texts = [None] * len(records)
+            self.phones = [None] * len(records)
+            self.text_grams = {}
+            self.phone_grams = {}
+            for i, record in enumerate(records):
+                self._add(i, record)
+        else:
+            # mesmo tamanho: só as posições com registro trocado
+            for i, (old, new) in enumerate(zip(self.records, records)):
+                if old is not new:
+                    self._remove(i)
+                    self._add(i, new)
+
+        self.records = records
+
+    # -----------------------------
+    # busca
+    # -----------------------------
+    @staticmethod
+    def _candidates(grams, q):
+        postings = []
+        for g in _query_grams(q):
+            positions = grams.get(g)
+            if not positions:
+                return set()
+            postings.append(positions)
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def search(self, keyword: str, phones=True) -> list:
+        q_text = fold(keyword)
+        q_phone = norm_phone(keyword) if phones else None
+
+        # palavra vazia (ou só "-"/espaços, no telefone) casa com todos
+        if not q_text or (phones and not q_phone):
+            return list(self.records)
+
+        found = {
+            i for i in self._candidates(self.text_grams, q_text)
+            if any(q_text in t for t in self.texts[i])
+        }
+        if phones:
+            found.update(
+                i for i in self._candidates(self.phone_grams, q_phone)
+                if any(q_phone in p for p in self.phones[i])
+            )
+
+        return [self.records[i] for i in sorted(found)]
+
+
+_students = SearchIndex()
+_graduates = SearchIndex()
+_graduates_cache = {"signature": None, "records": ()}
+
+
+def search_students(keyword: str, phones=True) -> list:
+    """Alunos (students.json) cujo name/kana/id (ou telefone) contém a palavra."""
+    with _students.lock:
+        _students.sync(repository.all())
+        return _students.search(keyword, phones)
+
+
+def graduates() -> tuple:
+    """graduates.json em cache (somente leitura — não modificar os registros)."""
+    sig = signature(GRADUATES_FILE)
+    with _graduates.lock:
+        if _graduates_cache["signature"] != sig or sig is None:
+            _graduates_cache["records"] = tuple(read_json(GRADUATES_FILE, []))
+            _graduates_cache["signature"] = sig
+        return _graduates_cache["records"]
+
+
+def search_graduates(keyword: str) -> list:
+    records = graduates()
+    with _graduates.lock:
+        _graduates.sync(records)
+        return _graduates.search(keyword, phones=False)
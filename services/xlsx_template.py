@@ -0,0 +1,223 @@
+import os
+import re
+import zipfile
+import threading
+import posixpath
+from io import BytesIO
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+# =========================================================
+# Templates .xlsm pré-processados (exportação de notas)
+# =========================================================
+#
+# Em vez de openpyxl.load_workbook(keep_vba=True) + wb.save() a cada
+# download, o template é lido uma vez (por mtime) e guardado como as
+# partes do zip; o XML das planilhas fica separado por linha. Cada
+# exportação só troca as linhas com células preenchidas e regrava o
+# zip — VBA, estilos, gráficos e o resto do pacote seguem como estão.
+#
+# Valores: números → <v>, texto → inlineStr, "" / None → célula vazia
+# (o estilo "s" da célula do template é mantido). O workbook é marcado
+# com fullCalcOnLoad para o Excel recalcular as fórmulas ao abrir.
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+ROW_RE = re.compile(r'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+CELL_RE = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+ATTR_R_RE = re.compile(r'\br="([A-Z]+)?(\d+)"')
+STYLE_RE = re.compile(r'\bs="(\d+)"')
+MERGE_RE = re.compile(r'<mergeCells\b.*?</mergeCells>', re.S)
+CALC_RE = re.compile(r'<calcPr\b([^>]*?)(/?)>')
+
+
+def _col_number(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def column_letter(n):
+    letters = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _split_ref(ref):
+    m = re.fullmatch(r"([A-Z]+)(\d+)", ref)
+    if m is None:
+        raise ValueError(f"invalid cell reference: {ref}")
+    return _col_number(m.group(1)), int(m.group(2))
+
+
+def _cell_xml(ref, value, style):
+    s = f' s="{style}"' if style is not None else ""
+
+    if value is None or value == "":
+        return f'<c r="{ref}"{s}/>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{s}><v>{value}</v></c>'
+
+    text = escape(str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+
+class _Sheet:
+    """XML da planilha separado em: antes de <sheetData>, linhas, depois."""
+
+    def __init__(self, xml):
+        start = xml.index("<sheetData")
+        open_end = xml.index(">", start) + 1
+
+        if xml[open_end - 2] == "/":  # <sheetData/>
+            self.head = xml[:start] + "<sheetData>"
+            body, self.tail = "", "</sheetData>" + xml[open_end:]
+        else:
+            end = xml.index("</sheetData>", open_end)
+            self.head = xml[:open_end]
+            body, self.tail = xml[open_end:end], xml[end:]
+
+        self.rows = {}  # nº da linha → XML da linha
+        for m in ROW_RE.finditer(body):
+            r = re.search(r'\br="(\d+)"', m.group()[:m.group().index(">")])
+            self.rows[int(r.group(1))] = m.group()
+
+    def _patch_row(self, r, values):
+        xml = self.rows.get(r)
+
+        if xml is None:
+            open_tag, cells = f'<row r="{r}">', {}
+        elif xml.endswith("/>") and "<c" not in xml:
+            open_tag, cells = xml[:-2] + ">", {}
+        else:
+            close = xml.index(">") + 1
+            open_tag = xml[:close]
+            cells = {}
+            for m in CELL_RE.finditer(xml[close:-len("</row>")]):
+                ref = ATTR_R_RE.search(m.group()[:m.group().index(">") + 1])
+                cells[_col_number(ref.group(1))] = m.group()
+
+        for col, value in values.items():
+            old = cells.get(col)
+            style = None
+            if old is not None:
+                s = STYLE_RE.search(old[:old.index(">") + 1])
+                style = s.group(1) if s else None
+            cells[col] = _cell_xml(f"{column_letter(col)}{r}", value, style)
+
+        # "spans" do template pode não cobrir células novas: deixa o Excel recalcular
+        open_tag = re.sub(r'\sspans="[^"]*"', "", open_tag)
+        return open_tag + "".join(cells[c] for c in sorted(cells)) + "</row>"
+
+    def render(self, values, unmerge=False):
+        by_row = {}
+        for ref, value in values.items():
+            col, r = _split_ref(ref)
+            by_row.setdefault(r, {})[col] = value
+
+        rows = dict(self.rows)
+        for r, row_values in by_row.items():
+            rows[r] = self._patch_row(r, row_values)
+
+        tail = MERGE_RE.sub("", self.tail) if unmerge else self.tail
+        return self.head + "".join(rows[r] for r in sorted(rows)) + tail
+
+
+class XlsxTemplate:
+    """Partes de um .xlsx/.xlsm lidas uma vez; render() gera uma cópia preenchida."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+
+        with zipfile.ZipFile(path) as z:
+            self.infos = z.infolist()
+            self.parts = {info.filename: z.read(info.filename) for info in self.infos}
+
+        self.sheet_parts = self._sheet_parts()
+        self._sheets = {}
+        self._lock = threading.Lock()
+
+        workbook = self.parts["xl/workbook.xml"].decode("utf-8")
+        self.workbook_xml = CALC_RE.sub(self._full_calc, workbook, count=1).encode("utf-8")
+
+    @staticmethod
+    def _full_calc(m):
+        attrs = re.sub(r'\sfullCalcOnLoad="[^"]*"', "", m.group(1))
+        return f'<calcPr{attrs} fullCalcOnLoad="1"{m.group(2)}>'
+
+    def _sheet_parts(self):
+        # nome da planilha → caminho da parte no zip
+        rels = ElementTree.fromstring(self.parts["xl/_rels/workbook.xml.rels"])
+        targets = {
+            rel.get("Id"): rel.get("Target")
+            for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship")
+        }
+
+        workbook = ElementTree.fromstring(self.parts["xl/workbook.xml"])
+        parts = {}
+        for sheet in workbook.iter(f"{{{NS_MAIN}}}sheet"):
+            target = targets[sheet.get(f"{{{NS_REL}}}id")]
+            if target.startswith("/"):
+                parts[sheet.get("name")] = target.lstrip("/")
+            else:
+                parts[sheet.get("name")] = posixpath.normpath(posixpath.join("xl", target))
+        return parts
+
+    def sheet(self, name) -> _Sheet:
+        if name not in self.sheet_parts:
+            raise KeyError(f"worksheet not found: {name}")
+        with self._lock:
+            sheet = self._sheets.get(name)
+            if sheet is None:
+                xml = self.parts[self.sheet_parts[name]].decode("utf-8")
+                sheet = self._sheets[name] = _Sheet(xml)
+            return sheet
+
+    def render(self, values: dict, unmerge=()) -> bytes:
+        """
+        values: {nome da planilha: {"B3": valor, ...}}
+        unmerge: planilhas cujas células mescladas são desfeitas.
+        """
+        replaced = {"xl/workbook.xml": self.workbook_xml}
+        for name, cells in values.items():
+            xml = self.sheet(name).render(cells, unmerge=name in unmerge)
+            replaced[self.sheet_parts[name]] = xml.encode("utf-8")
+        for name in unmerge:
+            if name not in values:
+                xml = self.sheet(name).render({}, unmerge=True)
+                replaced[self.sheet_parts[name]] = xml.encode("utf-8")
+
+        output = BytesIO()
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as z:
+            for info in self.infos:
+                z.writestr(info, replaced.get(info.filename, self.parts[info.filename]))
+        return output.getvalue()
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get(path) -> XlsxTemplate:
+    """Template pré-processado (relido quando o arquivo muda)."""
+    path = os.path.abspath(os.fspath(path))
+    mtime = os.stat(path).st_mtime_ns
+
+    with _templates_lock:
+        template = _templates.get(path)
+    if template is not None and template.mtime == mtime:
+        return template
+
+    template = XlsxTemplate(path)
+    with _templates_lock:
+        _templates[path] = template
+    return template
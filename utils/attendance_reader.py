@@ -1,5 +1,9 @@
 # utils/attendance_reader.py
 
+# ✔ Status confirmados por você
+PRESENT_STATUSES = {"出席", "遅刻", "怠学・居眠り", "忘れ物"}
+NEGATIVE_STATUSES = {"遅刻", "怠学・居眠り", "忘れ物"}
+
 def extract_attendance_numbers(attendance_json: dict, student_id: str):
     """
     Lê o JSON cru salvo pelo attendance_sub.py e retorna:
@@ -15,10 +19,6 @@ def extract_attendance_numbers(attendance_json: dict, student_id: str):
     present = 0
     negative = 0
 
-    # ✔ Status confirmados por você
-    PRESENT_STATUSES = {"出席", "遅刻", "怠学・居眠り", "忘れ物"}
-    NEGATIVE_STATUSES = {"遅刻", "怠学・居眠り", "忘れ物"}
-
     for date, periods in attendance_json.items():
         for period, info in periods.items():
 
@@ -1,5 +1,7 @@
 import os
-import json
+from fastapi import HTTPException
+
+from utils.student_repository import StudentRepository, StudentNotFound
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "..", "data")
@@ -9,27 +11,31 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 STUDENTS_FILE = os.path.join(DATA_DIR, "students.json")
 
-def load_data():
-    if not os.path.exists(STUDENTS_FILE):
-        return []
-    with open(STUDENTS_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
+repository = StudentRepository(STUDENTS_FILE)
 
-    changed = False
-    for s in data:
-        if "status" not in s or not s["status"]:
-            s["status"] = "在籍"
-            changed = True
 
-        if "suspension_history" not in s:
-            s["suspension_history"] = []
-            changed = True
+def get_students():
+    # visão somente leitura (cache compartilhado) — NÃO modificar os registros
+    return repository.all()
 
-    if changed:
-        save_data(data)
+def find_student(student_id: str):
+    # busca O(1) pelo índice de IDs — somente leitura
+    return repository.get(student_id)
 
-    return data
+def load_data():
+    # cópia mutável para fluxos que alteram e depois chamam save_data()
+    return repository.load()
 
 def save_data(data):
-    with open(STUDENTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    repository.save(data)
+
+def update_student_record(student_id: str, fn, not_found: str = "Student not found"):
+    # escrita de UM aluno (índice por ID, sem carregar/varrer a lista inteira)
+    try:
+        return repository.update(student_id, fn)
+    except StudentNotFound:
+        raise HTTPException(status_code=404, detail=not_found)
+
+def update_students(fn):
+    # read-modify-write da lista inteira sob o lock do students.json (fluxos em lote)
+    return repository.transaction(fn)
@@ -2,6 +2,8 @@ import os
 import json
 from pathlib import Path
 
+from utils.storage import write_json
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
@@ -15,5 +17,4 @@ def load_json(filename: str):
 
 def save_json(filename: str, data):
     path = DATA_DIR / filename
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json(path, data)
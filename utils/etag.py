@@ -0,0 +1,63 @@
+import os
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from utils.storage import signature
+
+# =========================================================
+# ETag / GET condicional para endpoints de leitura
+# =========================================================
+#
+# O ETag (forte) é o hash da URL (caminho + query ordenada) e das
+# assinaturas de utils.storage dos arquivos que o endpoint lê: qualquer
+# escrita, em qualquer worker, muda a assinatura. A verificação roda
+# como dependência, antes do handler: com If-None-Match igual, a
+# resposta é 304 sem ler o JSON nem serializar nada.
+#
+#   @router.get("/", dependencies=[conditional(STUDENTS_FILE)])
+#   @router.get("", dependencies=[conditional(paths_of=lambda q: [...])])
+#
+# paths_of recebe os query params (dict) e devolve os arquivos da request.
+
+
+def compute_etag(request: Request, paths) -> str:
+    h = hashlib.sha1(request.url.path.encode("utf-8"))
+    for key, value in sorted(request.query_params.multi_items()):
+        h.update(f"\0{key}={value}".encode("utf-8"))
+    for path in paths:
+        h.update(repr((os.fspath(path), signature(path))).encode("utf-8"))
+    return f'"{h.hexdigest()}"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match usa comparação fraca: W/"x" vale como "x"
+    tags = (t.strip() for t in if_none_match.split(","))
+    return etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+def conditional(*paths, paths_of=None):
+    """Dependência: ETag pelos arquivos lidos; If-None-Match igual → 304."""
+
+    def check(request: Request, response: Response):
+        files = list(paths)
+        if paths_of is not None:
+            try:
+                files.extend(paths_of(dict(request.query_params)))
+            except (KeyError, ValueError):
+                # parâmetro faltando/inválido: o handler responde o 422
+                return
+
+        etag = compute_etag(request, files)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if _matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+
+    return Depends(check)
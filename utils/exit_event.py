@@ -1,6 +1,6 @@
-import json
 import os
 from main import DATA_DIR
+from utils.storage import read_json
 
 FILES = {
     "退学": "taigaku.json",
@@ -13,12 +13,10 @@ def load_exit_events():
 
     for event_type, filename in FILES.items():
         path = os.path.join(DATA_DIR, filename)
-        if not os.path.exists(path):
+        events = read_json(path)
+        if events is None:
             continue
 
-        with open(path, encoding="utf-8") as f:
-            events = json.load(f)
-
         for e in events:
 
             # tenta vários nomes possíveis de ano
@@ -0,0 +1,44 @@
+# =========================================================
+# Normalização de texto (busca, exportações)
+# =========================================================
+
+HALF_WIDTH = str.maketrans({
+    "０": "0", "１": "1", "２": "2", "３": "3", "４": "4",
+    "５": "5", "６": "6", "７": "7", "８": "8", "９": "9",
+    "－": "-", "ー": "-", "―": "-", "−": "-"
+})
+
+
+def hira_to_kata(text: str) -> str:
+    if not text:
+        return ""
+    result = []
+    for ch in text:
+        code = ord(ch)
+        # Hiragana range
+        if 0x3041 <= code <= 0x3096:
+            result.append(chr(code + 0x60))  # shift to Katakana block
+        else:
+            result.append(ch)
+    return "".join(result)
+
+
+def to_half_width(s: str) -> str:
+    if not s:
+        return ""
+    return s.translate(HALF_WIDTH)
+
+
+def norm_phone(s: str | None) -> str:
+    # telefone: dígitos em meia largura, sem "-" e espaços
+    if not s:
+        return ""
+    s = to_half_width(s)
+    return s.replace("-", "").replace(" ", "").lower()
+
+
+def fold(s: str | None) -> str:
+    # nome / かな / ID: minúsculas, hiragana → katakana
+    if not s:
+        return ""
+    return hira_to_kata(str(s).lower())
@@ -1,6 +1,6 @@
 import os
-import json
 from utils.data import load_data
+from utils.storage import read_json
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -28,15 +28,12 @@ def generate_student_id(year: str, course: str, students: list) -> str:
 
     # 卒業生もチェック
     graduates_path = os.path.join(BASE_DIR, "..", "data", "graduates.json")
-    if os.path.exists(graduates_path):
-        with open(graduates_path, "r", encoding="utf-8") as f:
-            grads = json.load(f)
-            for g in grads:
-                gid = g.get("id", "")
-                if gid.startswith(prefix_str):
-                    parts = gid.split("-")
-                    if len(parts) == 3 and parts[2].isdigit():
-                        ids.append(int(parts[2]))
+    for g in read_json(graduates_path, []):
+        gid = g.get("id", "")
+        if gid.startswith(prefix_str):
+            parts = gid.split("-")
+            if len(parts) == 3 and parts[2].isdigit():
+                ids.append(int(parts[2]))
 
     next_seq = (max(ids) + 1) if ids else 1
     return f"{prefix_str}{next_seq:03d}".lower()
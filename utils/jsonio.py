@@ -0,0 +1,104 @@
+import json
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # sem orjson: mesma saída com o json da biblioteca padrão
+    orjson = None
+
+# =========================================================
+# JSON rápido (orjson, opcional) para respostas e arquivos
+# =========================================================
+#
+# Com orjson instalado, loads()/dumps() e a resposta padrão da API
+# (FastJSONResponse, usada em main.py) usam orjson; sem ele, o json da
+# biblioteca padrão. O formato é o mesmo nos dois casos: UTF-8 sem
+# escapes (ensure_ascii=False), compacto ou com indentação de 2. Só
+# muda a grafia de alguns floats (1e16 em vez de 1e+16) e NaN/Infinity,
+# que viram null com orjson (o json padrão grava NaN, que não é JSON).
+#
+# Valores que o orjson não aceita (inteiros de mais de 64 bits,
+# NaN/Infinity na leitura) caem no json padrão em vez de falhar.
+#
+# Benchmark com os arquivos de data/:  python -m utils.jsonio
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+    _PRETTY = _OPTIONS | orjson.OPT_INDENT_2
+
+
+def loads(data):
+    """bytes / str → objeto."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # o json padrão aceita NaN/Infinity ou dá o mesmo erro
+    return json.loads(data)
+
+
+def dumps(data, pretty=False) -> bytes:
+    """Objeto → bytes UTF-8 (compacto, ou indentado com 2 espaços)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=_PRETTY if pretty else _OPTIONS)
+        except orjson.JSONEncodeError:
+            pass  # o json padrão aceita o valor ou dá o mesmo TypeError
+    if pretty:
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return text.encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Resposta padrão da API: o corpo é gerado por dumps()."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(content, response: Response | None = None) -> FastJSONResponse:
+    """
+    Resposta pronta para dados já validados: o FastAPI não passa um
+    Response devolvido pela rota pelo response_model nem pelo
+    jsonable_encoder. response: o Response da rota, para manter os
+    headers postos por dependências (ex.: ETag de utils.etag).
+    """
+    headers = dict(response.headers) if response is not None else None
+    return FastJSONResponse(content, headers=headers)
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import timeit
+
+    from utils.data import DATA_DIR
+
+    # arquivos .json de data/ (ou os passados na linha de comando), maiores primeiro
+    paths = sys.argv[1:] or [
+        os.path.join(root, name)
+        for root, _, names in os.walk(DATA_DIR)
+        for name in names
+        if name.endswith(".json")
+    ]
+    paths = sorted(paths, key=os.path.getsize, reverse=True)[:10]
+
+    def best(fn, n=5):
+        return min(timeit.repeat(fn, number=1, repeat=n)) * 1000
+
+    print(f"orjson: {'sim' if orjson is not None else 'não instalado'}")
+    print(f"{'arquivo':40} {'KB':>8} {'load json':>10} {'load':>8} "
+          f"{'dump json':>10} {'dump':>8} {'indent=2':>9}")
+    for path in paths:
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = loads(raw)
+        print(
+            f"{os.path.relpath(path, DATA_DIR)[-40:]:40} {len(raw) / 1024:8.0f}"
+            f" {best(lambda: json.loads(raw)):9.2f}ms {best(lambda: loads(raw)):7.2f}ms"
+            f" {best(lambda: json.dumps(data, ensure_ascii=False, indent=2)):9.2f}ms"
+            f" {best(lambda: dumps(data)):7.2f}ms {best(lambda: dumps(data, pretty=True)):8.2f}ms"
+        )
@@ -1,6 +1,8 @@
 import os
 import json
 
+from utils.storage import write_json
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "..", "data")
 DATA_DIR = os.path.abspath(DATA_DIR)
@@ -14,5 +16,4 @@ def load_seating_prefs():
         return json.load(f)
 
 def save_seating_prefs(data):
-    with open(PREF_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json(PREF_FILE, data)
@@ -0,0 +1,773 @@
+import os
+import copy
+import atexit
+import logging
+import hashlib
+import weakref
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: só locks entre threads do mesmo processo
+    fcntl = None
+
+from database import connection as db
+from database import documents
+from database import columnar
+from utils import jsonio
+
+# =========================================================
+# Persistência JSON atômica (compartilhada por todos os writers)
+# =========================================================
+#
+# Toda escrita vai para um arquivo temporário no mesmo diretório e
+# depois os.replace() troca o arquivo de uma vez: um crash no meio do
+# dump nunca deixa o students.json / attendance pela metade.
+#
+# DATA_DURABILITY (.env):
+#   "fsync" (padrão) → fsync do arquivo e do diretório a cada escrita
+#   "batch"          → troca atômica já; fsync em lote a cada
+#                      DATA_FSYNC_INTERVAL segundos (mais vazão)
+#   "none"           → só a troca atômica, sem fsync (testes / dev)
+#
+# Vários workers (uvicorn --workers N):
+#   cada arquivo de dados tem um arquivo de lock em DATA_LOCK_DIR
+#   (padrão data/.locks). locked() pega o lock da thread E um flock()
+#   exclusivo nele, então read-modify-write é serializado entre
+#   processos. O lock file guarda também um contador de geração
+#   (8 bytes) incrementado a cada escrita: caches de outros processos
+#   comparam generation(path) para saber se precisam recarregar.
+#
+# DATA_BACKEND=sqlite (database/connection.py):
+#   os documentos de alunos, presença, notas, tarefas, avaliações e
+#   saídas vão para o SQLite (WAL) em vez de arquivos; as funções abaixo
+#   são as mesmas, então as rotas não mudam. Migração: python -m database.migrate
+#
+# DATA_JOURNAL=1 (modo journal, só arquivos JSON):
+#   journal_set() / journal_delete() não regravam o arquivo do ano
+#   inteiro: acrescentam uma linha em "<arquivo>.log". read_json()
+#   aplica o log por cima do arquivo base, e um compactador em segundo
+#   plano (a cada DATA_JOURNAL_INTERVAL segundos, quando o log passa de
+#   DATA_JOURNAL_MAX_BYTES e no shutdown) junta o log ao base; sync()
+#   compacta tudo na hora. Sem DATA_JOURNAL, as mesmas funções fazem
+#   update_json.
+#
+# DATA_COLUMNAR=1 (database/columnar.py, só arquivos):
+#   o arquivo base da presença HR é gravado como "<arquivo>.cols"
+#   (tabela de alunos × datas em uint8) em vez do JSON indentado.
+#   read_json() devolve o mesmo dict; read_columns() dá acesso direto
+#   à linha de um aluno pelo mmap.
+#
+# Formato dos arquivos (utils/jsonio.py, orjson quando instalado):
+#   compacto por padrão; DATA_JSON_PRETTY=1 (ou write_json(..., indent=2))
+#   grava indentado para leitura humana. A leitura aceita os dois.
+
+DURABILITY_LEVELS = ("none", "batch", "fsync")
+
+DURABILITY = os.environ.get("DATA_DURABILITY", "fsync")
+if DURABILITY not in DURABILITY_LEVELS:
+    DURABILITY = "fsync"
+
+FSYNC_INTERVAL = float(os.environ.get("DATA_FSYNC_INTERVAL", "1.0"))
+
+JOURNAL = os.environ.get("DATA_JOURNAL", "0") == "1"
+JOURNAL_INTERVAL = float(os.environ.get("DATA_JOURNAL_INTERVAL", "30"))
+JOURNAL_MAX_BYTES = int(os.environ.get("DATA_JOURNAL_MAX_BYTES", str(256 * 1024)))
+
+PRETTY = os.environ.get("DATA_JSON_PRETTY", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+def _fsync_path(path: str):
+    # diretórios também precisam de fsync para a renomeação ficar no disco
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _FsyncBatcher:
+    """Acumula caminhos alterados e faz fsync de todos de uma vez."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, path: str):
+        with self._lock:
+            self._pending.add(path)
+            self._pending.add(os.path.dirname(path) or ".")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="storage-fsync", daemon=True
+                )
+                self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            paths, self._pending = self._pending, set()
+        # arquivos primeiro, diretórios depois
+        for p in sorted(paths, key=os.path.isdir):
+            _fsync_path(p)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+_batcher = _FsyncBatcher(FSYNC_INTERVAL)
+atexit.register(_batcher.flush)
+
+
+def flush():
+    """Força o fsync pendente do modo "batch" (shutdown, endpoints de sync)."""
+    _batcher.flush()
+
+
+def _after_write(path: str):
+    if DURABILITY == "fsync":
+        _fsync_path(os.path.dirname(path) or ".")
+    elif DURABILITY == "batch":
+        _batcher.add(path)
+
+
+# ---------------------------------------------------------
+# Locks por arquivo (threads + processos)
+# ---------------------------------------------------------
+LOCK_DIR = os.environ.get("DATA_LOCK_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", ".locks"
+)
+
+
+class _FileLock:
+    """
+    RLock (threads) + flock() no lock file (processos).
+    O flock só é pego na entrada mais externa de cada thread; o fd do
+    lock file fica aberto só enquanto o lock está na mão (milhares de
+    arquivos de dados não viram milhares de fds abertos).
+    """
+
+    __slots__ = ("path", "lock_path", "rlock", "depth", "fd", "__weakref__")
+
+    def __init__(self, path: str):
+        self.path = path
+        name = hashlib.sha1(path.encode("utf-8")).hexdigest()[:20]
+        self.lock_path = os.path.join(LOCK_DIR, name + ".lock")
+        self.rlock = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def acquire(self):
+        self.rlock.acquire()
+        if self.depth == 0 and fcntl is not None:
+            try:
+                os.makedirs(LOCK_DIR, exist_ok=True)
+                self.fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(self.fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(self.fd)
+                    self.fd = None
+                    raise
+            except BaseException:
+                self.rlock.release()
+                raise
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0 and self.fd is not None:
+            # fechar o fd solta o flock
+            os.close(self.fd)
+            self.fd = None
+        self.rlock.release()
+
+    # -----------------------------
+    # contador de geração
+    # -----------------------------
+    @staticmethod
+    def _read_generation(fd) -> int:
+        raw = os.pread(fd, 8, 0)
+        return int.from_bytes(raw, "little") if len(raw) == 8 else 0
+
+    def generation(self) -> int:
+        if fcntl is None:
+            return 0
+        # leitura avulsa (sem o lock): abre, lê e fecha; sem lock file → 0
+        try:
+            fd = os.open(self.lock_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return 0
+        try:
+            return self._read_generation(fd)
+        finally:
+            os.close(fd)
+
+    def bump(self):
+        # chamado com o lock na mão (fd aberto)
+        if self.fd is None:
+            return
+        os.pwrite(self.fd, (self._read_generation(self.fd) + 1).to_bytes(8, "little"), 0)
+
+
+class _KeyedLocks:
+    """
+    Um _FileLock por caminho absoluto (criado sob demanda). Referências
+    fracas: o lock de um arquivo que ninguém está usando é descartado.
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+        self._guard = threading.Lock()
+
+    def get(self, path) -> _FileLock:
+        key = os.path.abspath(os.fspath(path))
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = _FileLock(key)
+                self._locks[key] = lock
+            return lock
+
+
+_locks = _KeyedLocks()
+
+
+@contextmanager
+def locked(path):
+    """Serializa escritas no mesmo arquivo entre threads e entre workers."""
+    lock = _locks.get(path)
+    lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def generation(path) -> int:
+    """
+    Contador de escritas do arquivo, compartilhado entre processos.
+    Mudou → algum worker gravou o arquivo; caches devem recarregar.
+    """
+    return _locks.get(path).generation()
+
+
+def touch(path):
+    """
+    Incrementa a geração de `path` sem gravar nada — para caches de um
+    diretório inteiro (ex.: touch("evaluation") depois de gravar nele).
+    """
+    with locked(path):
+        _locks.get(path).bump()
+
+
+# ---------------------------------------------------------
+# API
+# ---------------------------------------------------------
+def _doc_key(path):
+    # chave no SQLite, ou None quando o caminho fica no sistema de arquivos
+    return db.doc_key(path) if db.BACKEND == "sqlite" else None
+
+
+def read_json(path, default=None):
+    path = os.fspath(path)
+
+    key = _doc_key(path)
+    if key is not None:
+        data = documents.read(key)
+        return default if data is None else data
+
+    log = _journal_path(path)
+    if os.path.exists(log):
+        return _read_journaled(path, log, default)
+
+    return _read_base(path, default)
+
+
+def _columnar_base(path):
+    # .cols vigente do caminho (None → o base é o JSON, se existir)
+    cols = columnar.columnar_path(path)
+    if cols is None or not os.path.exists(cols):
+        return None
+    # os dois formatos só coexistem se um crash interrompeu a troca:
+    # vale o do modo configurado
+    if columnar.ENABLED or not os.path.exists(path):
+        return cols
+    return None
+
+
+def _read_base(path, default):
+    cols = _columnar_base(path)
+    if cols is not None:
+        return columnar.read(cols)
+
+    if not os.path.exists(path):
+        return default
+    with open(path, "rb") as f:
+        return jsonio.loads(f.read())
+
+
+def read_columns(path):
+    """
+    columnar.ColumnarFile do documento (use com `with`), ou None se ele
+    não está no formato colunar ou tem log pendente.
+    """
+    path = os.fspath(path)
+    if _doc_key(path) is not None or os.path.exists(_journal_path(path)):
+        return None
+
+    cols = _columnar_base(path)
+    if cols is None:
+        return None
+    try:
+        return columnar.ColumnarFile(cols)
+    except FileNotFoundError:
+        return None
+
+
+def exists(path) -> bool:
+    key = _doc_key(path)
+    if key is not None:
+        return documents.exists(key)
+    return (
+        os.path.exists(path)
+        or os.path.exists(_journal_path(path))
+        or _columnar_base(path) is not None
+    )
+
+
+def listdir(directory) -> list:
+    """Nomes dos documentos do diretório ([] se não existir)."""
+    if db.BACKEND == "sqlite":
+        prefix = db.dir_key(directory)
+        if prefix is not None:
+            return documents.list_names(prefix)
+
+    if not os.path.isdir(directory):
+        return []
+
+    # "x.json.log" / "x.json.cols" sem o "x.json" ainda são o documento x.json
+    names = {}
+    for name in os.listdir(directory):
+        for suffix in (".log", ".cols"):
+            if name.endswith(".json" + suffix):
+                name = name[:-len(suffix)]
+                break
+        names[name] = None
+    return list(names)
+
+
+def signature(path):
+    """
+    Identifica a versão atual do arquivo (None se não existir): muda a
+    cada escrita, em qualquer worker. Usado pelos caches em memória.
+    """
+    key = _doc_key(path)
+    if key is not None:
+        v = documents.version(key)
+        return None if v is None else (generation(path), v)
+
+    # no modo journal o log pendente também faz parte da versão
+    files = []
+    for p in (path, _journal_path(path), columnar.columnar_path(path)):
+        if p is None:
+            continue
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            files.append(None)
+            continue
+        files.append((st.st_mtime_ns, st.st_size))
+
+    if all(f is None for f in files):
+        return None
+    return (generation(path), *files)
+
+
+def write_json(path, data, indent=None):
+    path = os.fspath(path)
+    lock = _locks.get(path)
+
+    key = _doc_key(path)
+    if key is not None:
+        with locked(path):
+            documents.write(key, data)
+            lock.bump()
+        return
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # DATA_COLUMNAR: presença HR vai para "<arquivo>.cols"
+    cols = columnar.columnar_path(path)
+    blob = columnar.encode(data) if cols is not None and columnar.ENABLED else None
+    target, stale = (cols, path) if blob is not None else (path, cols)
+    if blob is None:
+        blob = jsonio.dumps(data, pretty=PRETTY if indent is None else bool(indent))
+
+    # nome único por processo/thread: writers concorrentes não disputam o mesmo tmp
+    tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    with locked(path):
+        try:
+            with open(tmp, "wb") as f:
+                f.write(blob)
+                f.flush()
+                if DURABILITY == "fsync":
+                    os.fsync(f.fileno())
+
+            os.replace(tmp, target)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+        # o base no outro formato ficou velho
+        if stale is not None and os.path.exists(stale):
+            os.remove(stale)
+
+        # o conteúdo gravado já inclui o log (veio de read_json): descarta
+        _discard_journal(path)
+        lock.bump()
+        _after_write(target)
+
+
+def remove(path):
+    path = os.fspath(path)
+
+    key = _doc_key(path)
+    if key is not None:
+        with locked(path):
+            documents.delete(key)
+            _locks.get(path).bump()
+        return
+
+    with locked(path):
+        had_journal = _discard_journal(path)
+
+        removed = None
+        for p in (path, columnar.columnar_path(path)):
+            if p is not None and os.path.exists(p):
+                os.remove(p)
+                removed = p
+
+        if removed is None:
+            if had_journal:
+                _locks.get(path).bump()
+            return
+        _locks.get(path).bump()
+        _after_write(removed)
+
+
+def update_json(path, fn, default=None, remove_if_empty=False):
+    """
+    read-modify-write transacional: carrega, chama fn(data) e grava,
+    tudo sob o lock do arquivo — duas requests simultâneas no mesmo
+    arquivo não perdem atualização.
+
+    fn altera `data` no lugar e o que ela retornar é devolvido.
+    `default` (copiado) é usado quando o arquivo ainda não existe.
+    Com remove_if_empty=True, um resultado vazio apaga o arquivo.
+    """
+    with locked(path):
+        data = read_json(path)
+        if data is None:
+            data = copy.deepcopy(default)
+
+        result = fn(data)
+
+        if remove_if_empty and not data:
+            remove(path)
+        else:
+            write_json(path, data)
+
+        return result
+
+
+# ---------------------------------------------------------
+# Journal (append-only) para os arquivos de presença
+# ---------------------------------------------------------
+#
+# Cada linha do log é um registro compacto:
+#   ["s", [chave, ...], valor]   → define o valor no caminho de chaves
+#   ["d", [chave, ...]]          → apaga (e remove dicts que ficarem vazios)
+#   ["k", [chave, ...]]          → apaga só a chave: os dicts pais e o
+#                                  arquivo ({}) continuam existindo
+#
+# Os registros são idempotentes: reaplicar um log já incorporado ao
+# arquivo base não muda o resultado (compactação interrompida é segura).
+
+def _journal_path(path) -> str:
+    return f"{os.fspath(path)}.log"
+
+
+def _journaled(path) -> bool:
+    return JOURNAL and _doc_key(path) is None
+
+
+def _apply_record(data: dict, record):
+    op, keys = record[0], record[1]
+
+    if op == "s":
+        node = data
+        for k in keys[:-1]:
+            node = node.setdefault(k, {})
+        node[keys[-1]] = record[2]
+        return
+
+    # "d": apaga a chave e os dicts pais que ficarem vazios; "k": só a chave
+    parents = []
+    node = data
+    for k in keys[:-1]:
+        if not isinstance(node.get(k), dict):
+            return
+        parents.append((node, k))
+        node = node[k]
+    node.pop(keys[-1], None)
+
+    if op == "k":
+        return
+    for parent, k in reversed(parents):
+        if parent[k]:
+            break
+        del parent[k]
+
+
+def apply_records(data: dict, records):
+    """
+    Aplica registros no formato do journal (["s", chaves, valor],
+    ["d", chaves], ...) em `data`, no lugar — para alterações em lote
+    dentro de update_json com o mesmo resultado de journal_set/_delete.
+    """
+    for record in records:
+        _apply_record(data, record)
+
+
+def _read_journaled(path, log, default):
+    data = _read_base(path, {})
+    keep = False
+
+    with open(log, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = jsonio.loads(line)
+            except ValueError:
+                # linha incompleta (crash no meio do append): ignora
+                continue
+            _apply_record(data, record)
+            keep = keep or record[0] == "k"
+
+    # sem o log, um arquivo que ficou vazio já teria sido removido
+    # (a não ser que a exclusão tenha pedido para mantê-lo)
+    if not data and not keep:
+        return default
+    return data
+
+
+def _discard_journal(path) -> bool:
+    log = _journal_path(path)
+    try:
+        os.remove(log)
+    except FileNotFoundError:
+        return False
+    if DURABILITY == "batch":
+        _batcher.add(log)
+    return True
+
+
+def _append_journal(path, record):
+    path = os.fspath(path)
+    log = _journal_path(path)
+    line = jsonio.dumps(record).decode("utf-8") + "\n"
+
+    with locked(path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(log, "ab+") as f:
+            # linha incompleta de um crash anterior: começa numa linha nova
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line
+            f.write(line.encode("utf-8"))
+            f.flush()
+            if DURABILITY == "fsync":
+                os.fsync(f.fileno())
+            size = f.tell()
+
+        _locks.get(path).bump()
+        if DURABILITY == "batch":
+            _batcher.add(log)
+
+    # log grande: compacta já (em segundo plano), sem esperar o intervalo
+    _compactor.add(path, urgent=size > JOURNAL_MAX_BYTES)
+
+
+def journal_set(path, keys: list, value):
+    """data[k1][k2]... = value, gravando O(1) no modo journal."""
+    record = ["s", list(keys), value]
+    if _journaled(path):
+        _append_journal(path, record)
+    else:
+        update_json(path, lambda data: _apply_record(data, record), default={})
+
+
+def journal_delete(path, keys: list, prune=True):
+    """
+    Apaga data[k1][k2]... e os níveis que ficarem vazios (arquivo vazio é
+    removido). Com prune=False apaga só a chave: os níveis pais e o
+    arquivo continuam, mesmo vazios.
+    """
+    record = ["d" if prune else "k", list(keys)]
+    if _journaled(path):
+        _append_journal(path, record)
+    else:
+        update_json(
+            path, lambda data: _apply_record(data, record),
+            default={}, remove_if_empty=prune,
+        )
+
+
+_compact_listeners = []
+
+
+def on_compact(fn):
+    """
+    fn(path, assinatura_antes, assinatura_depois) é chamada depois de
+    cada compactação: o conteúdo não muda, então caches podem só trocar
+    a assinatura em vez de recarregar.
+    """
+    _compact_listeners.append(fn)
+    return fn
+
+
+def compact(path):
+    """Incorpora o log ao arquivo base (ou apaga o arquivo se ficou vazio)."""
+    path = os.fspath(path)
+    with locked(path):
+        if not os.path.exists(_journal_path(path)):
+            return
+        before = signature(path)
+        data = read_json(path)
+        if data is not None:
+            write_json(path, data)
+        else:
+            remove(path)
+        after = signature(path)
+
+        for fn in _compact_listeners:
+            fn(path, before, after)
+
+
+class CompactionError(Exception):
+    """sync() não conseguiu compactar alguns logs (continuam pendentes)."""
+
+    def __init__(self, failures):
+        self.failures = failures  # [(caminho, exceção)]
+        super().__init__("; ".join(f"{p}: {e}" for p, e in failures))
+
+
+class _Compactor:
+    """Thread que compacta periodicamente os arquivos com log pendente."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending = set()
+        self._dirs = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, path: str, urgent=False):
+        # caminho absoluto: o mesmo arquivo achado pelo sweep() não entra duas vezes
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pending.add(path)
+            self._dirs.add(os.path.dirname(path))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="storage-compact", daemon=True
+                )
+                self._thread.start()
+        if urgent:
+            self._wakeup.set()
+
+    def flush(self) -> list:
+        """Compacta os pendentes; devolve [(caminho, exceção)] dos que falharam."""
+        with self._lock:
+            paths, self._pending = self._pending, set()
+
+        failures = []
+        for p in paths:
+            try:
+                compact(p)
+            except Exception as e:
+                logger.exception("falha ao compactar o journal de %s", p)
+                failures.append((p, e))
+
+        # o log continua no disco: tenta de novo na próxima rodada
+        if failures:
+            with self._lock:
+                self._pending.update(p for p, _ in failures)
+        return failures
+
+    def sweep(self) -> list:
+        """Compacta também os logs deixados por outros workers nos mesmos diretórios."""
+        with self._lock:
+            dirs = list(self._dirs)
+        for d in dirs:
+            if not os.path.isdir(d):
+                continue
+            logs = [
+                os.path.join(d, name[:-len(".log")])
+                for name in os.listdir(d)
+                if name.endswith(".json.log")
+            ]
+            with self._lock:
+                self._pending.update(logs)
+        return self.flush()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+_compactor = _Compactor(JOURNAL_INTERVAL)
+atexit.register(_compactor.flush)
+
+
+def flush_journal():
+    """Compacta agora todos os logs pendentes deste processo."""
+    _compactor.flush()
+
+
+def sync():
+    """
+    Leva tudo ao disco agora: compacta os logs (deste processo e os dos
+    diretórios em que ele já gravou) e faz o fsync pendente do "batch".
+    Lança CompactionError se algum log não pôde ser compactado.
+    """
+    failures = _compactor.sweep()
+    _batcher.flush()
+    if failures:
+        raise CompactionError(failures)
@@ -0,0 +1,296 @@
+import copy
+
+from utils.storage import read_json, write_json, locked, signature
+
+
+# ---------------------------------------------------------
+# Backfill de campos obrigatórios (antes ficava em load_data)
+# ---------------------------------------------------------
+def backfill_student_fields(data: list) -> bool:
+    changed = False
+    for s in data:
+        if "status" not in s or not s["status"]:
+            s["status"] = "在籍"
+            changed = True
+
+        if "suspension_history" not in s:
+            s["suspension_history"] = []
+            changed = True
+
+    return changed
+
+
+def class_key(course, grade, class_name):
+    return (course, str(grade), class_name)
+
+
+def _student_key(s: dict):
+    return str(s.get("id", "")).lower()
+
+
+def _class_key_of(s: dict):
+    return class_key(s.get("course"), s.get("grade"), s.get("class_name"))
+
+
+class StudentNotFound(Exception):
+    pass
+
+
+# ---------------------------------------------------------
+# Snapshot imutável: registros + índices
+# ---------------------------------------------------------
+class _Snapshot:
+    """
+    Registros (tupla, na ordem do arquivo) + índices hash:
+    - by_id:     id (minúsculo) → registro
+    - pos:       id (minúsculo) → posição em records
+    - by_class:  (course, grade, class_name) → tupla de registros
+    - by_status: status → tupla de registros
+
+    Nunca é modificado depois de criado: escritas geram um snapshot
+    novo (copy-on-write), então leitores concorrentes não são afetados.
+    """
+
+    __slots__ = ("records", "by_id", "pos", "by_class", "by_status")
+
+    def __init__(self, records, by_id, pos, by_class, by_status):
+        self.records = records
+        self.by_id = by_id
+        self.pos = pos
+        self.by_class = by_class
+        self.by_status = by_status
+
+    @classmethod
+    def build(cls, records):
+        records = tuple(records)
+        by_id = {}
+        pos = {}
+        by_class = {}
+        by_status = {}
+
+        for i, s in enumerate(records):
+            key = _student_key(s)
+            # em caso de ID duplicado vale o primeiro (mesmo comportamento do next())
+            if key not in by_id:
+                by_id[key] = s
+                pos[key] = i
+            by_class.setdefault(_class_key_of(s), []).append(s)
+            by_status.setdefault(s.get("status"), []).append(s)
+
+        by_class = {k: tuple(v) for k, v in by_class.items()}
+        by_status = {k: tuple(v) for k, v in by_status.items()}
+        return cls(records, by_id, pos, by_class, by_status)
+
+    def _swap(self, index, key, old, new):
+        # troca/remove/adiciona um registro numa tupla do índice, mantendo a ordem do arquivo
+        group = index.get(key, ())
+        if old is not None and new is not None:
+            group = tuple(new if s is old else s for s in group)
+        elif old is not None:
+            group = tuple(s for s in group if s is not old)
+        else:
+            new_pos = self.pos[_student_key(new)]
+            i = 0
+            while i < len(group) and self.pos[_student_key(group[i])] < new_pos:
+                i += 1
+            group = group[:i] + (new,) + group[i:]
+
+        if group:
+            index[key] = group
+        else:
+            index.pop(key, None)
+
+    def replace(self, key, record):
+        """Novo snapshot com o registro `key` substituído (atualização incremental)."""
+        i = self.pos[key]
+        old = self.records[i]
+
+        records = self.records[:i] + (record,) + self.records[i + 1:]
+
+        by_id = dict(self.by_id)
+        by_id[key] = record
+
+        by_class = dict(self.by_class)
+        old_ck, new_ck = _class_key_of(old), _class_key_of(record)
+        if old_ck == new_ck:
+            self._swap(by_class, old_ck, old, record)
+        else:
+            self._swap(by_class, old_ck, old, None)
+            self._swap(by_class, new_ck, None, record)
+
+        by_status = dict(self.by_status)
+        old_st, new_st = old.get("status"), record.get("status")
+        if old_st == new_st:
+            self._swap(by_status, old_st, old, record)
+        else:
+            self._swap(by_status, old_st, old, None)
+            self._swap(by_status, new_st, None, record)
+
+        return _Snapshot(records, by_id, self.pos, by_class, by_status)
+
+
+_EMPTY = _Snapshot.build(())
+_UNLOADED = object()
+
+
+class StudentRepository:
+    """
+    Cache em memória do students.json.
+
+    - all(): visão somente leitura, compartilhada entre requests.
+      Os registros NÃO devem ser modificados por quem chama.
+    - get() / by_class() / by_status(): buscas O(1) pelos índices.
+    - load(): cópia nova e mutável (para quem vai salvar a lista inteira).
+    - status_of(): status atual do aluno (休学, 出席停止...), O(1).
+    - positions(): registros + posição de cada ID (paginação por cursor).
+    - save(): grava o arquivo e invalida o cache.
+    - transaction(): load + alteração + save sob o lock do arquivo;
+      o snapshot novo é montado da própria lista gravada (sem reler).
+    - update() / delete(): escrita de UM aluno, mantendo os índices
+      atualizados sem recarregar o arquivo.
+
+    O cache é recarregado quando a geração do arquivo (utils.storage,
+    compartilhada entre workers) ou o mtime/tamanho mudam (edição
+    externa, outro processo) ou depois de um save().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._snap = _EMPTY
+        self._signature = _UNLOADED
+
+    # -----------------------------
+    # internos
+    # -----------------------------
+    def _stat(self):
+        # geração + mtime/tamanho (arquivo) ou versão do documento (SQLite)
+        return signature(self.path)
+
+    def _read_file(self):
+        data = read_json(self.path, [])
+
+        if backfill_student_fields(data):
+            self._write(data)
+
+        return data
+
+    def _write(self, data):
+        write_json(self.path, data)
+
+    def _install(self, snap):
+        self._snap = snap
+        self._signature = self._stat()
+
+    def _snapshot(self) -> _Snapshot:
+        sig = self._stat()
+        if sig == self._signature:
+            return self._snap
+
+        with locked(self.path):
+            sig = self._stat()
+            if sig != self._signature:
+                # stat de novo dentro do _install: o backfill pode ter regravado o arquivo
+                self._install(_Snapshot.build(self._read_file()))
+            return self._snap
+
+    # -----------------------------
+    # leitura
+    # -----------------------------
+    def all(self) -> tuple:
+        return self._snapshot().records
+
+    def get(self, student_id: str):
+        return self._snapshot().by_id.get(str(student_id).lower())
+
+    def by_class(self, course, grade, class_name) -> tuple:
+        return self._snapshot().by_class.get(class_key(course, grade, class_name), ())
+
+    def by_status(self, status) -> tuple:
+        return self._snapshot().by_status.get(status, ())
+
+    def status_of(self, student_id: str):
+        """Status atual do aluno (None se o ID não existir)."""
+        s = self._snapshot().by_id.get(str(student_id).lower())
+        return s.get("status") if s is not None else None
+
+    def positions(self) -> tuple:
+        """(registros, id minúsculo → posição), do mesmo snapshot. Somente leitura."""
+        snap = self._snapshot()
+        return snap.records, snap.pos
+
+    def class_groups(self) -> dict:
+        """(course, grade, class_name) → registros. Somente leitura."""
+        return self._snapshot().by_class
+
+    def load(self) -> list:
+        with locked(self.path):
+            return self._read_file()
+
+    # -----------------------------
+    # escrita
+    # -----------------------------
+    def save(self, data):
+        with locked(self.path):
+            self._write(data)
+            self.invalidate()
+
+    def transaction(self, fn):
+        """
+        read-modify-write da lista inteira sob o lock do students.json.
+        fn(lista) altera a lista no lugar; o retorno de fn é devolvido.
+
+        Depois de gravar, a própria lista vira o snapshot do cache (os
+        índices são remontados em memória, sem reler o arquivo) — fn não
+        deve guardar os registros para alterá-los depois.
+        """
+        with locked(self.path):
+            data = self._read_file()
+            result = fn(data)
+            self._write(data)
+            self._install(_Snapshot.build(data))
+            return result
+
+    def update(self, student_id: str, fn):
+        """
+        Aplica fn(registro) numa cópia do aluno e grava.
+        Retorna o que fn retornar. Se fn não alterar nada, não grava.
+        Lança StudentNotFound se o ID não existir.
+        """
+        key = str(student_id).lower()
+
+        with locked(self.path):
+            snap = self._snapshot()
+            current = snap.by_id.get(key)
+            if current is None:
+                raise StudentNotFound(student_id)
+
+            record = copy.deepcopy(current)
+            result = fn(record)
+
+            if record != current:
+                new_snap = snap.replace(key, record)
+                self._write(list(new_snap.records))
+                self._install(new_snap)
+
+            return result
+
+    def delete(self, student_id: str):
+        """Remove o aluno e grava. Retorna o registro removido."""
+        key = str(student_id).lower()
+
+        with locked(self.path):
+            snap = self._snapshot()
+            current = snap.by_id.get(key)
+            if current is None:
+                raise StudentNotFound(student_id)
+
+            records = [s for s in snap.records if _student_key(s) != key]
+            self._write(records)
+            self._install(_Snapshot.build(records))
+
+            return current
+
+    def invalidate(self):
+        with locked(self.path):
+            self._snap = _EMPTY
+            self._signature = _UNLOADED